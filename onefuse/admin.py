@@ -1,18 +1,44 @@
+import contextvars
+import copy
 import errno
 import re
 import sys
+import time
 import json
 import os
 import requests
 import socket
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 from os import path
 from uuid import uuid1
 from requests.exceptions import HTTPError
+from . import codec
 from .exceptions import (BackupsUnknownError, RestoreContentError,
                          OneFuseError, BadRequest, RequiredParameterMissing)
+from .bulk import (DEPROVISION_TIERS, PROVISION_KINDS, BulkItemResult,
+                   get_deprovision_tier, get_ingested_object_reference,
+                   get_managed_object_reference, run_bulk)
+from .cache import (POLICY_CACHE, RENDER_CACHE, RESOLVE_CACHE,
+                    NegativeResult)
+from .catalog import PolicyCatalog
+from .coalesce import SINGLE_FLIGHT
+from .http_cache import RESPONSE_CACHE, get_credential_fingerprint
+from .ingest import BulkIngest
+from .jobs import JobHandle, JobWatcher
+from .polling import (DEFAULT_POLLING_PROFILES, DEFAULT_POLLING_STRATEGY,
+                      FixedPollingStrategy, get_module_path)
+from .rendering import (LocalRenderer, can_batch_render, contains_template,
+                        get_affected_properties, get_batch_delimiter,
+                        get_changed_properties, get_property_dependencies,
+                        get_render_fingerprint, get_template_strings,
+                        has_property_set_expansion, is_template,
+                        merge_resolved_properties)
+from .pipeline import Pipeline
+from .snapshot import PolicySnapshot
 
 ROOT_PATH = path.dirname(path.dirname(path.dirname(path.abspath(__file__))))
 sys.path.append(ROOT_PATH)
@@ -71,6 +97,80 @@ class OneFuseManager(object):
             are: CRITICAL, ERROR, WARNING, INFO, DEBUG
         logger - allows you to pass in logger information. By default will log to
             onefuse.log as well as to console at the DEBUG level
+        pool_connections : int
+            default 10 - Number of connection pools to cache in the underlying
+            HTTP session
+        pool_maxsize : int
+            default 10 - Maximum number of connections kept alive per pool.
+            Raise this when sharing one OneFuseManager across many threads
+        pool_block : bool
+            default False - When True, block instead of opening a throwaway
+            connection once pool_maxsize connections are in use
+        keep_alive : bool
+            default True - Keep connections (and their TLS sessions) open
+            between requests. Set to False to close the connection after
+            every request
+        polling_strategy : onefuse.polling.PollingStrategy
+            default PollingStrategy(0.5, 2, 15) - How to back off while
+            polling OneFuse jobs for modules without a polling profile
+        polling_profiles : dict
+            Per-module PollingStrategy overrides keyed by module path, merged
+            over onefuse.polling.DEFAULT_POLLING_PROFILES.
+            Ex: {'/customNames/': PollingStrategy(0.25, 2, 5)}
+        job_watcher_workers : int
+            default 8 - Maximum number of concurrent job polls made by the
+            shared JobWatcher. See get_job_watcher
+        policy_cache : onefuse.cache.TTLCache
+            default onefuse.cache.POLICY_CACHE - Cache of policy, property
+            set and productInfo lookups, shared by all managers in the
+            process. Pass a TTLCache to change its size or TTL, a
+            SqliteCache to share it between processes, or None to always
+            query OneFuse
+        product_info : dict
+            Preseed the productInfo json of the OneFuse appliance, ex:
+            {"version": "1.4.0", "instanceId": "..."}. By default it is
+            fetched from OneFuse the first time it is needed
+        local_render : bool
+            default False - Render templates that only use standard Jinja2
+            syntax in-process instead of through the OneFuse template
+            tester. Anything else is still rendered by OneFuse. Requires
+            jinja2 (pip install onefuse[render]). See
+            onefuse.rendering.LocalRenderer
+        render_cache : onefuse.cache.TTLCache
+            default onefuse.cache.RENDER_CACHE - Cache of rendered template
+            values keyed by template and a hash of the properties the
+            template references, shared by all managers in the process.
+            Templates using time, random or sequence functions are never
+            cached. None always renders through OneFuse
+        trim_properties : bool
+            default True - Send the template tester only the properties a
+            template depends on, rather than the whole stack. See
+            get_template_tester_properties
+        resolve_cache : onefuse.cache.TTLCache
+            default onefuse.cache.RESOLVE_CACHE - Last input and resolved
+            properties stack per tracking ID, used by resolve_properties
+            when passed a tracking_id to re-resolve only what changed. None
+            always resolves the whole stack
+        sps_max_workers : int
+            default 8 - Maximum number of property sets get_sps_properties
+            fetches from OneFuse concurrently
+        snapshot_path : str
+            Directory written by BackupManager.backup_policies. Policies and
+            property sets are looked up in it before OneFuse, ex: to start
+            cold hosts from a nightly backup. See
+            onefuse.snapshot.PolicySnapshot
+        snapshot_max_age : float
+            default 86400 - Seconds after which a policy in snapshot_path is
+            stale and looked up in OneFuse instead. None never expires them
+        response_cache : onefuse.http_cache.ResponseCache
+            default onefuse.http_cache.RESPONSE_CACHE - Cache of GET
+            responses for slowly changing paths (productInfo, policies,
+            property sets, credentials), revalidated with ETag and
+            Last-Modified. None sends every GET to OneFuse
+        single_flight : onefuse.coalesce.SingleFlight
+            default onefuse.coalesce.SINGLE_FLIGHT - Identical GETs (same
+            url, credentials and tracking ID) made concurrently from several
+            threads share one request and its response. None sends every GET
         """
         try:
             source = kwargs["source"]
@@ -105,6 +205,78 @@ class OneFuseManager(object):
             logger = logging.getLogger(__name__)
             # console_handler = logging.StreamHandler(sys.stdout)
             # logger.addHandler(console_handler)
+        try:
+            pool_connections = kwargs["pool_connections"]
+        except KeyError:
+            pool_connections = 10
+        try:
+            pool_maxsize = kwargs["pool_maxsize"]
+        except KeyError:
+            pool_maxsize = 10
+        try:
+            pool_block = kwargs["pool_block"]
+        except KeyError:
+            pool_block = False
+        try:
+            keep_alive = kwargs["keep_alive"]
+        except KeyError:
+            keep_alive = True
+        try:
+            polling_strategy = kwargs["polling_strategy"]
+        except KeyError:
+            polling_strategy = DEFAULT_POLLING_STRATEGY
+        try:
+            polling_profiles = kwargs["polling_profiles"]
+        except KeyError:
+            polling_profiles = {}
+        try:
+            job_watcher_workers = kwargs["job_watcher_workers"]
+        except KeyError:
+            job_watcher_workers = 8
+        try:
+            policy_cache = kwargs["policy_cache"]
+        except KeyError:
+            policy_cache = POLICY_CACHE
+        try:
+            product_info = kwargs["product_info"]
+        except KeyError:
+            product_info = None
+        try:
+            local_render = kwargs["local_render"]
+        except KeyError:
+            local_render = False
+        try:
+            render_cache = kwargs["render_cache"]
+        except KeyError:
+            render_cache = RENDER_CACHE
+        try:
+            trim_properties = kwargs["trim_properties"]
+        except KeyError:
+            trim_properties = True
+        try:
+            resolve_cache = kwargs["resolve_cache"]
+        except KeyError:
+            resolve_cache = RESOLVE_CACHE
+        try:
+            sps_max_workers = kwargs["sps_max_workers"]
+        except KeyError:
+            sps_max_workers = 8
+        try:
+            snapshot_path = kwargs["snapshot_path"]
+        except KeyError:
+            snapshot_path = None
+        try:
+            snapshot_max_age = kwargs["snapshot_max_age"]
+        except KeyError:
+            snapshot_max_age = 86400
+        try:
+            response_cache = kwargs["response_cache"]
+        except KeyError:
+            response_cache = RESPONSE_CACHE
+        try:
+            single_flight = kwargs["single_flight"]
+        except KeyError:
+            single_flight = SINGLE_FLIGHT
         if not verify_certs:
             import urllib3
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -117,57 +289,229 @@ class OneFuseManager(object):
         self.base_url += f':{port}'
         self.base_url += '/api/v3/onefuse'
         self.logger = logger
+        self.polling_strategy = polling_strategy
+        self.polling_profiles = dict(DEFAULT_POLLING_PROFILES)
+        self.polling_profiles.update(polling_profiles)
+        self.job_watcher_workers = job_watcher_workers
+        self.job_watcher = None
+        self.policy_cache = policy_cache
+        self.policy_catalog = None
+        self.product_info = product_info
+        self.local_renderer = LocalRenderer(logger) if local_render else None
+        self.render_cache = render_cache
+        self.trim_properties = trim_properties
+        self.resolve_cache = resolve_cache
+        self.sps_max_workers = sps_max_workers
+        self.response_cache = response_cache
+        self.single_flight = single_flight
+        self.policy_snapshot = None
+        if snapshot_path:
+            self.policy_snapshot = PolicySnapshot(snapshot_path,
+                                                  snapshot_max_age,
+                                                  logger=logger)
         self.headers = {
             'Accept': 'application/json',
             'Content-Type': 'application/json',
             'X-Origin-Host': socket.gethostname(),
-            'Connection': 'Keep-Alive',
+            'Connection': 'Keep-Alive' if keep_alive else 'close',
             'SOURCE': source
         }
-        self.onefuse_version = self.get_onefuse_version()
+        self.tracking_id_context = contextvars.ContextVar(
+            f'onefuse_tracking_id_{id(self)}', default="")
+        # Set by provision_many so request submits jobs to the JobWatcher
+        # instead of waiting for them
+        self.submit_context = contextvars.ContextVar(
+            f'onefuse_submit_{id(self)}', default=False)
+        # Set by bulk operations to a dict so each policy is looked up once
+        # for the whole batch
+        self.policy_memo_context = contextvars.ContextVar(
+            f'onefuse_policy_memo_{id(self)}', default=None)
+        self.session = self.create_session(pool_connections, pool_maxsize,
+                                           pool_block)
 
     def __enter__(self):
         return self
 
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     def __getattr__(self, item):
-        if item == 'get':
-            return lambda path, **kwargs: requests.get(
-                self.base_url + path,
-                auth=HTTPBasicAuth(self.username, self.password),
-                headers=self.headers,
-                verify=self.verify_certs,
-                **kwargs
-            )
-        elif item == 'post':
-            return lambda path, **kwargs: requests.post(
-                self.base_url + path,
-                auth=HTTPBasicAuth(self.username, self.password),
-                headers=self.headers,
-                verify=self.verify_certs,
-                **kwargs
-            )
-        elif item == 'delete':
-            return lambda path, **kwargs: requests.delete(
-                self.base_url + path,
-                auth=HTTPBasicAuth(self.username, self.password),
-                headers=self.headers,
-                verify=self.verify_certs,
-                **kwargs
-            )
-        elif item == 'put':
-            return lambda path, **kwargs: requests.put(
-                self.base_url + path,
-                auth=HTTPBasicAuth(self.username, self.password),
-                headers=self.headers,
-                verify=self.verify_certs,
-                **kwargs
-            )
+        if item in ['get', 'post', 'delete', 'put']:
+            return lambda path, **kwargs: self.send(item, path, **kwargs)
         else:
             return item
 
+    def send(self, method: str, path: str, tracking_id: str = "",
+             headers: dict = None, **kwargs):
+        """
+        Send a request to OneFuse over the pooled session. This is what
+        get, post, put and delete call. Headers are built per request, so a
+        single manager can be shared by many threads
+
+        Parameters
+        ----------
+        method : str
+            HTTP method. ex: 'get'
+        path : str
+            OneFuse REST path. ex: '/namingPolicies/'
+        tracking_id : str - optional
+            OneFuse Tracking ID to send with this request only
+        headers : dict - optional
+            Additional headers for this request only
+        """
+        request_headers = self.get_request_headers(tracking_id, headers)
+        if method.lower() == 'get' and not headers and not kwargs:
+            return self.send_get(path, request_headers)
+        if kwargs.get('json') is not None:
+            # Encode json bodies with the fast codec. The manager's headers
+            # already declare the Content-Type
+            kwargs['data'] = codec.dumps_bytes(kwargs.pop('json'))
+        if self.response_cache is not None:
+            module_path = get_module_path(path)
+            if method.lower() in ('post', 'put', 'patch', 'delete') and \
+                    self.response_cache.get_rule(module_path) is not None:
+                # Writes change what the module's GETs return
+                self.response_cache.invalidate(self.base_url, module_path)
+        return self.session.request(
+            method.upper(),
+            self.base_url + path,
+            headers=request_headers,
+            verify=self.verify_certs,
+            **kwargs
+        )
+
+    def send_get(self, path: str, request_headers: dict):
+        """
+        Send a plain GET through the response cache, sharing the request
+        with identical GETs in flight from other threads
+
+        Parameters
+        ----------
+        path : str
+            OneFuse REST path. ex: '/namingPolicies/'
+        request_headers : dict
+            Headers for the request. See get_request_headers
+        """
+        def get(conditional_headers: dict = None):
+            if conditional_headers:
+                headers = dict(request_headers, **conditional_headers)
+            else:
+                headers = request_headers
+            return self.session.get(self.base_url + path, headers=headers,
+                                    verify=self.verify_certs)
+
+        def fetch():
+            if self.response_cache is None:
+                return get()
+            key = self.response_cache.get_key(self.base_url, self.username,
+                                              path, self.password)
+            return self.response_cache.fetch(key, path, get)
+
+        if self.single_flight is None:
+            return fetch()
+        # The shared request carries one Tracking-Id, so only GETs with the
+        # same tracking ID are coalesced
+        return self.single_flight.do(
+            ('GET', self.base_url + path, self.username, self.password,
+             request_headers.get("Tracking-Id")),
+            fetch)
+
+    def get_request_headers(self, tracking_id: str = "",
+                            headers: dict = None):
+        """
+        Return the headers for a single request: the manager's headers, the
+        Tracking-Id for this request, then any extra headers
+
+        Parameters
+        ----------
+        tracking_id : str - optional
+            OneFuse Tracking ID. Defaults to the Tracking ID set with
+            add_tracking_id_to_headers in the current thread or task
+        headers : dict - optional
+            Additional headers for this request only
+        """
+        request_headers = dict(self.headers)
+        if tracking_id is None or tracking_id == "":
+            tracking_id = self.tracking_id_context.get()
+        if tracking_id is not None and tracking_id != "":
+            request_headers["Tracking-Id"] = tracking_id
+        if headers:
+            request_headers.update(headers)
+        return request_headers
+
     def __repr__(self):
         return 'OneFuseManager'
 
+    @property
+    def onefuse_version(self):
+        """
+        Version of the OneFuse appliance. productInfo is only requested from
+        OneFuse the first time this is read
+        """
+        return self.get_onefuse_version()
+
+    @onefuse_version.setter
+    def onefuse_version(self, value: str):
+        product_info = dict(self.product_info or {})
+        product_info["version"] = value
+        self.product_info = product_info
+
+    def create_session(self, pool_connections: int = 10,
+                       pool_maxsize: int = 10, pool_block: bool = False):
+        """
+        Create the pooled HTTP session shared by every call this manager
+        makes. Connections are kept alive and reused, so the TCP and TLS
+        handshakes are only paid once per pooled connection.
+
+        Parameters
+        ----------
+        pool_connections : int
+            Number of connection pools to cache
+        pool_maxsize : int
+            Maximum number of connections to keep alive per pool
+        pool_block : bool
+            Block when no free connection is available instead of opening a
+            connection that is discarded after use
+        """
+        session = requests.Session()
+        session.auth = HTTPBasicAuth(self.username, self.password)
+        session.verify = self.verify_certs
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=pool_block)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self):
+        """
+        Stop the shared JobWatcher and the policy catalog refresh, if
+        started, then close the HTTP session and release all pooled
+        connections
+        """
+        if self.policy_catalog is not None:
+            self.policy_catalog.stop()
+        if self.job_watcher is not None:
+            self.job_watcher.stop()
+            self.job_watcher = None
+        self.session.close()
+
+    def get_job_watcher(self):
+        """
+        Return the JobWatcher shared by every caller of this manager,
+        starting it on first use. Register the job from any 202 response
+        with it to have all outstanding jobs polled from one scheduler.
+
+        Example:
+            response = ofm.post('/customNames/', json=template)
+            future = ofm.get_job_watcher().watch_response(response,
+                                                          '/customNames/')
+            name_json = future.result()
+        """
+        if self.job_watcher is None:
+            self.job_watcher = JobWatcher(self, self.job_watcher_workers)
+        return self.job_watcher
+
     # AD Functions:
     def provision_ad(self, policy_name: str, template_properties: dict,
                      name: str, tracking_id: str = ""):
@@ -219,7 +563,8 @@ class OneFuseManager(object):
         self.deprovision_mo(path)
         return path
 
-    def move_ou(self, ad_id: int):
+    def move_ou(self, ad_id: int, mo_json: dict = None,
+                tracking_id: str = ""):
         """
         Move an Active Directory object currently in the build state to the
         final OU/state
@@ -228,11 +573,20 @@ class OneFuseManager(object):
         ----------
         ad_id : int
             OneFuse ID of the Active Directory object to be moved
+        mo_json : dict - optional
+            Current json of the Active Directory object, when already
+            fetched. Fetched from OneFuse if not passed
+        tracking_id : str - optional
+            OneFuse Tracking ID of the object, when already known. Taken from
+            mo_json or looked up from the object if not passed
         """
         path = f'/microsoftADComputerAccounts/{ad_id}/'
-        get_response = self.get(path)
-        get_response.raise_for_status()
-        get_response = get_response.json()
+        if mo_json is not None:
+            get_response = mo_json
+        else:
+            get_response = self.get(path)
+            get_response.raise_for_status()
+            get_response = codec.loads_response(get_response)
         state = get_response["state"]
         if state != 'build':
             msg = (f'Active Directory object is in {state} state this method '
@@ -243,13 +597,18 @@ class OneFuseManager(object):
         name = get_response["name"]
         links = get_response["_links"]
         workspace_url = links["workspace"]["href"]
-        tracking_id = self.get_tracking_id_from_mo(path)
+        if not tracking_id:
+            tracking_id = get_response.get("trackingId") or \
+                self.get_tracking_id_from_mo(path)
         template = {
             "workspace": workspace_url,
             "state": "final"
         }
         self.logger.info(f'Moving AD object: {name} to final OU: {final_ou}')
         response_json = self.request(path, template, tracking_id, "put")
+        if isinstance(response_json, JobHandle):
+            # Submitted for move_ou_many, which waits for the job
+            return response_json
         self.logger.info(f"AD object was successfully moved to the final OU. "
                          f"AD: {name}, OU: {final_ou}")
         return response_json
@@ -278,23 +637,21 @@ class OneFuseManager(object):
             execution. Tracking IDs allow for grouping all executions for a
             single object
         """
-        # Get Ansible Tower Policy by Name
-        rendered_policy_name = self.render(policy_name, template_properties)
+        # Render the policy name, hosts and limit together, then get Ansible
+        # Tower Policy by Name
+        rendered_policy_name, rendered_hosts, rendered_limit = \
+            self.render_many([policy_name, hosts, limit], template_properties)
         policy_path = 'ansibleTowerPolicies'
         policy_json = self.get_policy_by_name(policy_path,
                                               rendered_policy_name)
         links = policy_json["_links"]
         policy_url = links["self"]["href"]
         workspace_url = links["workspace"]["href"]
-        # Render hosts and limit
         hosts_arr = []
         if hosts:
-            rendered_hosts = self.render(hosts, template_properties)
             for host in rendered_hosts.split(','):
                 hosts_arr.append(host.strip())
-        if limit:
-            rendered_limit = self.render(limit, template_properties)
-        else:
+        if not limit:
             rendered_limit = ''
         # Request Ansible Tower
         template = {
@@ -347,18 +704,18 @@ class OneFuseManager(object):
             execution. Tracking IDs allow for grouping all executions for a
             single object
         """
-        # Get DNS Policy by Name
-        rendered_policy_name = self.render(policy_name, template_properties)
+        # Render the policy name and zones together, then get DNS Policy by
+        # Name
+        rendered = self.render_many([policy_name] + list(zones),
+                                    template_properties)
+        rendered_policy_name = rendered[0]
+        rendered_zones = rendered[1:]
         policy_path = 'dnsPolicies'
         policy_json = self.get_policy_by_name(policy_path,
                                               rendered_policy_name)
         links = policy_json["_links"]
         policy_url = links["self"]["href"]
         workspace_url = links["workspace"]["href"]
-        rendered_zones = []
-        for zone in zones:
-            rendered_zone = self.render(zone, template_properties)
-            rendered_zones.append(rendered_zone)
         # Request DNS
         template = {
             "policy": policy_url,
@@ -506,13 +863,12 @@ class OneFuseManager(object):
             path_char = '/'
         file_object = open(file_path, 'rb')
         files = {'zipFile': ('upload.zip', file_object)}
-        data = {'replaceExisting': json.dumps(replace_existing)}
+        data = {'replaceExisting': codec.dumps(replace_existing)}
         try:
             # Can't use the ofm.post method here, file uploads require
             # different headers than are provided by the class
-            response = requests.post(
+            response = self.session.post(
                 self.base_url + path,
-                auth=HTTPBasicAuth(self.username, self.password),
                 verify=self.verify_certs,
                 data=data,
                 files=files
@@ -522,7 +878,7 @@ class OneFuseManager(object):
             err_msg = (f'Request failed for path: {path}, Error: '
                        f'{sys.exc_info()[0]}. {sys.exc_info()[1]}'
                        f', line: {sys.exc_info()[2].tb_lineno}. Messages: ')
-            errors = json.loads(err.response.content)["errors"]
+            errors = codec.loads(err.response.content)["errors"]
             err_msg += ','.join(error["message"] for error in errors)
             raise OneFuseError(err_msg)
         return response
@@ -668,13 +1024,16 @@ class OneFuseManager(object):
             # Sort list alphanumerically.
             sps_keys.sort()
 
-            # Gather Properties
+            # Fetch every Property Set concurrently, then gather properties
+            # in sorted key order
+            sps_jsons = self.get_sps_by_names(
+                [template_properties[key] for key in sps_keys])
             sps_properties = {}
             for key in sps_keys:
                 self.logger.debug(
                     f'Starting get_sps_all_properties key: {key}')
                 sps_name = template_properties[key]
-                sps_json = self.get_sps_by_name(sps_name)
+                sps_json = sps_jsons[sps_name]
                 props = sps_json["properties"]
                 for prop_key in props.keys():
                     if prop_key == upstream_property:
@@ -698,31 +1057,79 @@ class OneFuseManager(object):
 
         return sps_properties
 
+    def get_sps_by_names(self, sps_names: list):
+        """
+        Return a dict of OneFuse Property Sets keyed by name. Property sets
+        not already cached are fetched concurrently, at most sps_max_workers
+        at a time
+
+        Parameters
+        ----------
+        sps_names : list
+            Names of the Property Sets to be returned
+        """
+        sps_names = list(dict.fromkeys(sps_names))
+        if len(sps_names) <= 1 or self.sps_max_workers <= 1:
+            return {sps_name: self.get_sps_by_name(sps_name)
+                    for sps_name in sps_names}
+        max_workers = min(self.sps_max_workers, len(sps_names))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Run each lookup in a copy of the caller's context so requests
+            # carry the caller's tracking ID
+            futures = [executor.submit(contextvars.copy_context().run,
+                                       self.get_sps_by_name, sps_name)
+                       for sps_name in sps_names]
+            return {sps_name: future.result()
+                    for sps_name, future in zip(sps_names, futures)}
+
     def get_sps_by_name(self, sps_name: str):
         """
-        Return a OneFuse Property set by the name
+        Return a OneFuse Property set by the name. Property sets are held in
+        the policy cache like policies, and read from the policy snapshot
+        when one was loaded with snapshot_path
 
         Parameters
         ----------
         sps_name : dict
             Name of the Property Set to be returned
         """
+        if self.policy_catalog is not None:
+            sps_json = self.policy_catalog.get_policy('propertySets',
+                                                      sps_name)
+            if sps_json is not None:
+                return sps_json
+        if self.policy_snapshot is not None:
+            sps_json = self.policy_snapshot.get_policy('propertySets',
+                                                       sps_name)
+            if sps_json is not None:
+                return sps_json
+        cache_key = self.get_policy_cache_key('propertySets', sps_name)
+        if self.policy_cache is not None:
+            cached = self.policy_cache.get(cache_key)
+            if isinstance(cached, NegativeResult):
+                raise OneFuseError(cached.message)
+            if cached is not None:
+                return copy.deepcopy(cached)
         path = f'/propertySets/?filter=name.iexact:"{sps_name}"'
         response = self.get(path)
         response.raise_for_status()
-        sps_json = response.json()
+        sps_json = codec.loads_response(response)
 
         if sps_json["count"] > 1:
-            raise (f"More than one Property Set was returned "
-                   f"matching the name: {sps_name}. Response: "
-                   f"{json.dumps(sps_json)}")
+            raise OneFuseError(f"More than one Property Set was returned "
+                               f"matching the name: {sps_name}. Response: "
+                               f"{codec.dumps(sps_json)}")
 
         if sps_json["count"] == 0:
-            raise OneFuseError(
-                f"No property sets were returned matching the"
-                f" name: {sps_name}. Response: "
-                f"{json.dumps(sps_json)}")
+            err_msg = (f"No property sets were returned matching the"
+                       f" name: {sps_name}. Response: "
+                       f"{codec.dumps(sps_json)}")
+            if self.policy_cache is not None:
+                self.policy_cache.set_negative(cache_key, err_msg)
+            raise OneFuseError(err_msg)
         sps_json = sps_json["_embedded"]["propertySets"][0]
+        if self.policy_cache is not None:
+            self.policy_cache.set(cache_key, copy.deepcopy(sps_json))
         return sps_json
 
     def get_create_properties(self, template_properties: dict):
@@ -759,7 +1166,7 @@ class OneFuseManager(object):
                 value_obj = template_properties[key]
                 self.logger.debug(f'Create Props Object: {value_obj}')
                 if type(value_obj) == str:
-                    value_obj = json.loads(value_obj)
+                    value_obj = codec.loads(value_obj)
                 if value_obj["key"] and value_obj["value"]:
                     create_properties[value_obj["key"]] = value_obj["value"]
         return create_properties
@@ -862,7 +1269,7 @@ class OneFuseManager(object):
         path = f'/servicenowCMDBDeployments/{cmdb_id}/'
         current_response = self.get(path)
         current_response.raise_for_status()
-        current_json = current_response.json()
+        current_json = codec.loads_response(current_response)
         tracking_id = self.get_tracking_id_from_mo(path)
         # Template
         template = {
@@ -907,9 +1314,8 @@ class OneFuseManager(object):
             single object
         """
         # Get CMDB Policy by Name
-        rendered_policy_name = self.render(policy_name, template_properties)
-        rendered_deployment_name = self.render(deployment_name,
-                                               template_properties)
+        rendered_policy_name, rendered_deployment_name = self.render_many(
+            [policy_name, deployment_name], template_properties)
         policy_path = 'vraPolicies'
         policy_json = self.get_policy_by_name(policy_path,
                                               rendered_policy_name)
@@ -924,9 +1330,7 @@ class OneFuseManager(object):
             "deploymentName": rendered_deployment_name
         }
         path = '/vraDeployments/'
-        sleep_seconds = 30
-        response_json = self.request(path, template, tracking_id,
-                                     sleep_seconds=sleep_seconds)
+        response_json = self.request(path, template, tracking_id)
         return response_json
 
     def deprovision_vra(self, vra_id: int):
@@ -970,14 +1374,33 @@ class OneFuseManager(object):
                 return template
             if template.find('{%') == -1 and template.find('{{') == -1:
                 return template
+            if self.local_renderer is not None and return_type == "value":
+                rendered = self.local_renderer.render(template,
+                                                      template_properties)
+                if rendered is not LocalRenderer.NOT_RENDERED:
+                    return rendered
+            cache_key = None
+            if return_type == "value":
+                cache_key = self.get_render_cache_key(template,
+                                                      template_properties)
+                if cache_key is not None:
+                    cached = self.render_cache.get(cache_key)
+                    if cached is not None:
+                        return cached
+            if return_type == "value":
+                template_properties = self.get_template_tester_properties(
+                    [template], template_properties)
             json_template = {
                 "template": template,
                 "templateProperties": template_properties,
             }
             response = self.post("/templateTester/", json=json_template)
             response.raise_for_status()
-            response_json = response.json()
-            return response_json.get(return_type)
+            response_json = codec.loads_response(response)
+            rendered = response_json.get(return_type)
+            if cache_key is not None and rendered is not None:
+                self.render_cache.set(cache_key, rendered)
+            return rendered
         except:
             error_string = (
                 f'Error: {sys.exc_info()[0]}. {sys.exc_info()[1]}, '
@@ -986,7 +1409,177 @@ class OneFuseManager(object):
             self.logger.error(error_string)
             raise
 
-    def resolve_properties(self, template_properties: dict):
+    def render_many(self, templates, template_properties: dict,
+                    max_batch_size: int = 100):
+        """
+        Render many templates against the same properties stack in as few
+        template tester calls as possible. Templates are joined by a unique
+        delimiter into a single template, rendered once and split apart
+        again. Values that are not templates are returned unchanged, as with
+        render. If a batch cannot be rendered or split cleanly, each of its
+        templates is rendered on its own.
+
+        Parameters
+        ----------
+        templates : list or dict
+            Strings to be rendered. When a dict is passed, its values are
+            rendered and a dict with the same keys is returned
+        template_properties : dict
+            Stack of properties used in OneFuse policy execution
+        max_batch_size : int - optional
+            Maximum number of templates rendered per template tester call.
+            Default: 100
+
+        Examples
+        --------
+            ofm.render_many(["{{ env }}.cloudbolt.io", "{{ owner }}"],
+                            {"env": "dev", "owner": "jdoe"})
+            Result: ["dev.cloudbolt.io", "jdoe"]
+        """
+        if isinstance(templates, dict):
+            rendered = self.render_many(list(templates.values()),
+                                        template_properties, max_batch_size)
+            return dict(zip(templates.keys(), rendered))
+        rendered = list(templates)
+        batched = []
+        for index, template in enumerate(templates):
+            if not is_template(template):
+                continue
+            if self.local_renderer is not None:
+                value = self.local_renderer.render(template,
+                                                   template_properties)
+                if value is not LocalRenderer.NOT_RENDERED:
+                    rendered[index] = value
+                    continue
+            if not can_batch_render(template):
+                rendered[index] = self.render(template, template_properties)
+                continue
+            cache_key = self.get_render_cache_key(template,
+                                                  template_properties)
+            if cache_key is not None:
+                cached = self.render_cache.get(cache_key)
+                if cached is not None:
+                    rendered[index] = cached
+                    continue
+            batched.append((index, cache_key))
+        for start in range(0, len(batched), max_batch_size):
+            batch = batched[start:start + max_batch_size]
+            values = self.render_batch([templates[i] for i, _ in batch],
+                                       template_properties)
+            for (index, cache_key), value in zip(batch, values):
+                rendered[index] = value
+                if cache_key is not None and value is not None:
+                    self.render_cache.set(cache_key, value)
+        return rendered
+
+    def render_batch(self, templates: list, template_properties: dict):
+        """
+        Render a list of templates in a single template tester call and
+        return the rendered values in the same order. Falls back to calling
+        render for each template when the batch fails or the rendered
+        result does not split back into one value per template.
+
+        Parameters
+        ----------
+        templates : list
+            Strings to be rendered. See onefuse.rendering.can_batch_render
+        template_properties : dict
+            Stack of properties used in OneFuse policy execution
+        """
+        if len(templates) == 1:
+            return [self.render(templates[0], template_properties)]
+        delimiter = get_batch_delimiter(templates)
+        json_template = {
+            "template": delimiter.join(templates),
+            "templateProperties": self.get_template_tester_properties(
+                templates, template_properties),
+        }
+        try:
+            response = self.post("/templateTester/", json=json_template)
+            if response.ok:
+                value = codec.loads_response(response).get("value")
+                if type(value) == str:
+                    values = value.split(delimiter)
+                    if len(values) == len(templates):
+                        return values
+        except Exception:
+            pass
+        self.logger.debug(f'Batch render of {len(templates)} templates '
+                          f'failed, rendering them one at a time')
+        return [self.render(template, template_properties)
+                for template in templates]
+
+    def get_render_cache_key(self, template: str,
+                             template_properties: dict):
+        """
+        Return the render cache key for a template and properties stack, or
+        None if the render cache is disabled or the render must not be
+        cached. Keys hold the manager's credentials, so renders are never
+        shared between accounts. See onefuse.rendering.get_render_fingerprint
+
+        Parameters
+        ----------
+        template : str
+            The string to be rendered
+        template_properties : dict
+            Stack of properties used in OneFuse policy execution
+        """
+        if self.render_cache is None:
+            return None
+        fingerprint = get_render_fingerprint(template, template_properties)
+        if fingerprint is None:
+            return None
+        return (self.base_url, 'templateTester', template, fingerprint,
+                get_credential_fingerprint(self.username, self.password))
+
+    def get_template_tester_properties(self, templates: list,
+                                       template_properties: dict,
+                                       resolve_all: bool = False):
+        """
+        Return the part of a properties stack the template tester needs to
+        render the templates: the properties they reference, directly or
+        through other templated properties, every 1FPS_ and OneFuse_SPS_
+        property, and the properties referenced by the property sets those
+        expand to. Property sets are fetched with get_sps_by_name. The whole
+        stack is returned when trim_properties is off or the dependencies
+        cannot be determined. See
+        onefuse.rendering.get_property_dependencies
+
+        Parameters
+        ----------
+        templates : list
+            Strings to be rendered
+        template_properties : dict
+            Stack of properties used in OneFuse policy execution
+        resolve_all : bool - optional
+            Also keep every property that holds a template, for resolving
+            the whole stack. Default: False
+        """
+        if not self.trim_properties or not template_properties:
+            return template_properties
+        property_sets = {}
+        try:
+            while True:
+                keys, missing = get_property_dependencies(
+                    templates, template_properties, property_sets)
+                if keys is None:
+                    return template_properties
+                if not missing:
+                    break
+                for sps_name in missing:
+                    sps_json = self.get_sps_by_name(sps_name)
+                    property_sets[sps_name] = sps_json["properties"]
+        except Exception:
+            self.logger.debug(f'Could not determine template dependencies, '
+                              f'sending all properties. Error: '
+                              f'{sys.exc_info()[0]}. {sys.exc_info()[1]}')
+            return template_properties
+        return {key: value for key, value in template_properties.items()
+                if key in keys or (resolve_all and (
+                    is_template(key) or contains_template(value)))}
+
+    def resolve_properties(self, template_properties: dict,
+                           tracking_id: str = ""):
         """
         Leverage the OneFuse template tester to render an entire template
         properties stack. Returns rendered properties. Will find and expand any
@@ -1010,16 +1603,43 @@ class OneFuseManager(object):
                 "ipamEnv": "Development",               # From 1FPS_env
                 "dnsZone": "dev.cloudbolt.io"           # From 1FPS_env
             }
-        """
+        tracking_id : str - optional
+            OneFuse Tracking ID of the object the stack belongs to. When
+            passed, the input and result are kept in the resolve cache and
+            the next call for the same tracking ID only re-resolves the
+            properties that changed and the properties depending on them.
+            See resolve_changed_properties
+        """
+        if tracking_id and self.resolve_cache is not None:
+            return self.resolve_changed_properties(template_properties,
+                                                   tracking_id)
         try:
+            templates = list(get_template_strings(template_properties))
+            sent_properties = self.get_template_tester_properties(
+                templates, template_properties, resolve_all=True)
             json_template = {
                 "template": "",
-                "templateProperties": template_properties,
+                "templateProperties": sent_properties,
             }
             response = self.post("/templateTester/", json=json_template)
             response.raise_for_status()
-            response_json = response.json()
-            return response_json.get("resolvedProperties")
+            response_json = codec.loads_response(response)
+            resolved_properties = response_json.get("resolvedProperties")
+            if sent_properties is template_properties or \
+                    resolved_properties is None:
+                return resolved_properties
+            # Add back the properties that were not sent. They hold no
+            # templates and nothing that was sent references them
+            merged_properties = {}
+            for key, value in template_properties.items():
+                if key not in sent_properties:
+                    merged_properties[key] = value
+                elif key in resolved_properties:
+                    merged_properties[key] = resolved_properties[key]
+            for key, value in resolved_properties.items():
+                if key not in merged_properties:
+                    merged_properties[key] = value
+            return merged_properties
         except:
             error_string = (
                 f'Error: {sys.exc_info()[0]}. {sys.exc_info()[1]}, '
@@ -1027,6 +1647,65 @@ class OneFuseManager(object):
             self.logger.error(error_string)
             raise
 
+    def resolve_changed_properties(self, template_properties: dict,
+                                   tracking_id: str):
+        """
+        Resolve a properties stack, reusing the result of the last resolve
+        for the same tracking ID. Only the properties that changed since then
+        and the templated properties that depend on them are sent to the
+        template tester, and their results are merged into the previous
+        resolved stack. The whole stack is resolved again when there is no
+        previous result, a property was removed, a 1FPS_ or OneFuse_SPS_
+        property changed, or an expanded property set references a changed
+        property
+
+        Parameters
+        ----------
+        template_properties : dict
+            Stack of properties used in OneFuse policy execution
+        tracking_id : str
+            OneFuse Tracking ID of the object the stack belongs to
+        """
+        cache_key = (self.base_url, 'resolvedProperties', 'trackingId',
+                     tracking_id,
+                     get_credential_fingerprint(self.username, self.password))
+        previous = self.resolve_cache.get(cache_key)
+        changed = None
+        if isinstance(previous, dict):
+            changed = get_changed_properties(
+                previous["templateProperties"], template_properties)
+        if changed and has_property_set_expansion(template_properties):
+            # Properties referenced from inside the expanded property sets
+            expansion_properties = self.get_template_tester_properties(
+                [], template_properties)
+            if expansion_properties is template_properties or \
+                    not changed.isdisjoint(expansion_properties):
+                changed = None
+        if changed is None:
+            resolved_properties = self.resolve_properties(template_properties)
+        elif not changed:
+            self.logger.debug(f'Properties unchanged for tracking ID: '
+                              f'{tracking_id}')
+            resolved_properties = previous["resolvedProperties"]
+        else:
+            affected, required = get_affected_properties(changed,
+                                                         template_properties)
+            self.logger.debug(f'Resolving {len(affected)} changed properties '
+                              f'for tracking ID: {tracking_id}')
+            resolved_properties = self.resolve_properties(
+                {key: value for key, value in template_properties.items()
+                 if key in required})
+            if resolved_properties is not None:
+                resolved_properties = merge_resolved_properties(
+                    previous["resolvedProperties"], resolved_properties,
+                    affected)
+        if resolved_properties is not None:
+            self.resolve_cache.set(cache_key, copy.deepcopy({
+                "templateProperties": template_properties,
+                "resolvedProperties": resolved_properties,
+            }))
+        return copy.deepcopy(resolved_properties)
+
     def get_job_json(self, job_id: int):
         """
         Return the json payload for a OneFuse Job ID
@@ -1038,12 +1717,12 @@ class OneFuseManager(object):
         """
         job_path = f'/jobMetadata/{job_id}/'
         job_response = self.get(job_path)
-        job_json = job_response.json()
+        job_json = codec.loads_response(job_response)
         return job_json
 
     def wait_for_job_completion(self, job_response: requests.models.Response,
                                 path: str, method: str,
-                                sleep_seconds: int = 5):
+                                sleep_seconds: int = None):
         """
         Continuously poll a OneFuse job until completion. Raise a TimeoutError
         when the max timeout per module is exceeded. Returns the json for the
@@ -1057,49 +1736,37 @@ class OneFuseManager(object):
             The REST path for the policy executed. ex: '/customNames/'
         method : str
             The type of method called for the original job. ex: "put"
-        sleep_seconds : int
-            The interval of which to sleep polling the job for. Defaults to 5
+        sleep_seconds : int - optional
+            Poll on this fixed interval instead of using the polling strategy
+            for the module. See get_polling_strategy
         """
-        response_json = job_response.json()
+        response_json = codec.loads_response(job_response)
         response_status = job_response.status_code
         self.logger.debug(f'OneFuse Post Response status: {response_status}')
         # Async returns a 202
         if response_status == 202:
-            import time
             job_id = response_json["id"]
-            total_seconds = 0
+            if sleep_seconds is not None:
+                strategy = FixedPollingStrategy(sleep_seconds)
+            else:
+                strategy = self.get_polling_strategy(path)
+            delays = strategy.delays()
+            start_time = time.monotonic()
             max_sleep = self.get_max_sleep(path)
             job_json = self.get_job_json(job_id)
             job_state = job_json["jobState"]
             while job_state != 'Successful' and job_state != 'Failed':
+                delay = next(delays)
                 self.logger.debug(
-                    f'Waiting for job completion. Sleeping for {sleep_seconds}'
+                    f'Waiting for job completion. Sleeping for {delay:.2f}'
                     f' seconds. Job state: {job_state}')
-                time.sleep(sleep_seconds)
-                total_seconds += sleep_seconds
-                if total_seconds > max_sleep:
+                time.sleep(delay)
+                if time.monotonic() - start_time > max_sleep:
                     raise TimeoutError(f'Action timeout. OneFuse job exceeded '
                                        f'{max_sleep} seconds')
                 job_json = self.get_job_json(job_id)
                 job_state = job_json["jobState"]
-            if job_state == 'Successful':
-                if method == 'delete':
-                    return None
-                self.logger.debug('OneFuse Job Successful')
-                mo_string = job_json["responseInfo"]["payload"]
-                mo_json = json.loads(mo_string)
-                mo_json["trackingId"] = job_json["jobTrackingId"]
-            else:
-                payload = json.loads(job_json["responseInfo"]["payload"])
-                error_string = f'OneFuse job failure. State: {job_state}, ' \
-                               f'Error Code: {payload["code"]}, Errors: '
-                errors = payload["errors"]
-                error_string += ', '.join(err["message"] for err in errors)
-                self.logger.error(
-                    f'OneFuse job failure. Error: {error_string}')
-                if error_string.find("Required Variable is missing") > -1:
-                    raise RequiredParameterMissing(error_string)
-                raise OneFuseError(error_string)
+            mo_json = self.get_job_result(job_json, method)
         # Non-Async (ex: SPS) Returns a 201
         else:
             if method == 'delete':
@@ -1109,6 +1776,38 @@ class OneFuseManager(object):
 
         return mo_json
 
+    def get_job_result(self, job_json: dict, method: str):
+        """
+        Return the json for the OneFuse Managed Object of a finished job, or
+        raise the errors reported by a failed job. Returns None for delete
+        jobs.
+
+        Parameters
+        ----------
+        job_json : dict
+            The jobMetadata json of a job in the Successful or Failed state
+        method : str
+            The type of method called for the original job. ex: "put"
+        """
+        job_state = job_json["jobState"]
+        if job_state == 'Successful':
+            if method == 'delete':
+                return None
+            self.logger.debug('OneFuse Job Successful')
+            mo_string = job_json["responseInfo"]["payload"]
+            mo_json = codec.loads(mo_string)
+            mo_json["trackingId"] = job_json["jobTrackingId"]
+            return mo_json
+        payload = codec.loads(job_json["responseInfo"]["payload"])
+        error_string = f'OneFuse job failure. State: {job_state}, ' \
+                       f'Error Code: {payload["code"]}, Errors: '
+        errors = payload["errors"]
+        error_string += ', '.join(err["message"] for err in errors)
+        self.logger.error(f'OneFuse job failure. Error: {error_string}')
+        if error_string.find("Required Variable is missing") > -1:
+            raise RequiredParameterMissing(error_string)
+        raise OneFuseError(error_string)
+
     def request(self, path: str, template: dict, tracking_id: str = "",
                 method: str = 'post', **kwargs):
         """
@@ -1118,8 +1817,8 @@ class OneFuseManager(object):
         Accepted kwargs
         ---------------
         sleep_seconds : int
-            Overrides the default of 5 seconds when polling a job to determine
-            completion
+            Poll the job on this fixed interval instead of using the polling
+            strategy for the module
 
         Parameters
         ----------
@@ -1134,36 +1833,315 @@ class OneFuseManager(object):
             The type of method called for the original job. ex: 'put'. Default
             is 'post'
         """
-        self.add_tracking_id_to_headers(tracking_id)
+        if self.submit_context.get():
+            return self.submit(path, template, tracking_id, method)
         self.logger.debug(f'Submitting {method} request to path: {path} with '
                           f' template_properties: {template}')
+        response = self.send_job_request(path, template, tracking_id, method)
+        try:
+            sleep_seconds = kwargs["sleep_seconds"]
+        except KeyError:
+            sleep_seconds = None
+        mo_json = self.wait_for_job_completion(response, path, method,
+                                               sleep_seconds)
+        self.logger.debug(f'mo_json: {mo_json}')
+        return mo_json
+
+    def send_job_request(self, path: str, template: dict,
+                         tracking_id: str = "", method: str = 'post'):
+        """
+        Send the POST, PUT or DELETE request that starts a OneFuse job and
+        return the response. Used by request and submit. An HTTP error is
+        raised as a OneFuseError holding the messages OneFuse returned
+
+        Parameters
+        ----------
+        path : str
+            The REST path for the policy executed. ex: '/customNames/'
+        template : dict
+            Request body. Ignored for 'delete'
+        tracking_id : str - optional
+            OneFuse Tracking ID
+        method : str - optional
+            'post', 'put' or 'delete'. Default is 'post'
+        """
         try:
             if method == 'post':
-                response = self.post(path, json=template)
+                response = self.post(path, json=template,
+                                     tracking_id=tracking_id)
             elif method == 'put':
-                response = self.put(path, json=template)
+                response = self.put(path, json=template,
+                                    tracking_id=tracking_id)
+            elif method == 'delete':
+                response = self.delete(path, tracking_id=tracking_id)
             else:
                 raise OneFuseError(
-                    f'This action only supports post and put calls. '
+                    f'This action only supports post, put and delete calls. '
                     f'Requested method: {method}')
             response.raise_for_status()
-            try:
-                sleep_seconds = kwargs["sleep_seconds"]
-            except KeyError:
-                sleep_seconds = 5
-            mo_json = self.wait_for_job_completion(response, path, method,
-                                                   sleep_seconds)
         except HTTPError as err:
             err_msg = (f'Request failed for path: {path}, Error: '
                        f'{sys.exc_info()[0]}. {sys.exc_info()[1]}'
                        f', line: {sys.exc_info()[2].tb_lineno}. Messages: ')
-            errors = json.loads(err.response.content)["errors"]
+            errors = codec.loads(err.response.content)["errors"]
             err_msg += ','.join(error["message"] for error in errors)
             raise OneFuseError(err_msg)
-        except:
-            raise
-        self.logger.debug(f'mo_json: {mo_json}')
-        return mo_json
+        return response
+
+    def submit(self, path: str, template: dict, tracking_id: str = "",
+               method: str = 'post'):
+        """
+        Submit a POST/PUT request to OneFuse without waiting for the job to
+        finish. Returns a JobHandle as soon as OneFuse accepts the request;
+        the job is then polled by the shared JobWatcher. Use this to overlap
+        independent policy executions from a single thread.
+
+        Example:
+            from onefuse.jobs import wait_all
+            ad = ofm.submit('/microsoftADComputerAccounts/', ad_template)
+            dns = ofm.submit('/dnsReservations/', dns_template)
+            ad_json, dns_json = wait_all([ad, dns])
+
+        Parameters
+        ----------
+        path : str
+            The REST path for the policy executed. ex: '/customNames/'
+        template : dict
+        tracking_id : str - optional
+            OneFuse Tracking ID. If not passed, one will be returned from the
+            execution. Tracking IDs allow for grouping all executions for a
+            single object
+        method : str - optional
+            The type of method called for the original job. ex: 'put'. Default
+            is 'post'. 'delete' deletes the object at path, ignoring template
+        """
+        self.logger.debug(f'Submitting {method} request to path: {path} with '
+                          f' template_properties: {template}')
+        response = self.send_job_request(path, template, tracking_id, method)
+        if not tracking_id:
+            tracking_id = response.headers.get("Tracking-Id", "")
+        job_id = None
+        if response.status_code == 202:
+            job_id = codec.loads_response(response)["id"]
+            future = self.get_job_watcher().watch(job_id, path, method)
+        else:
+            future = self.get_job_watcher().watch_response(response, path,
+                                                           method)
+        return JobHandle(future, tracking_id, job_id, path, self)
+
+    def provision_many(self, kind: str, items: list,
+                       max_concurrency: int = 8):
+        """
+        Run a provision_<kind> method for many items concurrently. Policies
+        named by the items are looked up once up front, each item's request
+        is submitted as soon as a slot is free and its job is polled by the
+        shared JobWatcher. At most max_concurrency jobs are in progress at
+        once. Returns a onefuse.bulk.BulkItemResult per item, in input order,
+        holding the Managed Object json or the item's error; a failed item
+        does not stop the batch.
+
+        Example:
+            results = ofm.provision_many('naming', [
+                {"policy_name": "prod", "template_properties": props}
+                for props in stacks
+            ], max_concurrency=16)
+            names = [result.get_result()["name"] for result in results]
+
+        Parameters
+        ----------
+        kind : str
+            Which provision method to run. One of: ad, ansible_tower, cmdb,
+            dns, ipam, module, naming, scripting, vra
+        items : list
+            A dict of keyword arguments for provision_<kind> per item
+        max_concurrency : int - optional
+            Maximum items submitted or running at once. Keep this within
+            what the OneFuse appliance and its providers can run. Default 8
+        """
+        if kind not in PROVISION_KINDS:
+            raise OneFuseError(f'Unknown provision kind: {kind}. Valid kinds: '
+                               f'{", ".join(PROVISION_KINDS)}')
+        items = list(items)
+        provision = getattr(self, f'provision_{kind}')
+        policy_path = PROVISION_KINDS[kind]
+        policy_names = list(dict.fromkeys(
+            item["policy_name"] for item in items
+            if isinstance(item, dict) and
+            isinstance(item.get("policy_name"), str) and
+            not contains_template(item["policy_name"])))
+
+        def provision_item(item: dict):
+            self.submit_context.set(True)
+            return provision(**item)
+
+        start_time = time.monotonic()
+        # Look each policy up once and share it with every item for the
+        # length of the call, with or without a policy cache. Items whose
+        # policy cannot be found fail on their own below
+        memo_token = self.policy_memo_context.set({})
+        try:
+            run_bulk(lambda policy_name: self.get_policy_by_name(
+                policy_path, policy_name), policy_names, max_concurrency)
+            results = run_bulk(provision_item, items, max_concurrency)
+        finally:
+            self.policy_memo_context.reset(memo_token)
+        failed = sum(1 for result in results if not result.ok)
+        self.logger.info(f'provision_many {kind}: {len(results) - failed} '
+                         f'succeeded, {failed} failed in '
+                         f'{time.monotonic() - start_time:.1f} seconds')
+        return results
+
+    def run_pipeline(self, steps: list, template_properties: dict,
+                     tracking_id: str = "", max_concurrency: int = 8):
+        """
+        Provision a build as a dependency graph of steps, running steps that
+        do not depend on each other concurrently under one tracking ID.
+        Returns a onefuse.pipeline.PipelineResult. See
+        onefuse.pipeline.Pipeline for the step format
+
+        Example:
+            result = ofm.run_pipeline([
+                {"name": "naming", "kind": "naming", "policy_name": "prod"},
+                {"name": "ipam", "kind": "ipam", "policy_name": "prod",
+                 "inputs": {"hostname": "naming.name"}},
+                {"name": "ad", "kind": "ad", "policy_name": "prod",
+                 "inputs": {"name": "naming.name"}},
+            ], properties_stack)
+
+        Parameters
+        ----------
+        steps : list
+            PipelineSteps, or dicts of PipelineStep arguments
+        template_properties : dict
+            Stack of properties used by every step
+        tracking_id : str - optional
+            OneFuse Tracking ID for every step. One is created if not passed
+        max_concurrency : int - optional
+            Maximum steps submitted or running at once. Default 8
+        """
+        pipeline = Pipeline(self, steps, max_concurrency)
+        return pipeline.run(template_properties, tracking_id)
+
+    def deprovision_many(self, managed_objects: list,
+                         max_concurrency: int = 8):
+        """
+        De-provision many Managed Objects, in the reverse of the order a
+        build creates them: Ansible Tower and Scripting, then Pluggable
+        Module, ServiceNow CMDB and vRA, then AD, DNS, IPAM and finally
+        Naming (see onefuse.bulk.DEPROVISION_TIERS). Objects of one tier are
+        deleted concurrently, at most max_concurrency at a time, and a tier
+        starts once the previous one has finished. When an object fails, the
+        objects of later tiers sharing its tracking ID are skipped rather
+        than deleted out of order. Returns a onefuse.bulk.BulkItemResult per
+        object, in input order, holding the object's path or its error.
+
+        Example:
+            results = ofm.deprovision_many([naming_json, ipam_json, dns_json])
+            failed = [result for result in results if not result.ok]
+
+        Parameters
+        ----------
+        managed_objects : list
+            REST paths of the objects, ex: '/customNames/782/', or their json
+            as returned by the provision methods. Tracking IDs found in the
+            json are reused; for paths they are looked up from OneFuse
+        max_concurrency : int - optional
+            Maximum deletes submitted or running at once. Default 8
+        """
+        managed_objects = list(managed_objects)
+        results = [None] * len(managed_objects)
+        references = {}
+        for index, managed_object in enumerate(managed_objects):
+            try:
+                references[index] = get_managed_object_reference(
+                    managed_object)
+            except OneFuseError as err:
+                results[index] = BulkItemResult(index, managed_object,
+                                                error=err)
+        # Tracking IDs are needed for the deletes, and to skip the objects
+        # of a build whose earlier tier failed
+        unknown = [index for index, (path, tracking_id)
+                   in references.items() if not tracking_id]
+        lookups = run_bulk(
+            lambda index: self.get_tracking_id_from_mo(references[index][0]),
+            unknown, max_concurrency)
+        for index, lookup in zip(unknown, lookups):
+            references[index] = (references[index][0], lookup.result or "")
+
+        def deprovision_item(index: int):
+            self.submit_context.set(True)
+            path, tracking_id = references[index]
+            return self.deprovision_mo(path, tracking_id)
+
+        start_time = time.monotonic()
+        failed_tracking_ids = set()
+        for tier in range(len(DEPROVISION_TIERS)):
+            indexes = []
+            for index, (path, tracking_id) in references.items():
+                if get_deprovision_tier(path) != tier:
+                    continue
+                if tracking_id and tracking_id in failed_tracking_ids:
+                    results[index] = BulkItemResult(
+                        index, managed_objects[index],
+                        error=OneFuseError(
+                            f'Deprovision of {path} skipped: an object with '
+                            f'tracking ID {tracking_id} failed to '
+                            f'deprovision'))
+                    continue
+                indexes.append(index)
+            for index, result in zip(indexes, run_bulk(
+                    deprovision_item, indexes, max_concurrency)):
+                path = references[index][0] if result.ok else None
+                results[index] = BulkItemResult(
+                    index, managed_objects[index], path, result.error,
+                    result.elapsed)
+                if not result.ok:
+                    self.logger.error(f'Deprovision failed for path: '
+                                      f'{references[index][0]} Error: '
+                                      f'{result.error}')
+                    if references[index][1]:
+                        failed_tracking_ids.add(references[index][1])
+        failed = sum(1 for result in results if not result.ok)
+        self.logger.info(f'deprovision_many: {len(results) - failed} '
+                         f'succeeded, {failed} failed in '
+                         f'{time.monotonic() - start_time:.1f} seconds')
+        return results
+
+    def ingest_file(self, kind: str, file_path: str,
+                    checkpoint_path: str = None, max_concurrency: int = 8,
+                    rate_limit: float = None, retry_failed: bool = False):
+        """
+        Ingest the records of a CSV or JSON Lines file with ingest_<kind>,
+        streaming the file and ingesting records concurrently. With a
+        checkpoint_path an interrupted run resumes where it stopped. Returns
+        a onefuse.ingest.IngestReport. See onefuse.ingest.BulkIngest
+
+        Example:
+            report = ofm.ingest_file('name', '/var/tmp/names.csv',
+                                     '/var/tmp/names.checkpoint')
+
+        Parameters
+        ----------
+        kind : str
+            Which ingest method to run. One of: ad, ansible_tower,
+            dns_reservation, ip_address, name, scripting_deployment,
+            service_now_cmdb
+        file_path : str
+            CSV file with a header row of ingest_<kind> argument names, or
+            JSON Lines file of argument dicts
+        checkpoint_path : str - optional
+            Path of the checkpoint file used to resume. Default None
+        max_concurrency : int - optional
+            Maximum records submitted or running at once. Default 8
+        rate_limit : float - optional
+            Maximum records started per second. Default None, no limit
+        retry_failed : bool - optional
+            Also ingest again the records that failed in earlier runs.
+            Default False
+        """
+        ingest = BulkIngest(self, kind, max_concurrency, rate_limit,
+                            checkpoint_path)
+        return ingest.run(file_path, retry_failed=retry_failed)
 
     def get_object_by_unique_field(self, resource_path: str, field_value: str,
                                    field: str):
@@ -1173,6 +2151,9 @@ class OneFuseManager(object):
         vRA deployment by deploymentName:
         get_object_by_unique_field('/vraDeployments/', 'My Deployment', 'deploymentName')
 
+        Results, including lookups that match nothing, are held in the
+        policy cache. See invalidate_policy_cache
+
         Parameters
         ----------
         resource_path : str
@@ -1182,23 +2163,84 @@ class OneFuseManager(object):
         field : str
             Field to key off of. Ex: 'deploymentName'
         """
+        cache_key = self.get_policy_cache_key(resource_path, field_value,
+                                              field)
+        if self.policy_cache is not None:
+            cached = self.policy_cache.get(cache_key)
+            if isinstance(cached, NegativeResult):
+                raise OneFuseError(cached.message)
+            if cached is not None:
+                self.logger.debug(f'Policy cache hit: {cache_key}')
+                return copy.deepcopy(cached)
         path = f'/{resource_path}/?filter={field}.iexact:"{field_value}"'
         policies_response = self.get(path)
         policies_response.raise_for_status()
-        policies_json = policies_response.json()
+        policies_json = codec.loads_response(policies_response)
 
         if policies_json["count"] > 1:
             raise OneFuseError(f"More than one policy was returned matching "
                                f"the name: {field_value}. Response: "
-                               f"{json.dumps(policies_json)}")
+                               f"{codec.dumps(policies_json)}")
 
         if policies_json["count"] == 0:
-            raise OneFuseError(f"No policies were returned matching the "
-                               f"name: {field_value}. Response: "
-                               f"{json.dumps(policies_json)}")
+            err_msg = (f"No policies were returned matching the "
+                       f"name: {field_value}. Response: "
+                       f"{codec.dumps(policies_json)}")
+            if self.policy_cache is not None:
+                self.policy_cache.set_negative(cache_key, err_msg)
+            raise OneFuseError(err_msg)
         policy_json = policies_json["_embedded"][resource_path][0]
+        if self.policy_cache is not None:
+            self.policy_cache.set(cache_key, copy.deepcopy(policy_json))
         return policy_json
 
+    def get_policy_cache_key(self, resource_path: str, field_value: str,
+                             field: str = "name"):
+        """
+        Return the policy cache key for a lookup: the OneFuse host, the
+        resource path, the field, the lower-cased field value and the
+        manager's credentials, so lookups are never shared between accounts
+        or answered for a wrong password
+
+        Parameters
+        ----------
+        resource_path : str
+            OneFuse REST path to object type. Ex: 'namingPolicies'
+        field_value : str
+            Value of field looked up. Ex: 'Production'
+        field : str - optional
+            Field looked up. Default: 'name'
+        """
+        return (self.base_url, resource_path.strip('/'), field,
+                str(field_value).lower(),
+                get_credential_fingerprint(self.username, self.password))
+
+    def invalidate_policy_cache(self, policy_path: str = None,
+                                policy_name: str = None):
+        """
+        Remove cached policy lookups for this OneFuse host. With no
+        arguments every cached lookup for the host is removed. Returns the
+        number of cache entries removed
+
+        Parameters
+        ----------
+        policy_path : str - optional
+            Only remove lookups of this type. Ex: 'namingPolicies'
+        policy_name : str - optional
+            Only remove lookups of this name (case-insensitive)
+        """
+        if self.policy_cache is None:
+            return 0
+        path = policy_path.strip('/') if policy_path else None
+        name = str(policy_name).lower() if policy_name else None
+
+        def matches(key):
+            return (key[0] == self.base_url and
+                    (path is None or key[1] == path) and
+                    (name is None or key[3] == name))
+
+        return self.policy_cache.invalidate(predicate=matches)
+
     def get_policy_by_name(self, policy_path: str, policy_name: str):
         """
         Return a OneFuse Policy JSON by Name
@@ -1210,11 +2252,49 @@ class OneFuseManager(object):
         policy_name : str
             Name of the Policy to return. Ex: 'Production'
         """
-        policy_json = self.get_object_by_unique_field(policy_path, policy_name,
-                                                      "name")
+        policy_memo = self.policy_memo_context.get()
+        memo_key = (policy_path.strip('/'), str(policy_name).lower())
+        if policy_memo is not None and memo_key in policy_memo:
+            return copy.deepcopy(policy_memo[memo_key])
+        policy_json = None
+        if self.policy_catalog is not None:
+            policy_json = self.policy_catalog.get_policy(policy_path,
+                                                         policy_name)
+        if policy_json is None and self.policy_snapshot is not None:
+            policy_json = self.policy_snapshot.get_policy(policy_path,
+                                                          policy_name)
+        if policy_json is None:
+            policy_json = self.get_object_by_unique_field(policy_path,
+                                                          policy_name, "name")
+        if policy_memo is not None:
+            policy_memo[memo_key] = copy.deepcopy(policy_json)
         return policy_json
 
-    def deprovision_mo(self, path: str):
+    def load_policy_catalog(self, policy_types: list = None,
+                            refresh_interval: float = None):
+        """
+        Page through each policy collection once and resolve
+        get_policy_by_name from the resulting local index from then on.
+        Returns the PolicyCatalog
+
+        Parameters
+        ----------
+        policy_types : list - optional
+            Policy collections to index. Defaults to
+            PolicyCatalog.DEFAULT_POLICY_TYPES
+        refresh_interval : float - optional
+            Reload the catalog in the background every refresh_interval
+            seconds. By default collections are only reloaded after a miss
+        """
+        if self.policy_catalog is not None:
+            self.policy_catalog.stop()
+        catalog = PolicyCatalog(self, policy_types, refresh_interval)
+        catalog.load()
+        catalog.start()
+        self.policy_catalog = catalog
+        return catalog
+
+    def deprovision_mo(self, path: str, tracking_id: str = ""):
         """
         De-provision a OneFuse Managed Object and wait for completion
 
@@ -1223,13 +2303,18 @@ class OneFuseManager(object):
         path : str
             Complete path to the object to delete to include ID.
             Ex: '/api/v3/onefuse/customNames/782/'
+        tracking_id : str - optional
+            OneFuse Tracking ID of the object, when already known. Looked up
+            from the object if not passed
         """
-        tracking_id = self.get_tracking_id_from_mo(path)
+        if not tracking_id:
+            tracking_id = self.get_tracking_id_from_mo(path)
+        if self.submit_context.get():
+            return self.submit(path, None, tracking_id, 'delete')
         try:
             self.logger.info(f'Deleting object from url: {path}, tracking_id: '
                              f'{tracking_id}')
-            self.add_tracking_id_to_headers(tracking_id)
-            delete_response = self.delete(path)
+            delete_response = self.delete(path, tracking_id=tracking_id)
             delete_response.raise_for_status()
             self.wait_for_job_completion(delete_response, path, 'delete')
             self.logger.info(f"Object deleted from the OneFuse database. "
@@ -1254,12 +2339,12 @@ class OneFuseManager(object):
             self.logger.debug(f'Getting object from url: {path}')
             get_response = self.get(path)
             get_response.raise_for_status()
-            get_json = get_response.json()
+            get_json = codec.loads_response(get_response)
             full_job_path = get_json["_links"]["jobMetadata"]["href"]
             job_path = full_job_path.replace('/api/v3/onefuse', '')
             job_response = self.get(job_path)
             job_response.raise_for_status()
-            job_json = job_response.json()
+            job_json = codec.loads_response(job_response)
             tracking_id = job_json["jobTrackingId"]
         except:
             self.logger.info('Tracking ID could not be determined for MO. '
@@ -1299,9 +2384,32 @@ class OneFuseManager(object):
         self.logger.debug(f'max_sleep_seconds: {max_sleep_seconds}')
         return max_sleep_seconds
 
+    def get_polling_strategy(self, path: str):
+        """
+        Return the PollingStrategy used to wait on jobs for a module. Looks
+        up the polling profile for the module the path belongs to, falling
+        back to the manager's default polling strategy
+
+        Parameters
+        ----------
+        path : str
+           OneFuse REST path of the job. Ex: '/customNames/' or
+           '/customNames/782/'
+        """
+        module_path = get_module_path(path)
+        try:
+            strategy = self.polling_profiles[module_path]
+        except KeyError:
+            strategy = self.polling_strategy
+        self.logger.debug(f'Polling strategy for {module_path}: {strategy}')
+        return strategy
+
     def add_tracking_id_to_headers(self, tracking_id: str = ""):
         """
-        Insert the OneFuse Tracking ID in to the headers for a request
+        Set the OneFuse Tracking ID sent with requests made from the current
+        thread (or asyncio task) that do not pass one explicitly. Other
+        threads sharing this manager are not affected. Methods taking a
+        tracking_id parameter send it with their own requests only
 
         Parameters
         ----------
@@ -1309,7 +2417,7 @@ class OneFuseManager(object):
             OneFuse Tracking ID.
         """
         if tracking_id is not None and tracking_id != "":
-            self.headers["Tracking-Id"] = tracking_id
+            self.tracking_id_context.set(tracking_id)
 
     def create_tracking_id(self):
         """
@@ -1320,20 +2428,39 @@ class OneFuseManager(object):
         self.logger.debug(f'Tracking id created: {tracking_id}')
         return tracking_id
 
+    def get_product_info(self):
+        """
+        Return the productInfo json of the OneFuse Appliance. It is fetched
+        on first use and memoized for the lifetime of the manager. The
+        policy cache shares it between managers for the same host
+        """
+        if self.product_info is not None:
+            return self.product_info
+        credentials = get_credential_fingerprint(self.username, self.password)
+        cache_key = (self.base_url, 'productInfo', None, None, credentials)
+        if self.policy_cache is not None:
+            cached = self.policy_cache.get(cache_key)
+            if cached is not None and not isinstance(cached, NegativeResult):
+                self.product_info = copy.deepcopy(cached)
+                return self.product_info
+        response = self.get('/productInfo')
+        response.raise_for_status()
+        response_json = codec.loads_response(response)
+        if self.policy_cache is not None:
+            self.policy_cache.set(cache_key, copy.deepcopy(response_json))
+        self.product_info = response_json
+        return response_json
+
     def get_onefuse_version(self):
         """
         Get the version of the current instantiated OneFuse Appliance
         """
-        response = self.get('/productInfo')
-        response.raise_for_status()
-        response_json = response.json()
+        response_json = self.get_product_info()
         version = response_json["version"]
         return version
 
     def get_onefuse_instance_id(self):
-        response = self.get('/productInfo')
-        response.raise_for_status()
-        response_json = response.json()
+        response_json = self.get_product_info()
         try:
             instance_id = response_json["instanceId"]
             return instance_id
@@ -1676,7 +2803,8 @@ class OneFuseManager(object):
         response_json = self.request(path, template, tracking_id)
         return response_json
 
-    def delete_ingested_object(self, id: str, ingest_type: str):
+    def delete_ingested_object(self, id: str, ingest_type: str,
+                               tracking_id: str = ""):
         """
         Delete an ingested object from OneFuse - The deleted object will be
         removed from the OneFuse database without deprovisioning.
@@ -1690,11 +2818,95 @@ class OneFuseManager(object):
             'scriptingDeployments', 'ansibleTowerDeployments', 'customNames',
             'ansibleTowerPolicy', 'dnsReservations', 'ipamReservations',
             'servicenowCMDBDeployments', 'servicenowConnectorDeployments'
+        tracking_id : str - optional
+            OneFuse Tracking ID of the object, when already known. Looked up
+            from the object if not passed
         """
         path = f"/{ingest_type}/{id}/ingest/"
-        response_json = self.deprovision_mo(path)
+        response_json = self.deprovision_mo(path, tracking_id)
         return response_json
 
+    def delete_ingested_many(self, ingested_objects: list,
+                             max_concurrency: int = 8):
+        """
+        Delete many ingested objects from OneFuse without deprovisioning
+        them, at most max_concurrency at a time. Tracking IDs found in the
+        objects are reused; the others are looked up concurrently. Returns a
+        onefuse.bulk.BulkItemResult per object, in input order, holding the
+        ingest path deleted or the object's error.
+
+        Example:
+            results = ofm.delete_ingested_many(
+                [(782, 'customNames'), ip_json, ad_json])
+
+        Parameters
+        ----------
+        ingested_objects : list
+            The objects' json as returned by OneFuse or an ingest method,
+            dicts with "id", "ingest_type" and optionally "tracking_id", or
+            (id, ingest_type) tuples
+        max_concurrency : int - optional
+            Maximum deletes submitted or running at once. Default 8
+        """
+        def delete_item(ingested_object):
+            path, tracking_id = get_ingested_object_reference(ingested_object)
+            if not tracking_id:
+                tracking_id = self.get_tracking_id_from_mo(path)
+            self.submit_context.set(True)
+            return self.deprovision_mo(f'{path}ingest/', tracking_id)
+
+        start_time = time.monotonic()
+        results = run_bulk(delete_item, ingested_objects, max_concurrency)
+        for result in results:
+            if result.ok:
+                result.result = get_ingested_object_reference(
+                    result.item)[0] + 'ingest/'
+        failed = sum(1 for result in results if not result.ok)
+        self.logger.info(f'delete_ingested_many: {len(results) - failed} '
+                         f'succeeded, {failed} failed in '
+                         f'{time.monotonic() - start_time:.1f} seconds')
+        return results
+
+    def move_ou_many(self, ad_objects: list, max_concurrency: int = 8):
+        """
+        Move many Active Directory objects from the build state to the final
+        OU/state, at most max_concurrency at a time. Objects passed as json
+        are not fetched again and their tracking IDs are reused. Returns a
+        onefuse.bulk.BulkItemResult per object, in input order, holding the
+        moved object's json or the object's error.
+
+        Example:
+            results = ofm.move_ou_many([ad_json for ad_json in built])
+            not_moved = [result.item for result in results if not result.ok]
+
+        Parameters
+        ----------
+        ad_objects : list
+            OneFuse IDs of the Active Directory objects, or their json as
+            returned by OneFuse or provision_ad
+        max_concurrency : int - optional
+            Maximum moves submitted or running at once. Default 8
+        """
+        def move_item(ad_object):
+            mo_json = None
+            tracking_id = ""
+            if isinstance(ad_object, dict):
+                path, tracking_id = get_managed_object_reference(ad_object)
+                ad_id = path.strip('/').split('/')[1]
+                mo_json = ad_object
+            else:
+                ad_id = ad_object
+            self.submit_context.set(True)
+            return self.move_ou(ad_id, mo_json, tracking_id)
+
+        start_time = time.monotonic()
+        results = run_bulk(move_item, ad_objects, max_concurrency)
+        failed = sum(1 for result in results if not result.ok)
+        self.logger.info(f'move_ou_many: {len(results) - failed} succeeded, '
+                         f'{failed} failed in '
+                         f'{time.monotonic() - start_time:.1f} seconds')
+        return results
+
 
 if __name__ == '__main__':
     username = sys.argv[1]  # 'OneFuse Username'
@@ -0,0 +1,1324 @@
+import asyncio
+import copy
+import logging
+import socket
+import sys
+from typing import List
+from . import codec
+from .admin import OneFuseManager
+from .cache import (POLICY_CACHE, RENDER_CACHE, RESOLVE_CACHE,
+                    NegativeResult)
+from .coalesce import AsyncSingleFlight
+from .exceptions import OneFuseError
+from .http_cache import get_credential_fingerprint
+from .polling import (DEFAULT_POLLING_PROFILES, DEFAULT_POLLING_STRATEGY,
+                      FixedPollingStrategy)
+from .rendering import (LocalRenderer, can_batch_render, contains_template,
+                        get_affected_properties, get_batch_delimiter,
+                        get_changed_properties, get_property_dependencies,
+                        get_template_strings, has_property_set_expansion,
+                        is_template, merge_resolved_properties)
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+# noinspection DuplicatedCode,PyBroadException
+class AsyncOneFuseManager(object):
+    """
+    An asyncio version of the OneFuseManager. Every policy execution method
+    of the OneFuseManager has an awaitable counterpart here, and job polling
+    uses asyncio.sleep rather than blocking the thread, so a single event
+    loop can keep thousands of OneFuse jobs in flight over one shared
+    connection pool. Requires the aiohttp package:
+
+        pip install onefuse[async]
+
+    Example 1 - Make custom REST calls to OneFuse:
+        from onefuse.async_admin import AsyncOneFuseManager
+        async with AsyncOneFuseManager(username, password, host) as ofm:
+            response = await ofm.get("/namingPolicies/")
+            policies = await response.json()
+
+    Example 2 - Provision many names concurrently:
+        from onefuse.async_admin import AsyncOneFuseManager
+        async with AsyncOneFuseManager(username, password, host) as ofm:
+            names = await asyncio.gather(*[
+                ofm.provision_naming(policy_name, template_properties)
+                for template_properties in stacks
+            ])
+    """
+
+    def __init__(self, username: str, password: str, host: str, **kwargs):
+        """
+        Instantiate the AsyncOneFuseManager. Accepts the same kwargs as the
+        OneFuseManager. No connection is made until the first request.
+
+        Accepted optional kwargs
+        ------------------------
+        source : str
+            default 'PYTHON' - Source shown for all OneFuse jobs
+        protocol : str
+            default 'https' - Allows to specify non-standard protocol
+        port : int
+            default 443 - Allows to specify non-standard port
+        verify_certs : bool
+            default False - Whether or not to verify OneFuse certs
+        log_level : str
+            default 'WARNING' - Valid options are: CRITICAL, ERROR, WARNING,
+            INFO, DEBUG
+        logger - allows you to pass in logger information
+        pool_maxsize : int
+            default 100 - Maximum number of simultaneous connections in the
+            shared connection pool
+        polling_strategy : onefuse.polling.PollingStrategy
+            Default back off while polling OneFuse jobs
+        polling_profiles : dict
+            Per-module PollingStrategy overrides keyed by module path
+        policy_cache : onefuse.cache.TTLCache
+            default onefuse.cache.POLICY_CACHE - Cache of policy lookups by
+            name. None disables it
+        product_info : dict
+            Preseed the productInfo json of the OneFuse appliance
+        local_render : bool
+            default False - Render standard Jinja2 templates in-process.
+            See onefuse.rendering.LocalRenderer
+        render_cache : onefuse.cache.TTLCache
+            default onefuse.cache.RENDER_CACHE - Cache of rendered template
+            values. None disables it
+        trim_properties : bool
+            default True - Send the template tester only the properties a
+            template depends on
+        resolve_cache : onefuse.cache.TTLCache
+            default onefuse.cache.RESOLVE_CACHE - Last resolved properties
+            stack per tracking ID. None disables incremental resolves
+        single_flight : onefuse.coalesce.AsyncSingleFlight
+            default a new AsyncSingleFlight - Identical GETs (same url,
+            credentials and tracking ID) made concurrently by several tasks
+            share one request and its response. None sends every GET
+        """
+        if aiohttp is None:
+            raise ImportError('The AsyncOneFuseManager requires aiohttp. '
+                              'Install it with: pip install onefuse[async]')
+        try:
+            source = kwargs["source"]
+        except KeyError:
+            source = "PYTHON"
+        try:
+            protocol = kwargs["protocol"]
+        except KeyError:
+            protocol = "https"
+        try:
+            port = kwargs["port"]
+        except KeyError:
+            port = 443
+        try:
+            verify_certs = kwargs["verify_certs"]
+        except KeyError:
+            verify_certs = False
+        try:
+            log_level = kwargs["log_level"]
+        except KeyError:
+            log_level = 'WARNING'
+        try:
+            logger = kwargs["logger"]
+        except KeyError:
+            numeric_level = getattr(logging, log_level.upper(), None)
+            if not isinstance(numeric_level, int):
+                raise ValueError('Invalid log level: %s' % log_level)
+            logging.basicConfig(level=numeric_level)
+            logger = logging.getLogger(__name__)
+        try:
+            pool_maxsize = kwargs["pool_maxsize"]
+        except KeyError:
+            pool_maxsize = 100
+        try:
+            polling_strategy = kwargs["polling_strategy"]
+        except KeyError:
+            polling_strategy = DEFAULT_POLLING_STRATEGY
+        try:
+            polling_profiles = kwargs["polling_profiles"]
+        except KeyError:
+            polling_profiles = {}
+        try:
+            policy_cache = kwargs["policy_cache"]
+        except KeyError:
+            policy_cache = POLICY_CACHE
+        try:
+            product_info = kwargs["product_info"]
+        except KeyError:
+            product_info = None
+        try:
+            local_render = kwargs["local_render"]
+        except KeyError:
+            local_render = False
+        try:
+            render_cache = kwargs["render_cache"]
+        except KeyError:
+            render_cache = RENDER_CACHE
+        try:
+            trim_properties = kwargs["trim_properties"]
+        except KeyError:
+            trim_properties = True
+        try:
+            resolve_cache = kwargs["resolve_cache"]
+        except KeyError:
+            resolve_cache = RESOLVE_CACHE
+        try:
+            single_flight = kwargs["single_flight"]
+        except KeyError:
+            single_flight = AsyncSingleFlight()
+        self.username = username
+        self.password = password
+        self.verify_certs = verify_certs
+        self.pool_maxsize = pool_maxsize
+        self.base_url = protocol + '://'
+        self.base_url += host
+        self.base_url += f':{port}'
+        self.base_url += '/api/v3/onefuse'
+        self.logger = logger
+        self.polling_strategy = polling_strategy
+        self.polling_profiles = dict(DEFAULT_POLLING_PROFILES)
+        self.polling_profiles.update(polling_profiles)
+        self.policy_cache = policy_cache
+        self.product_info = product_info
+        self.local_renderer = LocalRenderer(logger) if local_render else None
+        self.render_cache = render_cache
+        self.trim_properties = trim_properties
+        self.resolve_cache = resolve_cache
+        self.single_flight = single_flight
+        self.headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json',
+            'X-Origin-Host': socket.gethostname(),
+            'SOURCE': source
+        }
+        self.session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __repr__(self):
+        return 'AsyncOneFuseManager'
+
+    # Methods that do no I/O are shared with the OneFuseManager
+    get_max_sleep = OneFuseManager.get_max_sleep
+    get_polling_strategy = OneFuseManager.get_polling_strategy
+    create_tracking_id = OneFuseManager.create_tracking_id
+    get_create_properties = OneFuseManager.get_create_properties
+    get_job_result = OneFuseManager.get_job_result
+    get_policy_cache_key = OneFuseManager.get_policy_cache_key
+    invalidate_policy_cache = OneFuseManager.invalidate_policy_cache
+    get_render_cache_key = OneFuseManager.get_render_cache_key
+
+    def get_session(self):
+        """
+        Return the shared aiohttp session, creating it on first use. The
+        session must be created from within a running event loop.
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize,
+                                             ssl=None if self.verify_certs
+                                             else False)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                auth=aiohttp.BasicAuth(self.username, self.password)
+            )
+        return self.session
+
+    async def close(self):
+        """
+        Close the aiohttp session and release all pooled connections
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def send(self, method: str, path: str, tracking_id: str = "",
+                   **kwargs):
+        """
+        Send a request to OneFuse and return the aiohttp response with its
+        body already read, so .json() and .text() may be awaited after the
+        connection has been returned to the pool.
+
+        Parameters
+        ----------
+        method : str
+            HTTP method. ex: 'get'
+        path : str
+            OneFuse REST path. ex: '/namingPolicies/'
+        tracking_id : str - optional
+            OneFuse Tracking ID to send with this request only
+        """
+        headers = dict(self.headers)
+        if tracking_id is not None and tracking_id != "":
+            headers["Tracking-Id"] = tracking_id
+        if kwargs.get('json') is not None:
+            # Encode json bodies with the fast codec. The manager's headers
+            # already declare the Content-Type
+            kwargs['data'] = codec.dumps_bytes(kwargs.pop('json'))
+        if method.lower() == 'get' and not kwargs and \
+                self.single_flight is not None:
+            # The shared request carries one Tracking-Id and the manager's
+            # credentials, so only GETs with the same of both are coalesced
+            return await self.single_flight.do(
+                ('GET', self.base_url + path,
+                 get_credential_fingerprint(self.username, self.password),
+                 headers.get("Tracking-Id")),
+                lambda: self.send_request(method, path, headers))
+        return await self.send_request(method, path, headers, **kwargs)
+
+    async def send_request(self, method: str, path: str, headers: dict,
+                           **kwargs):
+        session = self.get_session()
+        async with session.request(method.upper(), self.base_url + path,
+                                   headers=headers, **kwargs) as response:
+            await response.read()
+            return response
+
+    async def get(self, path: str, **kwargs):
+        return await self.send('get', path, **kwargs)
+
+    async def post(self, path: str, **kwargs):
+        return await self.send('post', path, **kwargs)
+
+    async def put(self, path: str, **kwargs):
+        return await self.send('put', path, **kwargs)
+
+    async def delete(self, path: str, **kwargs):
+        return await self.send('delete', path, **kwargs)
+
+    async def get_json(self, path: str):
+        """
+        GET a OneFuse path, raise for errors and return the parsed json
+
+        Parameters
+        ----------
+        path : str
+            OneFuse REST path. ex: '/productInfo'
+        """
+        response = await self.get(path)
+        response.raise_for_status()
+        return await response.json(content_type=None, loads=codec.loads)
+
+    # AD Functions:
+    async def provision_ad(self, policy_name: str, template_properties: dict,
+                           name: str, tracking_id: str = ""):
+        """
+        Provision an Active Directory Object. See OneFuseManager.provision_ad
+        """
+        rendered_policy_name = await self.render(policy_name,
+                                                 template_properties)
+        policy_path = 'microsoftADPolicies'
+        policy_json = await self.get_policy_by_name(policy_path,
+                                                    rendered_policy_name)
+        links = policy_json["_links"]
+        policy_url = links["self"]["href"]
+        workspace_url = links["workspace"]["href"]
+        template = {
+            "policy": policy_url,
+            "templateProperties": template_properties,
+            "workspace": workspace_url,
+            "name": name,
+        }
+        url = "/microsoftADComputerAccounts/"
+        return await self.request(url, template, tracking_id)
+
+    async def deprovision_ad(self, ad_id: int):
+        """
+        De-Provision an Active Directory Object. See
+        OneFuseManager.deprovision_ad
+        """
+        path = f'/microsoftADComputerAccounts/{ad_id}/'
+        await self.deprovision_mo(path)
+        return path
+
+    async def move_ou(self, ad_id: int):
+        """
+        Move an Active Directory object currently in the build state to the
+        final OU/state. See OneFuseManager.move_ou
+        """
+        path = f'/microsoftADComputerAccounts/{ad_id}/'
+        get_response = await self.get_json(path)
+        state = get_response["state"]
+        if state != 'build':
+            msg = (f'Active Directory object is in {state} state this method '
+                   f'only moves objects from "build" to "final"')
+            raise OneFuseError(msg)
+        final_ou = get_response["finalOu"]
+        name = get_response["name"]
+        workspace_url = get_response["_links"]["workspace"]["href"]
+        tracking_id = await self.get_tracking_id_from_mo(path)
+        template = {
+            "workspace": workspace_url,
+            "state": "final"
+        }
+        self.logger.info(f'Moving AD object: {name} to final OU: {final_ou}')
+        response_json = await self.request(path, template, tracking_id, "put")
+        self.logger.info(f"AD object was successfully moved to the final OU. "
+                         f"AD: {name}, OU: {final_ou}")
+        return response_json
+
+    # Ansible Tower Functions
+    async def provision_ansible_tower(self, policy_name: str,
+                                      template_properties: dict,
+                                      hosts: str = '', limit: str = '',
+                                      tracking_id: str = ""):
+        """
+        Provision an Ansible Tower Deployment. See
+        OneFuseManager.provision_ansible_tower
+        """
+        rendered_policy_name = await self.render(policy_name,
+                                                 template_properties)
+        policy_path = 'ansibleTowerPolicies'
+        policy_json = await self.get_policy_by_name(policy_path,
+                                                    rendered_policy_name)
+        links = policy_json["_links"]
+        policy_url = links["self"]["href"]
+        workspace_url = links["workspace"]["href"]
+        hosts_arr = []
+        if hosts:
+            rendered_hosts = await self.render(hosts, template_properties)
+            for host in rendered_hosts.split(','):
+                hosts_arr.append(host.strip())
+        if limit:
+            rendered_limit = await self.render(limit, template_properties)
+        else:
+            rendered_limit = ''
+        template = {
+            "policy": policy_url,
+            "workspace": workspace_url,
+            "templateProperties": template_properties,
+            "hosts": hosts_arr,
+            "limit": rendered_limit
+        }
+        path = "/ansibleTowerDeployments/"
+        return await self.request(path, template, tracking_id)
+
+    async def deprovision_ansible_tower(self, at_id: int):
+        """
+        De-Provision an Ansible Tower Object. See
+        OneFuseManager.deprovision_ansible_tower
+        """
+        path = f'/ansibleTowerDeployments/{at_id}/'
+        await self.deprovision_mo(path)
+        return path
+
+    # DNS Functions
+    async def provision_dns(self, policy_name: str, template_properties: dict,
+                            name: str, value: str, zones: list,
+                            tracking_id: str = ""):
+        """
+        Provision an DNS Reservation. See OneFuseManager.provision_dns
+        """
+        rendered = await self.render_many([policy_name] + list(zones),
+                                          template_properties)
+        rendered_policy_name = rendered[0]
+        rendered_zones = rendered[1:]
+        policy_path = 'dnsPolicies'
+        policy_json = await self.get_policy_by_name(policy_path,
+                                                    rendered_policy_name)
+        links = policy_json["_links"]
+        policy_url = links["self"]["href"]
+        workspace_url = links["workspace"]["href"]
+        template = {
+            "policy": policy_url,
+            "templateProperties": template_properties,
+            "workspace": workspace_url,
+            "name": name,
+            "value": value,
+            "zones": list(rendered_zones)
+        }
+        path = "/dnsReservations/"
+        return await self.request(path, template, tracking_id)
+
+    async def deprovision_dns(self, dns_id: int):
+        """
+        De-Provision a DNS Reservation. See OneFuseManager.deprovision_dns
+        """
+        path = f'/dnsReservations/{dns_id}/'
+        await self.deprovision_mo(path)
+        return path
+
+    # IPAM Functions
+    async def provision_ipam(self, policy_name: str,
+                             template_properties: dict, hostname: str,
+                             tracking_id: str = ""):
+        """
+        Provision an IPAM Reservation. See OneFuseManager.provision_ipam
+        """
+        rendered_policy_name = await self.render(policy_name,
+                                                 template_properties)
+        policy_path = 'ipamPolicies'
+        policy_json = await self.get_policy_by_name(policy_path,
+                                                    rendered_policy_name)
+        links = policy_json["_links"]
+        policy_url = links["self"]["href"]
+        workspace_url = links["workspace"]["href"]
+        template = {
+            "policy": policy_url,
+            "templateProperties": template_properties,
+            "workspace": workspace_url,
+            "hostname": hostname
+        }
+        path = "/ipamReservations/"
+        return await self.request(path, template, tracking_id)
+
+    async def deprovision_ipam(self, ipam_id: int):
+        """
+        De-Provision an IPAM Reservation. See OneFuseManager.deprovision_ipam
+        """
+        path = f'/ipamReservations/{ipam_id}/'
+        await self.deprovision_mo(path)
+        return path
+
+    # Pluggable Modules
+    async def provision_module(self, policy_name: str,
+                               template_properties: dict,
+                               tracking_id: str = ""):
+        """
+        Provision a managed object by executing a OneFuse Pluggable Module.
+        See OneFuseManager.provision_module
+        """
+        rendered_policy_name = await self.render(policy_name,
+                                                 template_properties)
+        policy_path = 'modulePolicies'
+        policy_json = await self.get_policy_by_name(policy_path,
+                                                    rendered_policy_name)
+        links = policy_json["_links"]
+        policy_url = links["self"]["href"]
+        workspace_url = links["workspace"]["href"]
+        template = {
+            "policy": policy_url,
+            "templateProperties": template_properties,
+            "workspace": workspace_url,
+        }
+        path = '/moduleManagedObjects/'
+        return await self.request(path, template, tracking_id)
+
+    async def deprovision_module(self, mo_id: int):
+        """
+        De-Provision a Pluggable Module Managed Object. See
+        OneFuseManager.deprovision_module
+        """
+        path = f'/moduleManagedObjects/{mo_id}/'
+        await self.deprovision_mo(path)
+        return path
+
+    # Naming Functions
+    async def provision_naming(self, policy_name: str,
+                               template_properties: dict,
+                               tracking_id: str = ""):
+        """
+        Provision a Name. See OneFuseManager.provision_naming
+        """
+        rendered_policy_name = await self.render(policy_name,
+                                                 template_properties)
+        policy_path = 'namingPolicies'
+        policy_json = await self.get_policy_by_name(policy_path,
+                                                    rendered_policy_name)
+        links = policy_json["_links"]
+        policy_url = links["self"]["href"]
+        workspace_url = links["workspace"]["href"]
+        template = {
+            "policy": policy_url,
+            "templateProperties": template_properties,
+            "workspace": workspace_url,
+        }
+        path = "/customNames/"
+        return await self.request(path, template, tracking_id)
+
+    async def deprovision_naming(self, name_id: int):
+        """
+        De-Provision a Name. See OneFuseManager.deprovision_naming
+        """
+        path = f'/customNames/{name_id}/'
+        await self.deprovision_mo(path)
+        return path
+
+    # Scripting
+    async def provision_scripting(self, policy_name: str,
+                                  template_properties: dict,
+                                  tracking_id: str = ""):
+        """
+        Provision a Scripting Deployment. See
+        OneFuseManager.provision_scripting
+        """
+        rendered_policy_name = await self.render(policy_name,
+                                                 template_properties)
+        policy_path = 'scriptingPolicies'
+        policy_json = await self.get_policy_by_name(policy_path,
+                                                    rendered_policy_name)
+        links = policy_json["_links"]
+        policy_url = links["self"]["href"]
+        workspace_url = links["workspace"]["href"]
+        template = {
+            "policy": policy_url,
+            "templateProperties": template_properties,
+            "workspace": workspace_url,
+        }
+        path = "/scriptingDeployments/"
+        return await self.request(path, template, tracking_id)
+
+    async def deprovision_scripting(self, script_id: int):
+        """
+        De-Provision an Scripting Deployment. See
+        OneFuseManager.deprovision_scripting
+        """
+        path = f'/scriptingDeployments/{script_id}/'
+        await self.deprovision_mo(path)
+        return path
+
+    # ServiceNow CMDB Functions
+    async def provision_cmdb(self, policy_name: str,
+                             template_properties: dict,
+                             tracking_id: str = ""):
+        """
+        Provision a ServiceNow CMDB Deployment. See
+        OneFuseManager.provision_cmdb
+        """
+        rendered_policy_name = await self.render(policy_name,
+                                                 template_properties)
+        policy_path = 'servicenowCMDBPolicies'
+        policy_json = await self.get_policy_by_name(policy_path,
+                                                    rendered_policy_name)
+        links = policy_json["_links"]
+        policy_url = links["self"]["href"]
+        workspace_url = links["workspace"]["href"]
+        template = {
+            "policy": policy_url,
+            "templateProperties": template_properties,
+            "workspace": workspace_url,
+        }
+        path = "/servicenowCMDBDeployments/"
+        return await self.request(path, template, tracking_id)
+
+    async def update_cmdb(self, template_properties: dict, cmdb_id: int):
+        """
+        Update a ServiceNow CMDB Deployment. See OneFuseManager.update_cmdb
+        """
+        path = f'/servicenowCMDBDeployments/{cmdb_id}/'
+        current_json = await self.get_json(path)
+        tracking_id = await self.get_tracking_id_from_mo(path)
+        template = {
+            "policy": current_json["_links"]["policy"]["href"],
+            "templateProperties": template_properties,
+            "workspace": current_json["_links"]["workspace"]["href"],
+        }
+        return await self.request(path, template, tracking_id, 'put')
+
+    async def deprovision_cmdb(self, cmdb_id: int):
+        """
+        De-Provision a ServiceNow CMDB Deployment. See
+        OneFuseManager.deprovision_cmdb
+        """
+        path = f'/servicenowCMDBDeployments/{cmdb_id}/'
+        await self.deprovision_mo(path)
+        return path
+
+    # vRealize Automation Functions
+    async def provision_vra(self, policy_name: str, template_properties: dict,
+                            deployment_name: str, tracking_id: str = ""):
+        """
+        Provision a OneFuse vRA Deployment. See OneFuseManager.provision_vra
+        """
+        rendered_policy_name, rendered_deployment_name = await asyncio.gather(
+            self.render(policy_name, template_properties),
+            self.render(deployment_name, template_properties)
+        )
+        policy_path = 'vraPolicies'
+        policy_json = await self.get_policy_by_name(policy_path,
+                                                    rendered_policy_name)
+        links = policy_json["_links"]
+        policy_url = links["self"]["href"]
+        workspace_url = links["workspace"]["href"]
+        template = {
+            "policy": policy_url,
+            "templateProperties": template_properties,
+            "workspace": workspace_url,
+            "deploymentName": rendered_deployment_name
+        }
+        path = '/vraDeployments/'
+        return await self.request(path, template, tracking_id)
+
+    async def deprovision_vra(self, vra_id: int):
+        """
+        De-Provision a vRA Deployment. See OneFuseManager.deprovision_vra
+        """
+        path = f'/vraDeployments/{vra_id}/'
+        await self.deprovision_mo(path)
+        return path
+
+    # Utilities
+    async def render(self, template: str, template_properties: dict,
+                     return_type: str = "value"):
+        """
+        Leverage the OneFuse template tester to render any jinja2 syntax.
+        See OneFuseManager.render
+        """
+        try:
+            if type(template) != str:
+                return template
+            if template.find('{%') == -1 and template.find('{{') == -1:
+                return template
+            if self.local_renderer is not None and return_type == "value":
+                rendered = self.local_renderer.render(template,
+                                                      template_properties)
+                if rendered is not LocalRenderer.NOT_RENDERED:
+                    return rendered
+            cache_key = None
+            if return_type == "value":
+                cache_key = self.get_render_cache_key(template,
+                                                      template_properties)
+                if cache_key is not None:
+                    cached = self.render_cache.get(cache_key)
+                    if cached is not None:
+                        return cached
+            if return_type == "value":
+                template_properties = \
+                    await self.get_template_tester_properties(
+                        [template], template_properties)
+            json_template = {
+                "template": template,
+                "templateProperties": template_properties,
+            }
+            response = await self.post("/templateTester/", json=json_template)
+            response.raise_for_status()
+            response_json = await response.json(content_type=None,
+                                                loads=codec.loads)
+            rendered = response_json.get(return_type)
+            if cache_key is not None and rendered is not None:
+                self.render_cache.set(cache_key, rendered)
+            return rendered
+        except:
+            error_string = (
+                f'Error: {sys.exc_info()[0]}. {sys.exc_info()[1]}, '
+                f'line: {sys.exc_info()[2].tb_lineno}. Template: '
+                f'{template}')
+            self.logger.error(error_string)
+            raise
+
+    async def render_many(self, templates, template_properties: dict,
+                          max_batch_size: int = 100):
+        """
+        Render many templates in as few template tester calls as possible.
+        See OneFuseManager.render_many
+        """
+        if isinstance(templates, dict):
+            rendered = await self.render_many(list(templates.values()),
+                                              template_properties,
+                                              max_batch_size)
+            return dict(zip(templates.keys(), rendered))
+        rendered = list(templates)
+        batched = []
+        alone = []
+        for index, template in enumerate(templates):
+            if not is_template(template):
+                continue
+            if self.local_renderer is not None:
+                value = self.local_renderer.render(template,
+                                                   template_properties)
+                if value is not LocalRenderer.NOT_RENDERED:
+                    rendered[index] = value
+                    continue
+            if not can_batch_render(template):
+                alone.append(index)
+                continue
+            cache_key = self.get_render_cache_key(template,
+                                                  template_properties)
+            if cache_key is not None:
+                cached = self.render_cache.get(cache_key)
+                if cached is not None:
+                    rendered[index] = cached
+                    continue
+            batched.append((index, cache_key))
+        batches = [batched[start:start + max_batch_size]
+                   for start in range(0, len(batched), max_batch_size)]
+        results = await asyncio.gather(
+            *[self.render(templates[index], template_properties)
+              for index in alone],
+            *[self.render_batch([templates[i] for i, _ in batch],
+                                template_properties)
+              for batch in batches])
+        for index, value in zip(alone, results):
+            rendered[index] = value
+        for batch, values in zip(batches, results[len(alone):]):
+            for (index, cache_key), value in zip(batch, values):
+                rendered[index] = value
+                if cache_key is not None and value is not None:
+                    self.render_cache.set(cache_key, value)
+        return rendered
+
+    async def render_batch(self, templates: list, template_properties: dict):
+        """
+        Render a list of templates in a single template tester call. See
+        OneFuseManager.render_batch
+        """
+        if len(templates) == 1:
+            return [await self.render(templates[0], template_properties)]
+        delimiter = get_batch_delimiter(templates)
+        json_template = {
+            "template": delimiter.join(templates),
+            "templateProperties": await self.get_template_tester_properties(
+                templates, template_properties),
+        }
+        try:
+            response = await self.post("/templateTester/", json=json_template)
+            if response.ok:
+                response_json = await response.json(content_type=None,
+                                                    loads=codec.loads)
+                value = response_json.get("value")
+                if type(value) == str:
+                    values = value.split(delimiter)
+                    if len(values) == len(templates):
+                        return values
+        except Exception:
+            pass
+        self.logger.debug(f'Batch render of {len(templates)} templates '
+                          f'failed, rendering them one at a time')
+        return list(await asyncio.gather(
+            *[self.render(template, template_properties)
+              for template in templates]))
+
+    async def get_template_tester_properties(self, templates: list,
+                                             template_properties: dict,
+                                             resolve_all: bool = False):
+        """
+        Return the part of a properties stack the template tester needs to
+        render the templates. See
+        OneFuseManager.get_template_tester_properties
+        """
+        if not self.trim_properties or not template_properties:
+            return template_properties
+        property_sets = {}
+        try:
+            while True:
+                keys, missing = get_property_dependencies(
+                    templates, template_properties, property_sets)
+                if keys is None:
+                    return template_properties
+                if not missing:
+                    break
+                missing = list(missing)
+                sps_jsons = await asyncio.gather(
+                    *[self.get_policy_by_name('propertySets', sps_name)
+                      for sps_name in missing])
+                for sps_name, sps_json in zip(missing, sps_jsons):
+                    property_sets[sps_name] = sps_json["properties"]
+        except Exception:
+            self.logger.debug(f'Could not determine template dependencies, '
+                              f'sending all properties. Error: '
+                              f'{sys.exc_info()[0]}. {sys.exc_info()[1]}')
+            return template_properties
+        return {key: value for key, value in template_properties.items()
+                if key in keys or (resolve_all and (
+                    is_template(key) or contains_template(value)))}
+
+    async def resolve_properties(self, template_properties: dict,
+                                 tracking_id: str = ""):
+        """
+        Leverage the OneFuse template tester to render an entire template
+        properties stack. See OneFuseManager.resolve_properties
+        """
+        if tracking_id and self.resolve_cache is not None:
+            return await self.resolve_changed_properties(template_properties,
+                                                         tracking_id)
+        try:
+            templates = list(get_template_strings(template_properties))
+            sent_properties = await self.get_template_tester_properties(
+                templates, template_properties, resolve_all=True)
+            json_template = {
+                "template": "",
+                "templateProperties": sent_properties,
+            }
+            response = await self.post("/templateTester/", json=json_template)
+            response.raise_for_status()
+            response_json = await response.json(content_type=None,
+                                                loads=codec.loads)
+            resolved_properties = response_json.get("resolvedProperties")
+            if sent_properties is template_properties or \
+                    resolved_properties is None:
+                return resolved_properties
+            merged_properties = {}
+            for key, value in template_properties.items():
+                if key not in sent_properties:
+                    merged_properties[key] = value
+                elif key in resolved_properties:
+                    merged_properties[key] = resolved_properties[key]
+            for key, value in resolved_properties.items():
+                if key not in merged_properties:
+                    merged_properties[key] = value
+            return merged_properties
+        except:
+            error_string = (
+                f'Error: {sys.exc_info()[0]}. {sys.exc_info()[1]}, '
+                f'line: {sys.exc_info()[2].tb_lineno}.')
+            self.logger.error(error_string)
+            raise
+
+    async def resolve_changed_properties(self, template_properties: dict,
+                                         tracking_id: str):
+        """
+        Resolve a properties stack, reusing the result of the last resolve
+        for the same tracking ID. See
+        OneFuseManager.resolve_changed_properties
+        """
+        cache_key = (self.base_url, 'resolvedProperties', 'trackingId',
+                     tracking_id,
+                     get_credential_fingerprint(self.username, self.password))
+        previous = self.resolve_cache.get(cache_key)
+        changed = None
+        if isinstance(previous, dict):
+            changed = get_changed_properties(
+                previous["templateProperties"], template_properties)
+        if changed and has_property_set_expansion(template_properties):
+            expansion_properties = await self.get_template_tester_properties(
+                [], template_properties)
+            if expansion_properties is template_properties or \
+                    not changed.isdisjoint(expansion_properties):
+                changed = None
+        if changed is None:
+            resolved_properties = await self.resolve_properties(
+                template_properties)
+        elif not changed:
+            resolved_properties = previous["resolvedProperties"]
+        else:
+            affected, required = get_affected_properties(changed,
+                                                         template_properties)
+            resolved_properties = await self.resolve_properties(
+                {key: value for key, value in template_properties.items()
+                 if key in required})
+            if resolved_properties is not None:
+                resolved_properties = merge_resolved_properties(
+                    previous["resolvedProperties"], resolved_properties,
+                    affected)
+        if resolved_properties is not None:
+            self.resolve_cache.set(cache_key, copy.deepcopy({
+                "templateProperties": template_properties,
+                "resolvedProperties": resolved_properties,
+            }))
+        return copy.deepcopy(resolved_properties)
+
+    async def get_job_json(self, job_id: int):
+        """
+        Return the json payload for a OneFuse Job ID
+
+        Parameters
+        ----------
+        job_id : str
+            The Job ID to return the job payload for
+        """
+        response = await self.get(f'/jobMetadata/{job_id}/')
+        return await response.json(content_type=None, loads=codec.loads)
+
+    async def wait_for_job_completion(self, job_response, path: str,
+                                      method: str, sleep_seconds: int = None):
+        """
+        Poll a OneFuse job until completion without blocking the event loop.
+        Raise a TimeoutError when the max timeout per module is exceeded.
+        Returns the json for the OneFuse Managed Object that was created.
+
+        Parameters
+        ----------
+        job_response : aiohttp.ClientResponse
+            The response returned by send() for a OneFuse Job request
+        path : str
+            The REST path for the policy executed. ex: '/customNames/'
+        method : str
+            The type of method called for the original job. ex: "put"
+        sleep_seconds : int - optional
+            Poll on this fixed interval instead of using the polling strategy
+            for the module
+        """
+        response_json = await job_response.json(content_type=None,
+                                                loads=codec.loads)
+        response_status = job_response.status
+        self.logger.debug(f'OneFuse Post Response status: {response_status}')
+        # Async returns a 202
+        if response_status == 202:
+            job_id = response_json["id"]
+            if sleep_seconds is not None:
+                strategy = FixedPollingStrategy(sleep_seconds)
+            else:
+                strategy = self.get_polling_strategy(path)
+            delays = strategy.delays()
+            loop = asyncio.get_running_loop()
+            start_time = loop.time()
+            max_sleep = self.get_max_sleep(path)
+            job_json = await self.get_job_json(job_id)
+            job_state = job_json["jobState"]
+            while job_state != 'Successful' and job_state != 'Failed':
+                delay = next(delays)
+                self.logger.debug(
+                    f'Waiting for job completion. Sleeping for {delay:.2f}'
+                    f' seconds. Job state: {job_state}')
+                await asyncio.sleep(delay)
+                if loop.time() - start_time > max_sleep:
+                    raise TimeoutError(f'Action timeout. OneFuse job exceeded '
+                                       f'{max_sleep} seconds')
+                job_json = await self.get_job_json(job_id)
+                job_state = job_json["jobState"]
+            mo_json = self.get_job_result(job_json, method)
+        # Non-Async (ex: SPS) Returns a 201
+        else:
+            if method == 'delete':
+                return None
+            mo_json = response_json
+            mo_json["trackingId"] = job_response.headers["Tracking-Id"]
+
+        return mo_json
+
+    async def request(self, path: str, template: dict, tracking_id: str = "",
+                      method: str = 'post', **kwargs):
+        """
+        Submit a POST/PUT request to OneFuse and await job completion. See
+        OneFuseManager.request
+
+        Accepted kwargs
+        ---------------
+        sleep_seconds : int
+            Poll the job on this fixed interval instead of using the polling
+            strategy for the module
+        """
+        self.logger.debug(f'Submitting {method} request to path: {path} with '
+                          f' template_properties: {template}')
+        if method not in ['post', 'put']:
+            raise OneFuseError(
+                f'This action only supports post and put calls. '
+                f'Requested method: {method}')
+        response = await self.send(method, path, tracking_id, json=template)
+        if response.status >= 400:
+            err_msg = (f'Request failed for path: {path}, Error: '
+                       f'{response.status} {response.reason}. Messages: ')
+            try:
+                errors = (await response.json(content_type=None,
+                                               loads=codec.loads))["errors"]
+                err_msg += ','.join(error["message"] for error in errors)
+            except Exception:
+                err_msg += await response.text()
+            raise OneFuseError(err_msg, response=response)
+        try:
+            sleep_seconds = kwargs["sleep_seconds"]
+        except KeyError:
+            sleep_seconds = None
+        mo_json = await self.wait_for_job_completion(response, path, method,
+                                                     sleep_seconds)
+        self.logger.debug(f'mo_json: {mo_json}')
+        return mo_json
+
+    async def get_object_by_unique_field(self, resource_path: str,
+                                         field_value: str, field: str):
+        """
+        Get any OneFuse object by a unique field value. See
+        OneFuseManager.get_object_by_unique_field
+        """
+        cache_key = self.get_policy_cache_key(resource_path, field_value,
+                                              field)
+        if self.policy_cache is not None:
+            cached = self.policy_cache.get(cache_key)
+            if isinstance(cached, NegativeResult):
+                raise OneFuseError(cached.message)
+            if cached is not None:
+                return copy.deepcopy(cached)
+        path = f'/{resource_path}/?filter={field}.iexact:"{field_value}"'
+        policies_json = await self.get_json(path)
+
+        if policies_json["count"] > 1:
+            raise OneFuseError(f"More than one policy was returned matching "
+                               f"the name: {field_value}. Response: "
+                               f"{codec.dumps(policies_json)}")
+
+        if policies_json["count"] == 0:
+            err_msg = (f"No policies were returned matching the "
+                       f"name: {field_value}. Response: "
+                       f"{codec.dumps(policies_json)}")
+            if self.policy_cache is not None:
+                self.policy_cache.set_negative(cache_key, err_msg)
+            raise OneFuseError(err_msg)
+        policy_json = policies_json["_embedded"][resource_path][0]
+        if self.policy_cache is not None:
+            self.policy_cache.set(cache_key, copy.deepcopy(policy_json))
+        return policy_json
+
+    async def get_policy_by_name(self, policy_path: str, policy_name: str):
+        """
+        Return a OneFuse Policy JSON by Name
+
+        Parameters
+        ----------
+        policy_path : str
+            OneFuse REST path to policy type. Ex: 'namingPolicies'
+        policy_name : str
+            Name of the Policy to return. Ex: 'Production'
+        """
+        return await self.get_object_by_unique_field(policy_path, policy_name,
+                                                     "name")
+
+    async def deprovision_mo(self, path: str):
+        """
+        De-provision a OneFuse Managed Object and wait for completion
+
+        Parameters
+        ----------
+        path : str
+            Complete path to the object to delete to include ID.
+            Ex: '/customNames/782/'
+        """
+        tracking_id = await self.get_tracking_id_from_mo(path)
+        try:
+            self.logger.info(f'Deleting object from url: {path}, tracking_id: '
+                             f'{tracking_id}')
+            delete_response = await self.delete(path,
+                                                tracking_id=tracking_id)
+            delete_response.raise_for_status()
+            await self.wait_for_job_completion(delete_response, path,
+                                               'delete')
+            self.logger.info(f"Object deleted from the OneFuse database. "
+                             f"Path: {path}")
+        except:
+            self.logger.error(f'Deprovision failed for path: {path} '
+                              f'Error: {sys.exc_info()[0]}. {sys.exc_info()[1]}'
+                              f', line: {sys.exc_info()[2].tb_lineno}')
+            raise
+
+    async def get_tracking_id_from_mo(self, path: str):
+        """
+        Get the OneFuse Tracking ID from a Managed Object
+
+        Parameters
+        ----------
+        path : str
+            Complete path to the object to the MO to include ID.
+            Ex: '/customNames/782/'
+        """
+        try:
+            self.logger.debug(f'Getting object from url: {path}')
+            get_json = await self.get_json(path)
+            full_job_path = get_json["_links"]["jobMetadata"]["href"]
+            job_path = full_job_path.replace('/api/v3/onefuse', '')
+            job_json = await self.get_json(job_path)
+            tracking_id = job_json["jobTrackingId"]
+        except Exception:
+            self.logger.info('Tracking ID could not be determined for MO. '
+                             'OneFuse will create a Tracking ID')
+            tracking_id = ""
+        return tracking_id
+
+    async def get_product_info(self):
+        """
+        Return the productInfo json of the OneFuse Appliance, fetched on
+        first use and memoized. See OneFuseManager.get_product_info
+        """
+        if self.product_info is not None:
+            return self.product_info
+        credentials = get_credential_fingerprint(self.username, self.password)
+        cache_key = (self.base_url, 'productInfo', None, None, credentials)
+        if self.policy_cache is not None:
+            cached = self.policy_cache.get(cache_key)
+            if cached is not None and not isinstance(cached, NegativeResult):
+                self.product_info = copy.deepcopy(cached)
+                return self.product_info
+        response_json = await self.get_json('/productInfo')
+        if self.policy_cache is not None:
+            self.policy_cache.set(cache_key, copy.deepcopy(response_json))
+        self.product_info = response_json
+        return response_json
+
+    async def get_onefuse_version(self):
+        """
+        Get the version of the current instantiated OneFuse Appliance
+        """
+        response_json = await self.get_product_info()
+        return response_json["version"]
+
+    async def get_onefuse_instance_id(self):
+        response_json = await self.get_product_info()
+        try:
+            return response_json["instanceId"]
+        except KeyError:
+            self.logger.info(f'Unable to return Instance ID, version is < '
+                             f'1.4')
+            return None
+
+    # Ingest Functions
+    async def ingest_policy_object(self, policy_path: str, policy_name: str,
+                                   path: str, template: dict,
+                                   tracking_id: str = ""):
+        """
+        Resolve an ingest policy by name, add its links to the template and
+        submit the ingest request
+
+        Parameters
+        ----------
+        policy_path : str
+            OneFuse REST path to policy type. Ex: 'namingPolicies'
+        policy_name : str
+            Name of the Policy to ingest against
+        path : str
+            Ingest REST path. Ex: '/customNames/ingest/'
+        template : dict
+            Ingest payload without the policy and workspace links
+        tracking_id : str - optional
+            OneFuse Tracking ID
+        """
+        policy_json = await self.get_policy_by_name(policy_path, policy_name)
+        links = policy_json["_links"]
+        template = dict(template)
+        template["policy"] = links["self"]["href"]
+        template["workspace"] = links["workspace"]["href"]
+        return await self.request(path, template, tracking_id)
+
+    async def ingest_name(self, policy_name: str, name: str,
+                          dns_suffix: str = "",
+                          template_properties: dict = None,
+                          tracking_id: str = ""):
+        """
+        Ingest an existing name to OneFuse. See OneFuseManager.ingest_name
+        """
+        template = {
+            "name": name,
+            "dnsSuffix": dns_suffix,
+            "templateProperties": template_properties
+        }
+        return await self.ingest_policy_object(
+            'namingPolicies', policy_name, "/customNames/ingest/", template,
+            tracking_id)
+
+    async def ingest_dns_reservation(self, policy_name: str, name: str,
+                                     records: List[dict],
+                                     template_properties: dict = None,
+                                     tracking_id: str = ""):
+        """
+        Ingest an existing DNS Reservation to OneFuse. See
+        OneFuseManager.ingest_dns_reservation
+        """
+        for record in records:
+            if record["type"] not in ["a", "ptr", "host"]:
+                raise ValueError(f"Invalid DNS record type: {record['type']}")
+        template = {
+            "name": name,
+            "records": records,
+            "templateProperties": template_properties
+        }
+        return await self.ingest_policy_object(
+            'dnsPolicies', policy_name, "/dnsReservations/ingest/", template,
+            tracking_id)
+
+    async def ingest_ip_address(self, policy_name: str, ip_address: str,
+                                hostname: str, subnet: str,
+                                primary_dns: str = None,
+                                secondary_dns: str = None,
+                                dns_suffix: str = None,
+                                dns_search_suffixes: str = None,
+                                gateway: str = None, netmask: str = None,
+                                network: str = None,
+                                template_properties: dict = None,
+                                nic_label: str = None, tracking_id: str = ""):
+        """
+        Ingest an existing IP Address to OneFuse. See
+        OneFuseManager.ingest_ip_address
+        """
+        template = {
+            "ipAddress": ip_address,
+            "hostname": hostname,
+            "primaryDns": primary_dns,
+            "secondaryDns": secondary_dns,
+            "dnsSuffix": dns_suffix,
+            "dnsSearchSuffixes": dns_search_suffixes,
+            "nicLabel": nic_label,
+            "gateway": gateway,
+            "netmask": netmask,
+            "network": network,
+            "subnet": subnet,
+            "templateProperties": template_properties
+        }
+        return await self.ingest_policy_object(
+            'ipamPolicies', policy_name, "/ipamReservations/ingest/",
+            template, tracking_id)
+
+    async def ingest_scripting_deployment(self, policy_name: str,
+                                          provisioning_details: dict,
+                                          deprovisioning_details: dict,
+                                          template_properties: dict = None,
+                                          tracking_id: str = ""):
+        """
+        Ingest an existing Scripting Deployment to OneFuse. See
+        OneFuseManager.ingest_scripting_deployment
+        """
+        template = {
+            "provisioning_details": provisioning_details,
+            "deprovisioning_details": deprovisioning_details,
+            "templateProperties": template_properties
+        }
+        return await self.ingest_policy_object(
+            'scriptingPolicies', policy_name, "/scriptingDeployments/ingest/",
+            template, tracking_id)
+
+    async def ingest_ad(self, policy_name: str, name: str, final_ou: str,
+                        build_ou: str, state: str = "final",
+                        security_groups: list = None,
+                        template_properties: dict = None,
+                        tracking_id: str = ""):
+        """
+        Ingest an existing AD object to OneFuse. See OneFuseManager.ingest_ad
+        """
+        template = {
+            "name": name,
+            "finalOu": final_ou,
+            "buildOu": build_ou,
+            "state": state,
+            "securityGroups": security_groups or [],
+            "templateProperties": template_properties
+        }
+        return await self.ingest_policy_object(
+            'microsoftADPolicies', policy_name,
+            "/microsoftADComputerAccounts/ingest/", template, tracking_id)
+
+    async def ingest_ansible_tower(self, policy_name: str, hosts: list,
+                                   limit: str, inventory_name: str,
+                                   template_properties: dict = None,
+                                   tracking_id: str = ""):
+        """
+        Ingest an existing Ansible Tower object to OneFuse. See
+        OneFuseManager.ingest_ansible_tower
+        """
+        template = {
+            "hosts": hosts,
+            "limit": limit,
+            "inventoryName": inventory_name,
+            "templateProperties": template_properties
+        }
+        return await self.ingest_policy_object(
+            'ansibleTowerPolicies', policy_name,
+            "/ansibleTowerDeployments/ingest/", template, tracking_id)
+
+    async def ingest_service_now_cmdb(self, policy_name: str,
+                                      configuration_items_info: list,
+                                      execution_details: dict,
+                                      template_properties: dict = None,
+                                      tracking_id: str = ""):
+        """
+        Ingest an existing Service Now CMDB object to OneFuse. See
+        OneFuseManager.ingest_service_now_cmdb
+        """
+        template = {
+            "configurationItemsInfo": configuration_items_info,
+            "executionDetails": execution_details,
+            "templateProperties": template_properties
+        }
+        return await self.ingest_policy_object(
+            'servicenowCMDBPolicies', policy_name,
+            "/servicenowCMDBDeployments/ingest/", template, tracking_id)
+
+    async def delete_ingested_object(self, id: str, ingest_type: str):
+        """
+        Delete an ingested object from OneFuse without deprovisioning. See
+        OneFuseManager.delete_ingested_object
+        """
+        path = f"/{ingest_type}/{id}/ingest/"
+        return await self.deprovision_mo(path)
@@ -1,9 +1,9 @@
-import json
 import os
 import sys
 from os import listdir
 from os.path import isfile, join
 import errno
+from . import codec
 from .exceptions import (BackupsUnknownError, RestoreContentError,
                          OneFuseError, PolicyTypeNotFound)
 from .admin import OneFuseManager
@@ -111,7 +111,7 @@ class BackupManager(object):
                 response.raise_for_status()
             except:
                 try:
-                    detail = response.json()["detail"]
+                    detail = codec.loads_response(response)["detail"]
                 except:
                     error_string = f'Unknown error. JSON: {response.json()}, '
                     error_string += (
@@ -129,7 +129,7 @@ class BackupManager(object):
                         f'Error: {sys.exc_info()[0]}. {sys.exc_info()[1]}, '
                         f'line: {sys.exc_info()[2].tb_lineno}')
                     raise OneFuseError(error_string, response=response)
-            response_json = response.json()
+            response_json = codec.loads_response(response)
             policies = response_json["_embedded"][policy_type]
 
         for policy in policies:
@@ -168,7 +168,7 @@ class BackupManager(object):
                 file_name = f'{backups_path}{policy_type}{path_char}' \
                             f'{policy["name"]}.json'
             f = open(file_name, 'w+')
-            f.write(json.dumps(policy, indent=4))
+            f.write(codec.dumps(policy, indent=4))
             f.close()
         if type(response) == dict:
             # When running a single policy backup, None should be returned
@@ -194,8 +194,8 @@ class BackupManager(object):
             err_msg = f'Link could not be found for href: {href}'
             raise OneFuseError(err_msg)
         self.ofm.logger.debug(f'Returning Credential name: '
-                              f'{response.json()["name"]}')
-        return response.json()["name"]
+                              f'{codec.loads_response(response)["name"]}')
+        return codec.loads_response(response)["name"]
 
     def key_exists(self, in_dict: dict, key: str):
         """
@@ -245,7 +245,8 @@ class BackupManager(object):
             next_exists = self.create_json_files(response, policy_type,
                                                  backups_path)
             while next_exists:
-                next_page = response.json()["_links"]["next"]["href"]
+                next_page = \
+                    codec.loads_response(response)["_links"]["next"]["href"]
                 next_page = next_page.split("/?")[1]
                 response = self.ofm.get(f'/{policy_type}/?{next_page}')
                 next_exists = self.create_json_files(response, policy_type,
@@ -383,7 +384,7 @@ class BackupManager(object):
             url = f'/{link_type}/?filter=name.iexact:"{link_name}"'
         link_response = self.ofm.get(url)
         link_response.raise_for_status()
-        link_json = link_response.json()
+        link_json = codec.loads_response(link_response)
         if link_json["count"] == 1:
             return link_json["_embedded"][link_type][0]["_links"]["self"][
                 "href"]
@@ -482,7 +483,7 @@ class BackupManager(object):
         f = open(json_path, 'r')
         content = f.read()
         f.close()
-        json_content = json.loads(content)
+        json_content = codec.loads(content)
         policy_name = json_content["name"]
 
         if "type" in json_content and policy_type != "propertySets":
@@ -504,7 +505,7 @@ class BackupManager(object):
             response.raise_for_status()
         except:
             try:
-                detail = response.json()["detail"]
+                detail = codec.loads_response(response)["detail"]
             except:
                 self.ofm.logger.error('Response JSON detail cannot be '
                                       f'accessed. response: {response}')
@@ -521,7 +522,7 @@ class BackupManager(object):
                 raise BackupsUnknownError(f'Request to URL: {url} '
                                           f'failed',
                                           response=response)
-        response_json = response.json()
+        response_json = codec.loads_response(response)
 
         if response_json["count"] == 0:
             self.ofm.logger.info(
@@ -544,6 +545,7 @@ class BackupManager(object):
             try:
                 response = self.ofm.post(url, json=restore_content)
                 response.raise_for_status()
+                self.ofm.invalidate_policy_cache(policy_type, policy_name)
             except HTTPError:
                 raise
             except Exception as err:
@@ -565,6 +567,7 @@ class BackupManager(object):
                 try:
                     response = self.ofm.put(url, json=restore_content)
                     response.raise_for_status()
+                    self.ofm.invalidate_policy_cache(policy_type, policy_name)
                 except HTTPError:
                     raise
                 except Exception as err:
@@ -0,0 +1,224 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from concurrent.futures import wait as futures_wait
+from .exceptions import OneFuseError
+from .jobs import JobHandle
+from .polling import get_module_path
+
+# Kinds accepted by OneFuseManager.provision_many, and the policy type each
+# provision_<kind> method looks its policy up in
+PROVISION_KINDS = {
+    'ad': 'microsoftADPolicies',
+    'ansible_tower': 'ansibleTowerPolicies',
+    'cmdb': 'servicenowCMDBPolicies',
+    'dns': 'dnsPolicies',
+    'ipam': 'ipamPolicies',
+    'module': 'modulePolicies',
+    'naming': 'namingPolicies',
+    'scripting': 'scriptingPolicies',
+    'vra': 'vraPolicies',
+}
+
+# Order OneFuseManager.deprovision_many deletes Managed Objects in: the
+# reverse of the order a build creates them. Objects of one tier are deleted
+# concurrently. Modules not listed are deleted in the first tier
+DEPROVISION_TIERS = [
+    ['/ansibleTowerDeployments/', '/scriptingDeployments/'],
+    ['/moduleManagedObjects/', '/servicenowCMDBDeployments/',
+     '/vraDeployments/'],
+    ['/microsoftADComputerAccounts/'],
+    ['/dnsReservations/'],
+    ['/ipamReservations/'],
+    ['/customNames/'],
+]
+
+
+class BulkItemResult(object):
+    """
+    The outcome of one item of a bulk operation
+
+    Parameters
+    ----------
+    index : int
+        Position of the item in the input
+    item : any
+        The item as passed in. Ex: the kwargs of a provision_naming call
+    result : any - optional
+        What the operation returned for the item. Ex: the Managed Object json
+    error : Exception - optional
+        The error raised for the item, None if it succeeded
+    elapsed : float - optional
+        Seconds from starting the item until it finished
+    """
+
+    def __init__(self, index: int, item, result=None, error=None,
+                 elapsed: float = 0.0):
+        self.index = index
+        self.item = item
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        state = 'ok' if self.ok else f'error={self.error!r}'
+        return f'BulkItemResult(index={self.index}, {state})'
+
+    @property
+    def ok(self):
+        """
+        True if the item succeeded
+        """
+        return self.error is None
+
+    def get_result(self):
+        """
+        Return the result of the item, or raise its error
+        """
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def get_deprovision_tier(path: str):
+    """
+    Return the index in DEPROVISION_TIERS of the tier a Managed Object is
+    deleted in
+
+    Parameters
+    ----------
+    path : str
+        OneFuse REST path of the Managed Object. ex: '/customNames/782/'
+    """
+    module_path = get_module_path(path)
+    for tier, module_paths in enumerate(DEPROVISION_TIERS):
+        if module_path in module_paths:
+            return tier
+    return 0
+
+
+def get_managed_object_reference(managed_object):
+    """
+    Return the REST path and tracking ID of a Managed Object passed to a
+    bulk operation. The tracking ID is "" when it is not known
+
+    Parameters
+    ----------
+    managed_object : str or dict
+        REST path of the Managed Object, ex: '/customNames/782/', or its json
+        as returned by OneFuse or a provision method
+    """
+    if isinstance(managed_object, str):
+        path = managed_object
+        tracking_id = ""
+    elif isinstance(managed_object, dict):
+        try:
+            path = managed_object["_links"]["self"]["href"]
+        except (KeyError, TypeError):
+            raise OneFuseError(f'Managed Object json has no self link: '
+                               f'{managed_object}')
+        tracking_id = managed_object.get("trackingId") or ""
+    else:
+        raise OneFuseError(f'Expected a Managed Object path or json, got: '
+                           f'{managed_object!r}')
+    if path.startswith('/api/v3/onefuse'):
+        path = path.replace('/api/v3/onefuse', '', 1)
+    return path, tracking_id
+
+
+def get_ingested_object_reference(ingested_object):
+    """
+    Return the REST path and tracking ID of an ingested object passed to
+    OneFuseManager.delete_ingested_many. The tracking ID is "" when it is
+    not known
+
+    Parameters
+    ----------
+    ingested_object : dict or tuple
+        The object's json as returned by OneFuse or an ingest method, a dict
+        with "id", "ingest_type" and optionally "tracking_id", or an
+        (id, ingest_type) tuple. Ex: (782, 'customNames')
+    """
+    if isinstance(ingested_object, dict) and "_links" in ingested_object:
+        return get_managed_object_reference(ingested_object)
+    if isinstance(ingested_object, dict):
+        try:
+            object_id = ingested_object["id"]
+            ingest_type = ingested_object["ingest_type"]
+        except KeyError as err:
+            raise OneFuseError(f'Ingested object is missing {err}: '
+                               f'{ingested_object}')
+        tracking_id = ingested_object.get("tracking_id") or ""
+    elif isinstance(ingested_object, (tuple, list)) and \
+            len(ingested_object) == 2:
+        object_id, ingest_type = ingested_object
+        tracking_id = ""
+    else:
+        raise OneFuseError(f'Expected ingested object json, a dict or an '
+                           f'(id, ingest_type) tuple, got: '
+                           f'{ingested_object!r}')
+    return f'/{ingest_type}/{object_id}/', tracking_id
+
+
+def run_bulk(function, items: list, max_concurrency: int = 8):
+    """
+    Call function(item) for every item, at most max_concurrency at a time,
+    and return a BulkItemResult per item in input order. An item that raises
+    does not stop the others. When function returns a JobHandle its slot is
+    held until the job finishes, so max_concurrency also bounds the jobs
+    running in OneFuse, and the item's result is the job's Managed Object.
+    Each call runs in a copy of the caller's context, so requests carry the
+    caller's tracking ID
+
+    Parameters
+    ----------
+    function : callable
+        Called with one item
+    items : list
+        Items to process
+    max_concurrency : int - optional
+        Maximum items in progress at once. Default 8
+    """
+    items = list(items)
+    results = [None] * len(items)
+    finished = [Future() for _ in items]
+    slots = threading.BoundedSemaphore(max(max_concurrency, 1))
+
+    def finish(index: int, start: float, result=None, error=None):
+        results[index] = BulkItemResult(index, items[index], result, error,
+                                        time.monotonic() - start)
+        slots.release()
+        finished[index].set_result(None)
+
+    def job_done(index: int, start: float, handle: JobHandle):
+        try:
+            error = handle.exception()
+        except CancelledError as err:
+            error = err
+        result = handle.result() if error is None else None
+        finish(index, start, result, error)
+
+    def run(index: int):
+        slots.acquire()
+        start = time.monotonic()
+        try:
+            result = function(items[index])
+        except Exception as err:
+            finish(index, start, error=err)
+            return
+        if isinstance(result, JobHandle):
+            result.add_done_callback(
+                lambda handle: job_done(index, start, handle))
+        else:
+            finish(index, start, result)
+
+    if not items:
+        return results
+    max_workers = min(max(max_concurrency, 1), len(items))
+    with ThreadPoolExecutor(max_workers=max_workers,
+                            thread_name_prefix='onefuse-bulk') as executor:
+        for index in range(len(items)):
+            executor.submit(contextvars.copy_context().run, run, index)
+        futures_wait(finished)
+    return results
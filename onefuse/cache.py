@@ -0,0 +1,459 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class NegativeResult(object):
+    """
+    Cached marker for a lookup that found nothing. Holds the error message
+    so a cached miss raises the same error as the original lookup.
+    """
+
+    def __init__(self, message: str):
+        self.message = message
+
+    def __repr__(self):
+        return f'NegativeResult({self.message!r})'
+
+
+class TTLCache(object):
+    """
+    A bounded, thread-safe cache with per-entry expiry and least recently
+    used eviction. Misses can be cached as NegativeResult entries with their
+    own, usually shorter, time to live.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of entries. The least recently used entry is evicted
+        when full. Default 1024
+    ttl : float
+        Seconds an entry stays valid. 0 disables the cache. Default 300
+    negative_ttl : float
+        Seconds a cached miss stays valid. 0 disables negative caching.
+        Default 30
+
+    Examples
+    --------
+    Cache policy lookups for 10 minutes:
+        ofm = OneFuseManager(username, password, host,
+                             policy_cache=TTLCache(ttl=600))
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300,
+                 negative_ttl: float = 30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries = OrderedDict()
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return (f'TTLCache(max_size={self.max_size}, ttl={self.ttl}, '
+                f'negative_ttl={self.negative_ttl})')
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def __contains__(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default if it is missing or has
+        expired. A cached miss is returned as a NegativeResult
+
+        Parameters
+        ----------
+        key : hashable
+            Cache key
+        default : any
+            Value returned when the key is not cached
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    if isinstance(value, NegativeResult):
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Cache value under key
+
+        Parameters
+        ----------
+        key : hashable
+            Cache key
+        value : any
+            Value to cache
+        ttl : float - optional
+            Overrides the cache's time to live for this entry
+        """
+        if ttl is None:
+            if isinstance(value, NegativeResult):
+                ttl = self.negative_ttl
+            else:
+                ttl = self.ttl
+        if not ttl or self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_negative(self, key, message: str, ttl: float = None):
+        """
+        Cache a lookup miss under key
+
+        Parameters
+        ----------
+        key : hashable
+            Cache key
+        message : str
+            Error message raised again on a cached miss
+        ttl : float - optional
+            Overrides the negative time to live for this entry
+        """
+        self.set(key, NegativeResult(message), ttl)
+
+    def invalidate(self, key=None, predicate=None):
+        """
+        Remove entries from the cache. With no arguments the whole cache is
+        cleared. Returns the number of entries removed
+
+        Parameters
+        ----------
+        key : hashable - optional
+            Remove only this key
+        predicate : callable - optional
+            Remove every key for which predicate(key) is True
+        """
+        with self.lock:
+            if key is not None:
+                return 1 if self.entries.pop(key, None) is not None else 0
+            if predicate is not None:
+                keys = [k for k in self.entries if predicate(k)]
+            else:
+                keys = list(self.entries)
+            for k in keys:
+                del self.entries[k]
+            return len(keys)
+
+    def clear(self):
+        """
+        Remove every entry from the cache
+        """
+        self.invalidate()
+
+    def get_stats(self):
+        """
+        Return a dict of cache statistics
+        """
+        with self.lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxSize": self.max_size,
+                "hits": self.hits,
+                "negativeHits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRatio": ((self.hits + self.negative_hits) / lookups
+                             if lookups else 0.0),
+            }
+
+
+class SqliteCache(object):
+    """
+    A TTLCache backed by a SQLite file, so cached lookups survive the
+    process and are shared by every worker process on the host. The
+    database runs in WAL mode so readers never block each other or a
+    writer, and every thread uses its own connection. A new file is created
+    readable by its owner only. Keys must be tuples or strings and values
+    must be JSON serializable.
+
+    Parameters
+    ----------
+    path : str
+        Path of the SQLite database file. Created if it does not exist
+    max_size : int
+        Maximum number of entries. The least recently used entries are
+        evicted when full. Default 4096
+    ttl : float
+        Seconds an entry stays valid. Default 3600
+    negative_ttl : float
+        Seconds a cached miss stays valid. Default 30
+
+    Examples
+    --------
+    Share OneFuse lookups between all processes on a host:
+        cache = get_sqlite_cache('/var/tmp/onefuse_cache.sqlite')
+        ofm = OneFuseManager(username, password, host, policy_cache=cache)
+    """
+
+    def __init__(self, path: str, max_size: int = 4096, ttl: float = 3600,
+                 negative_ttl: float = 30):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.evictions = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+        created = not os.path.exists(path)
+        connection = self.get_connection()
+        if created:
+            # Entries hold policy and property set bodies, so the file is
+            # only readable by the user that created it
+            os.chmod(path, 0o600)
+        connection.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+            'negative INTEGER NOT NULL, expires REAL NOT NULL, '
+            'accessed REAL NOT NULL)')
+        connection.execute(
+            'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)')
+
+    def __repr__(self):
+        return f'SqliteCache(path={self.path!r})'
+
+    def __len__(self):
+        row = self.get_connection().execute(
+            'SELECT COUNT(*) FROM cache WHERE expires > ?',
+            (time.time(),)).fetchone()
+        return row[0]
+
+    def __contains__(self, key):
+        row = self.get_connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND expires > ?',
+            (self.encode_key(key), time.time())).fetchone()
+        return row is not None
+
+    def get_connection(self):
+        """
+        Return the SQLite connection for the current thread
+        """
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self.local.connection = connection
+        return connection
+
+    @staticmethod
+    def encode_key(key):
+        if isinstance(key, tuple):
+            return json.dumps(list(key))
+        return json.dumps(key)
+
+    @staticmethod
+    def decode_key(key: str):
+        key = json.loads(key)
+        if isinstance(key, list):
+            return tuple(key)
+        return key
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default if it is missing or has
+        expired. A cached miss is returned as a NegativeResult
+
+        Parameters
+        ----------
+        key : tuple or str
+            Cache key
+        default : any
+            Value returned when the key is not cached
+        """
+        now = time.time()
+        connection = self.get_connection()
+        encoded = self.encode_key(key)
+        row = connection.execute(
+            'SELECT value, negative FROM cache WHERE key = ? AND expires > ?',
+            (encoded, now)).fetchone()
+        if row is None:
+            with self.lock:
+                self.misses += 1
+            return default
+        connection.execute('UPDATE cache SET accessed = ? WHERE key = ?',
+                           (now, encoded))
+        value, negative = row
+        with self.lock:
+            if negative:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+        if negative:
+            return NegativeResult(value)
+        return json.loads(value)
+
+    def set(self, key, value, ttl: float = None):
+        """
+        Cache value under key
+
+        Parameters
+        ----------
+        key : tuple or str
+            Cache key
+        value : any
+            JSON serializable value, or a NegativeResult
+        ttl : float - optional
+            Overrides the cache's time to live for this entry
+        """
+        negative = isinstance(value, NegativeResult)
+        if ttl is None:
+            ttl = self.negative_ttl if negative else self.ttl
+        if not ttl or self.max_size <= 0:
+            return
+        now = time.time()
+        stored = value.message if negative else json.dumps(value)
+        connection = self.get_connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, negative, expires, '
+            'accessed) VALUES (?, ?, ?, ?, ?)',
+            (self.encode_key(key), stored, int(negative), now + ttl, now))
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self.max_size:
+            connection.execute('DELETE FROM cache WHERE expires <= ?',
+                               (now,))
+            count = connection.execute(
+                'SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self.max_size:
+            overflow = count - self.max_size
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY accessed LIMIT ?)', (overflow,))
+            with self.lock:
+                self.evictions += overflow
+
+    def set_negative(self, key, message: str, ttl: float = None):
+        """
+        Cache a lookup miss under key
+
+        Parameters
+        ----------
+        key : tuple or str
+            Cache key
+        message : str
+            Error message raised again on a cached miss
+        ttl : float - optional
+            Overrides the negative time to live for this entry
+        """
+        self.set(key, NegativeResult(message), ttl)
+
+    def invalidate(self, key=None, predicate=None):
+        """
+        Remove entries from the cache. With no arguments the whole cache is
+        cleared. Returns the number of entries removed
+
+        Parameters
+        ----------
+        key : tuple or str - optional
+            Remove only this key
+        predicate : callable - optional
+            Remove every key for which predicate(key) is True
+        """
+        connection = self.get_connection()
+        if key is not None:
+            cursor = connection.execute('DELETE FROM cache WHERE key = ?',
+                                        (self.encode_key(key),))
+            return cursor.rowcount
+        if predicate is None:
+            return connection.execute('DELETE FROM cache').rowcount
+        keys = [row[0] for row in connection.execute('SELECT key FROM cache')
+                if predicate(self.decode_key(row[0]))]
+        for encoded in keys:
+            connection.execute('DELETE FROM cache WHERE key = ?', (encoded,))
+        return len(keys)
+
+    def clear(self):
+        """
+        Remove every entry from the cache
+        """
+        self.invalidate()
+
+    def get_stats(self):
+        """
+        Return a dict of cache statistics. Hit and miss counts are for the
+        current process only
+        """
+        size = len(self)
+        with self.lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "size": size,
+                "maxSize": self.max_size,
+                "hits": self.hits,
+                "negativeHits": self.negative_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitRatio": ((self.hits + self.negative_hits) / lookups
+                             if lookups else 0.0),
+            }
+
+
+SQLITE_CACHES = {}
+SQLITE_CACHES_LOCK = threading.Lock()
+
+
+def get_sqlite_cache(path: str, **kwargs):
+    """
+    Return the SqliteCache for a path, opening it once per process
+
+    Parameters
+    ----------
+    path : str
+        Path of the SQLite database file
+    kwargs
+        Passed to SqliteCache when the cache is first opened
+    """
+    path = os.path.abspath(path)
+    with SQLITE_CACHES_LOCK:
+        cache = SQLITE_CACHES.get(path)
+        if cache is None:
+            cache = SqliteCache(path, **kwargs)
+            SQLITE_CACHES[path] = cache
+        return cache
+
+
+# Policy lookups shared by every OneFuseManager in the process. Keys start
+# with the manager's base url so different OneFuse hosts never collide.
+POLICY_CACHE = TTLCache(max_size=1024, ttl=300, negative_ttl=30)
+
+# Rendered template values shared by every OneFuseManager in the process,
+# keyed by base url, template and a fingerprint of the properties the
+# template depends on. See onefuse.rendering.get_render_fingerprint
+RENDER_CACHE = TTLCache(max_size=4096, ttl=300, negative_ttl=0)
+
+# The last input and resolved properties stack of each tracking ID, used by
+# OneFuseManager.resolve_properties to re-resolve only what changed
+RESOLVE_CACHE = TTLCache(max_size=256, ttl=3600, negative_ttl=0)
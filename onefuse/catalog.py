@@ -0,0 +1,225 @@
+import copy
+import sys
+import threading
+import time
+from . import codec
+
+
+# noinspection PyBroadException
+class PolicyCatalog(object):
+    """
+    A local, case-insensitive index of OneFuse policies by name. Each policy
+    collection is paged through once, after which get_policy_by_name on the
+    attached OneFuseManager resolves from memory instead of issuing a
+    filtered GET per lookup. The catalog can refresh itself on an interval,
+    and a lookup that misses schedules a background refresh of its
+    collection (rate limited by min_refresh_interval) while the manager falls
+    back to a live lookup.
+
+    Parameters
+    ----------
+    ofm : OneFuseManager
+    policy_types : list - optional
+        Policy collections to index. Defaults to DEFAULT_POLICY_TYPES
+    refresh_interval : float - optional
+        Reload every collection in the background every refresh_interval
+        seconds. Default None - only refresh on a miss
+    min_refresh_interval : float - optional
+        Minimum seconds between two reloads of the same collection. Default
+        30
+
+    Examples
+    --------
+    Warm the catalog once at process start:
+        ofm = OneFuseManager(username, password, host)
+        ofm.load_policy_catalog(refresh_interval=600)
+        ofm.provision_naming('production', template_properties)
+    """
+
+    DEFAULT_POLICY_TYPES = [
+        "namingPolicies", "ipamPolicies", "dnsPolicies",
+        "microsoftADPolicies", "ansibleTowerPolicies", "scriptingPolicies",
+        "servicenowCMDBPolicies", "vraPolicies", "modulePolicies",
+        "propertySets"
+    ]
+
+    def __init__(self, ofm, policy_types: list = None,
+                 refresh_interval: float = None,
+                 min_refresh_interval: float = 30):
+        self.ofm = ofm
+        if policy_types is None:
+            policy_types = list(self.DEFAULT_POLICY_TYPES)
+        self.policy_types = policy_types
+        self.refresh_interval = refresh_interval
+        self.min_refresh_interval = min_refresh_interval
+        self.index = {}
+        self.loaded_at = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __repr__(self):
+        return 'PolicyCatalog'
+
+    def load(self, policy_types: list = None):
+        """
+        Page through each policy collection and rebuild its index
+
+        Parameters
+        ----------
+        policy_types : list - optional
+            Collections to load. Defaults to all of the catalog's types
+        """
+        if policy_types is None:
+            policy_types = self.policy_types
+        for policy_type in policy_types:
+            try:
+                self.load_policy_type(policy_type)
+            except Exception:
+                self.ofm.logger.warning(
+                    f'Policy catalog could not load {policy_type}. Error: '
+                    f'{sys.exc_info()[0]}. {sys.exc_info()[1]}')
+
+    def load_policy_type(self, policy_type: str):
+        """
+        Page through one policy collection and replace its index. Names
+        matching more than one policy are left out of the index so that
+        lookups for them fall back to OneFuse, which raises the usual error
+
+        Parameters
+        ----------
+        policy_type : str
+            OneFuse policy collection. Ex: 'namingPolicies'
+        """
+        self.ofm.logger.debug(f'Loading policy catalog: {policy_type}')
+        policies = {}
+        duplicates = set()
+        response = self.ofm.get(f'/{policy_type}/')
+        if response.status_code == 404:
+            # Collection not available on this version of OneFuse
+            self.ofm.logger.debug(f'policy_type not found: {policy_type}')
+            with self.lock:
+                self.index[policy_type] = {}
+                self.loaded_at[policy_type] = time.monotonic()
+            return
+        while True:
+            response.raise_for_status()
+            response_json = codec.loads_response(response)
+            for policy in response_json["_embedded"][policy_type]:
+                name = policy["name"].lower()
+                if name in policies:
+                    duplicates.add(name)
+                policies[name] = policy
+            if "next" not in response_json["_links"]:
+                break
+            next_page = response_json["_links"]["next"]["href"]
+            next_page = next_page.split("/?")[1]
+            response = self.ofm.get(f'/{policy_type}/?{next_page}')
+        for name in duplicates:
+            del policies[name]
+        with self.lock:
+            self.index[policy_type] = policies
+            self.loaded_at[policy_type] = time.monotonic()
+        self.ofm.logger.debug(f'Policy catalog loaded {len(policies)} '
+                              f'{policy_type}')
+
+    def get_policy(self, policy_path: str, policy_name: str):
+        """
+        Return a copy of the policy json for a name, or None if the catalog
+        does not hold it
+
+        Parameters
+        ----------
+        policy_path : str
+            OneFuse REST path to policy type. Ex: 'namingPolicies'
+        policy_name : str
+            Name of the Policy to return (case-insensitive)
+        """
+        policy_type = policy_path.strip('/')
+        if policy_type not in self.policy_types:
+            return None
+        with self.lock:
+            policy = self.index.get(policy_type, {}).get(
+                str(policy_name).lower())
+            if policy is not None:
+                self.hits += 1
+                return copy.deepcopy(policy)
+            self.misses += 1
+        self.refresh_in_background(policy_type)
+        return None
+
+    def refresh_in_background(self, policy_type: str):
+        """
+        Reload a collection on a background thread unless it was loaded in
+        the last min_refresh_interval seconds or is already reloading
+
+        Parameters
+        ----------
+        policy_type : str
+            OneFuse policy collection. Ex: 'namingPolicies'
+        """
+        with self.lock:
+            loaded_at = self.loaded_at.get(policy_type)
+            if policy_type in self.refreshing or (
+                    loaded_at is not None and
+                    time.monotonic() - loaded_at < self.min_refresh_interval):
+                return
+            self.refreshing.add(policy_type)
+
+        def refresh():
+            try:
+                self.load([policy_type])
+            finally:
+                with self.lock:
+                    self.refreshing.discard(policy_type)
+
+        threading.Thread(target=refresh, daemon=True,
+                         name=f'onefuse-catalog-{policy_type}').start()
+
+    def start(self):
+        """
+        Start refreshing every collection each refresh_interval seconds
+        """
+        if not self.refresh_interval:
+            return
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True,
+                                       name='onefuse-catalog')
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop the background refresh thread
+        """
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run(self):
+        while not self.stop_event.wait(self.refresh_interval):
+            self.load()
+
+    def get_stats(self):
+        """
+        Return a dict of catalog statistics: policies indexed per type and
+        lookup hits and misses
+        """
+        with self.lock:
+            return {
+                "policies": {policy_type: len(policies) for
+                             policy_type, policies in self.index.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+            }
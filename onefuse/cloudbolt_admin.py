@@ -10,7 +10,12 @@ if __name__ == '__main__':
 import re
 import json
 from common.methods import set_progress
+from onefuse import codec
 from onefuse.admin import OneFuseManager
+from onefuse.cache import get_sqlite_cache
+from onefuse.http_cache import ResponseCache
+from onefuse.rendering import (get_variable_closure,
+                               has_property_set_expansion, is_template)
 from utilities.models import ConnectionInfo
 from utilities.logger import ThreadLogger
 from django.db.models import Q
@@ -60,6 +65,18 @@ class CbOneFuseManager(OneFuseManager):
             OneFuse password
         host : str
             OneFuse host FQDN. Ex: 'onefuse.cloudbolt.io'
+
+        Accepted optional kwargs
+        ------------------------
+        cache_path : str
+            Path to a SQLite file caching productInfo, policy and property
+            set lookups, GET responses, and the resolved properties stack of
+            each tracking ID (see resolve_properties). The file is shared by
+            every CloudBolt worker process on the host, so hook point plugins
+            skip lookups already made by earlier plugin runs. Ex:
+            '/var/opt/cloudbolt/proserv/onefuse_cache.sqlite'
+        cache_ttl : int
+            default 3600 - Seconds entries in the cache_path cache stay valid
         """
         try:
             conn_info = ConnectionInfo.objects.get(
@@ -80,6 +97,20 @@ class CbOneFuseManager(OneFuseManager):
         except KeyError:
             # If no source is passed in, default to CloudBolt
             source = "CLOUDBOLT"
+        optional_kwargs = {}
+        try:
+            cache_path = kwargs["cache_path"]
+        except KeyError:
+            cache_path = None
+        if cache_path:
+            try:
+                cache_ttl = kwargs["cache_ttl"]
+            except KeyError:
+                cache_ttl = 3600
+            cache = get_sqlite_cache(cache_path, ttl=cache_ttl)
+            optional_kwargs["policy_cache"] = cache
+            optional_kwargs["resolve_cache"] = cache
+            optional_kwargs["response_cache"] = ResponseCache(cache)
         if verify_certs is None:
             import urllib3
             urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -101,7 +132,8 @@ class CbOneFuseManager(OneFuseManager):
             protocol=protocol,
             port=port,
             verify_certs=verify_certs,
-            logger=logger
+            logger=logger,
+            **optional_kwargs
         )
 
     def render_and_apply_properties(self, properties: dict, resource,
@@ -121,26 +153,56 @@ class CbOneFuseManager(OneFuseManager):
             A dict containing all properties from the CB resource
         """
         utilities = Utilities(self.logger)
-        for key in properties.keys():
-            rendered_key = self.render(key, properties_stack)
-            overwrite_property = False
+
+        def needs_overwrite(rendered_key):
             try:
                 if (properties_stack[rendered_key] and
                         properties_stack[rendered_key] !=
                         properties[rendered_key]):
                     # Property exists in current stack, but value is different
-                    overwrite_property = True
+                    return True
             except KeyError:
                 # Property Doesn't exist in current Properties stack
-                overwrite_property = True
+                return True
+            return False
+
+        def is_stale(template):
+            # True if the template's render may depend on a property applied
+            # earlier in the loop, directly or through other templated
+            # properties. Property sets may reference any property, so with
+            # 1FPS_ or OneFuse_SPS_ keys in the stack every template is
+            if not applied_keys or not is_template(template):
+                return False
+            if has_property_set_expansion(properties_stack):
+                return True
+            return not applied_keys.isdisjoint(
+                get_variable_closure([template], properties_stack))
+
+        # Render all keys, then the values that will be applied, against the
+        # stack as passed in with one template tester call each. Templates
+        # whose variable closure includes a property applied earlier in the
+        # loop are rendered again against the updated stack
+        keys = list(properties.keys())
+        values = [codec.dumps(properties[key]) if type(properties[key]) == dict
+                  else properties[key] for key in keys]
+        batch_keys = self.render_many(keys, properties_stack)
+        batch_values = self.render_many(
+            {index: values[index] for index in range(len(keys))
+             if needs_overwrite(batch_keys[index])}, properties_stack)
+        applied_keys = set()
+        for index, key in enumerate(keys):
+            if is_stale(key):
+                rendered_key = self.render(key, properties_stack)
+            else:
+                rendered_key = batch_keys[index]
             # Only want to overwrite the property if new value is different
             # than existing
-            if overwrite_property:
-                if type(properties[key]) == dict:
-                    props_key = json.dumps(properties[key])
+            if needs_overwrite(rendered_key):
+                props_key = values[index]
+                if index in batch_values and not is_stale(props_key):
+                    rendered_value = batch_values[index]
                 else:
-                    props_key = properties[key]
-                rendered_value = self.render(props_key, properties_stack)
+                    rendered_value = self.render(props_key, properties_stack)
                 if (rendered_key is not None and rendered_key != "" and
                         rendered_value is not None and rendered_value != ""):
                     if rendered_key == 'os_build':
@@ -195,6 +257,7 @@ class CbOneFuseManager(OneFuseManager):
                         self.logger.debug(f'Setting property: {rendered_key} '
                                           f'to: {rendered_value}')
                     properties_stack[rendered_key] = rendered_value
+                    applied_keys.add(str(rendered_key))
         resource.save()
         return properties_stack
 
@@ -365,7 +428,7 @@ class Utilities(object):
                         and key_value.find('{{') != 0
                 ):
                     try:
-                        key_value = json.loads(key_value)
+                        key_value = codec.loads(key_value)
                     except:
                         self.logger.warning(f'JSON parse failed, sending '
                                             f'string')
@@ -548,7 +611,7 @@ class Utilities(object):
         """
         if type(value) == 'list' or type(value) == 'dict':
             self.logger.debug('Object converted to string')
-            return json.dumps(value)
+            return codec.dumps(value)
         return value
 
     def get_matching_property_names(self, prefix: str, properties_stack: dict):
@@ -645,7 +708,7 @@ class Utilities(object):
                 self.logger.debug(f'AT Output deleted for deprovisioning.')
         elif run_type == "scripting":
             max_char_limit = 5000
-            if len(json.dumps(managed_object)) > max_char_limit:
+            if len(codec.dumps(managed_object)) > max_char_limit:
                 self.logger.debug(
                     f'Object exceeds {max_char_limit} chars. Removing job '
                     f'output.')
@@ -667,7 +730,7 @@ class Utilities(object):
                         f'to be cleaned.')
         elif run_type == "pluggable_module":
             max_characters = 6000
-            clean_details = len(json.dumps(managed_object)) > max_characters
+            clean_details = len(codec.dumps(managed_object)) > max_characters
             original_mo = dict(managed_object)
             safe_props = ["_links", "id", "name", "archived", "trackingId",
                           "OneFuse_PluggableModuleName", "OneFuse_Suffix",
@@ -694,7 +757,7 @@ class Utilities(object):
                             last_element = value
                         last_element["originalIndexNumber"] = list_length
                         temp_mo[key] = [last_element]
-                        if len(json.dumps(temp_mo)) < max_characters:
+                        if len(codec.dumps(temp_mo)) < max_characters:
                             managed_object = dict(temp_mo)
             else:
                 managed_object["managedObjectTruncated"] = False
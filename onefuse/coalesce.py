@@ -0,0 +1,155 @@
+import asyncio
+import threading
+
+
+class InFlightCall(object):
+    """
+    A call shared by every caller that asked for the same key while it ran
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces identical concurrent calls across threads. The first caller
+    for a key runs the call, and every caller that asks for the same key
+    before it finishes waits for and shares its result, or its exception,
+    instead of making the call again. Results are not kept once the call
+    finishes; caching is left to the caller.
+
+    Used by OneFuseManager.send so that many threads looking up the same
+    policy at once make a single GET.
+
+    Examples
+    --------
+        flights = SingleFlight()
+        response = flights.do(('GET', url), lambda: session.get(url))
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+        self.calls_made = 0
+        self.calls_shared = 0
+
+    def __repr__(self):
+        return 'SingleFlight'
+
+    def do(self, key, function):
+        """
+        Return function(), sharing the call with concurrent callers of the
+        same key
+
+        Parameters
+        ----------
+        key : hashable
+            Identifies identical calls. Ex: (method, url, username)
+        function : callable
+            Called without arguments to make the call
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            if call is not None:
+                self.calls_shared += 1
+                leader = False
+            else:
+                call = InFlightCall()
+                self.calls[key] = call
+                self.calls_made += 1
+                leader = True
+        if not leader:
+            call.event.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+        try:
+            call.result = function()
+            return call.result
+        except BaseException as err:
+            call.exception = err
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.event.set()
+
+    def get_stats(self):
+        """
+        Return a dict with the number of calls made, calls shared with an
+        in-flight call and calls currently in flight
+        """
+        with self.lock:
+            return {
+                "inFlight": len(self.calls),
+                "callsMade": self.calls_made,
+                "callsShared": self.calls_shared,
+            }
+
+
+class AsyncSingleFlight(object):
+    """
+    Coalesces identical concurrent calls across tasks of an asyncio event
+    loop. See SingleFlight. A caller that is cancelled while waiting does
+    not cancel the shared call
+
+    Examples
+    --------
+        flights = AsyncSingleFlight()
+        response = await flights.do(('GET', url), lambda: session.get(url))
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.calls_made = 0
+        self.calls_shared = 0
+
+    def __repr__(self):
+        return 'AsyncSingleFlight'
+
+    async def do(self, key, function):
+        """
+        Return await function(), sharing the call with concurrent callers of
+        the same key
+
+        Parameters
+        ----------
+        key : hashable
+            Identifies identical calls. Ex: (method, url, username)
+        function : callable
+            Called without arguments, returns an awaitable making the call
+        """
+        future = self.calls.get(key)
+        if future is not None:
+            self.calls_shared += 1
+            return await asyncio.shield(future)
+        future = asyncio.ensure_future(function())
+        self.calls[key] = future
+        self.calls_made += 1
+
+        def remove(done_future):
+            if self.calls.get(key) is done_future:
+                del self.calls[key]
+
+        future.add_done_callback(remove)
+        return await asyncio.shield(future)
+
+    def get_stats(self):
+        """
+        Return a dict with the number of calls made, calls shared with an
+        in-flight call and calls currently in flight
+        """
+        return {
+            "inFlight": len(self.calls),
+            "callsMade": self.calls_made,
+            "callsShared": self.calls_shared,
+        }
+
+
+# GETs shared by every OneFuseManager in the process. Keys hold the full url,
+# credentials and Tracking-Id, so managers for different hosts or users, and
+# requests for different tracking IDs, never share a call.
+SINGLE_FLIGHT = SingleFlight()
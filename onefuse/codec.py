@@ -0,0 +1,161 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON backend in use: 'orjson' when it is installed (pip install
+# onefuse[fast]), otherwise the standard library 'json'. orjson only encodes
+# request bodies and decodes JSON. Strings the module stores or measures,
+# like CloudBolt property values and Managed Object sizes, are always
+# encoded by the standard library, as orjson spells some floats differently
+# (1e16 for 1e+16) and encodes NaN and Infinity as null
+BACKEND = 'orjson' if orjson is not None else 'json'
+SEPARATORS = (',', ':')
+
+
+def dumps(obj, indent: int = None):
+    """
+    Return obj encoded as a JSON string by the standard library with its
+    default separators, exactly as json.dumps(obj, indent=indent), so the
+    result is the same whether or not orjson is installed
+
+    Parameters
+    ----------
+    obj : any
+        JSON serializable object
+    indent : int - optional
+        Spaces per indent level. Ex: 4
+    """
+    return json.dumps(obj, indent=indent)
+
+
+def dumps_bytes(obj):
+    """
+    Return obj encoded as compact UTF-8 JSON bytes, for request bodies
+
+    Parameters
+    ----------
+    obj : any
+        JSON serializable object
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # Keys that are not strings, or integers over 64 bits
+            pass
+    return json.dumps(obj, separators=SEPARATORS,
+                      ensure_ascii=False).encode('utf-8')
+
+
+def loads(data):
+    """
+    Return the object decoded from a JSON str or bytes. Raises ValueError
+    when data is not JSON
+
+    Parameters
+    ----------
+    data : str or bytes
+        JSON document
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # NaN, Infinity and lone surrogates, which only the standard
+            # library accepts
+            pass
+    return json.loads(data)
+
+
+def loads_response(response):
+    """
+    Return the json body of a requests Response. Raises ValueError when the
+    body is not JSON, as response.json() does
+
+    Parameters
+    ----------
+    response : requests.models.Response
+    """
+    return loads(response.content)
+
+
+def get_sample_managed_object(job_count: int = 200, output_lines: int = 50):
+    """
+    Return a Managed Object shaped like one returned by a Scripting or
+    Ansible Tower policy with a long job history, for benchmarking
+
+    Parameters
+    ----------
+    job_count : int - optional
+        Number of provisioning job results. Default 200
+    output_lines : int - optional
+        Lines of output per job result. Default 50
+    """
+    output = [f'TASK [step {line}] ok: [host-{line}.example.com] => '
+              f'{{"changed": false, "msg": "line {line}"}}'
+              for line in range(output_lines)]
+    return {
+        "_links": {
+            "self": {"href": "/api/v3/onefuse/scriptingDeployments/1/"},
+            "workspace": {"href": "/api/v3/onefuse/workspaces/1/"},
+            "policy": {"href": "/api/v3/onefuse/scriptingPolicies/1/"},
+        },
+        "id": 1,
+        "name": "sample",
+        "trackingId": "00000000-0000-0000-0000-000000000000",
+        "archived": False,
+        "provisioningJobResults": [
+            {
+                "id": job,
+                "jobState": "Successful",
+                "output": "\n".join(output),
+                "properties": {f"property_{index}": index * 1.5
+                               for index in range(20)},
+                "hosts": [f"host-{index}.example.com"
+                          for index in range(10)],
+            }
+            for job in range(job_count)
+        ],
+        "provisioningDetails": {"output": output, "status": "Successful"},
+    }
+
+
+def benchmark(obj=None, number: int = 20):
+    """
+    Return a dict of the seconds taken per call by the standard library and
+    by this codec to encode obj as a request body and to load it
+
+    Parameters
+    ----------
+    obj : any - optional
+        JSON serializable object. Default: get_sample_managed_object()
+    number : int - optional
+        Calls timed per operation. Default 20
+    """
+    import timeit
+    if obj is None:
+        obj = get_sample_managed_object()
+    encoded = json.dumps(obj)
+    operations = {
+        "dumps_bytes": (lambda: json.dumps(obj).encode('utf-8'),
+                        lambda: dumps_bytes(obj)),
+        "loads": (lambda: json.loads(encoded), lambda: loads(encoded)),
+    }
+    results = {"size": len(encoded)}
+    for name, (standard, codec) in operations.items():
+        results[name] = (timeit.timeit(standard, number=number) / number,
+                         timeit.timeit(codec, number=number) / number)
+    return results
+
+
+if __name__ == '__main__':
+    # python -m onefuse.codec
+    results = benchmark()
+    print(f'Backend: {BACKEND}. Managed Object: {results.pop("size")} chars')
+    for name, (standard, codec) in results.items():
+        print(f'{name:>15}: json {standard * 1000:8.2f} ms, '
+              f'{BACKEND} {codec * 1000:8.2f} ms, '
+              f'{standard / codec:5.1f}x')
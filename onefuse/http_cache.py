@@ -0,0 +1,335 @@
+import base64
+import hashlib
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.structures import CaseInsensitiveDict
+from .cache import TTLCache
+
+# Seconds a GET response stays fresh when OneFuse sends no caching headers,
+# keyed by path prefix. 0 stores the response and revalidates it with
+# If-None-Match / If-Modified-Since on every request, so OneFuse only sends
+# the body again when it changed. Paths without a rule are not cached.
+DEFAULT_TTL_RULES = {
+    '/productInfo': 3600,
+    '/namingPolicies/': 0,
+    '/ipamPolicies/': 0,
+    '/dnsPolicies/': 0,
+    '/microsoftADPolicies/': 0,
+    '/ansibleTowerPolicies/': 0,
+    '/scriptingPolicies/': 0,
+    '/servicenowCMDBPolicies/': 0,
+    '/vraPolicies/': 0,
+    '/modulePolicies/': 0,
+    '/propertySets/': 0,
+    '/moduleCredentials/': 0,
+    '/endpoints/': 0,
+    '/validators/': 0,
+    '/namingSequences/': 0,
+    '/connectionInfo/': 0,
+    '/modules/': 0,
+    '/workspaces/': 0,
+}
+
+
+def get_credential_fingerprint(username: str, password: str):
+    """
+    Return the username and a hash of the password, for keys that must
+    differ between managers with different credentials without holding the
+    password
+
+    Parameters
+    ----------
+    username : str
+        OneFuse username
+    password : str
+        OneFuse password
+    """
+    digest = hashlib.sha256(f'{username}\0{password}'.encode('utf-8'))
+    return f'{username}:{digest.hexdigest()}'
+
+
+class ResponseCache(object):
+    """
+    A cache of GET responses used by OneFuseManager.send. Fresh responses
+    are served without a request. Stale responses carrying an ETag or
+    Last-Modified header are revalidated with a conditional request, and a
+    304 from OneFuse is answered from the cache. Freshness comes from the
+    Cache-Control or Expires headers OneFuse sends, otherwise from the
+    longest matching path prefix in ttl_rules. Any POST, PUT or DELETE
+    through the manager removes the cached responses of that module.
+
+    Parameters
+    ----------
+    store : onefuse.cache.TTLCache - optional
+        Where responses are kept. A SqliteCache shares them between
+        processes. Default: an in memory TTLCache of 1024 responses
+    ttl_rules : dict - optional
+        Seconds a response stays fresh per path prefix, merged over
+        DEFAULT_TTL_RULES. Ex: {'/namingPolicies/': 60}
+    max_stale : float - optional
+        Seconds a response is kept for revalidation after it went stale.
+        Default 86400
+
+    Examples
+    --------
+    Serve naming policy lookups for a minute before revalidating:
+        cache = ResponseCache(ttl_rules={'/namingPolicies/': 60})
+        ofm = OneFuseManager(username, password, host, response_cache=cache)
+    """
+
+    def __init__(self, store=None, ttl_rules: dict = None,
+                 max_stale: float = 86400):
+        if store is None:
+            store = TTLCache(max_size=1024, ttl=max_stale, negative_ttl=0)
+        self.store = store
+        self.ttl_rules = dict(DEFAULT_TTL_RULES)
+        if ttl_rules:
+            self.ttl_rules.update(ttl_rules)
+        self.max_stale = max_stale
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.stores = 0
+
+    def __repr__(self):
+        return f'ResponseCache(store={self.store!r})'
+
+    def get_rule(self, path: str):
+        """
+        Return the TTL rule for a path, or None if the path is not cached
+
+        Parameters
+        ----------
+        path : str
+            OneFuse REST path. ex: '/namingPolicies/?filter=name.iexact:"x"'
+        """
+        matches = [prefix for prefix in self.ttl_rules
+                   if path.startswith(prefix)]
+        if not matches:
+            return None
+        return self.ttl_rules[max(matches, key=len)]
+
+    @staticmethod
+    def get_key(base_url: str, username: str, path: str,
+                password: str = ""):
+        """
+        Return the cache key of a GET. Responses are kept per credentials,
+        so a manager with a wrong password is never answered from the
+        responses of one that authenticated. The password is hashed, as the
+        key may be stored in a file
+
+        Parameters
+        ----------
+        base_url : str
+            OneFuseManager.base_url
+        username : str
+            OneFuse username
+        path : str
+            OneFuse REST path
+        password : str - optional
+            OneFuse password
+        """
+        return base_url, 'http', get_credential_fingerprint(username,
+                                                             password), path
+
+    @staticmethod
+    def get_freshness(response: requests.models.Response, rule: float):
+        """
+        Return the seconds a response stays fresh, or None if it must not
+        be stored
+
+        Parameters
+        ----------
+        response : requests.models.Response
+        rule : float
+            TTL rule for the request path. See get_rule
+        """
+        cache_control = response.headers.get('Cache-Control', '')
+        directives = {}
+        for directive in cache_control.split(','):
+            name, _, value = directive.strip().partition('=')
+            if name:
+                directives[name.lower()] = value.strip('"')
+        if 'no-store' in directives:
+            return None
+        if 'no-cache' in directives:
+            return 0
+        if 'max-age' in directives:
+            try:
+                return max(int(directives['max-age']), 0)
+            except ValueError:
+                return 0
+        expires = response.headers.get('Expires')
+        if expires:
+            try:
+                date = response.headers.get('Date')
+                now = parsedate_to_datetime(date).timestamp() if date \
+                    else time.time()
+                return max(parsedate_to_datetime(expires).timestamp() - now,
+                           0)
+            except (TypeError, ValueError):
+                return 0
+        return rule
+
+    @staticmethod
+    def get_conditional_headers(entry: dict):
+        """
+        Return the If-None-Match and If-Modified-Since headers for
+        revalidating a cached response
+
+        Parameters
+        ----------
+        entry : dict
+            Cached response
+        """
+        headers = {}
+        if entry["headers"].get("ETag"):
+            headers["If-None-Match"] = entry["headers"]["ETag"]
+        if entry["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        return headers
+
+    def fetch(self, key, path: str, send):
+        """
+        Return the response for a GET, from the cache when it is fresh or
+        OneFuse confirms it is unchanged, otherwise from send
+
+        Parameters
+        ----------
+        key : tuple
+            Cache key. See get_key
+        path : str
+            OneFuse REST path
+        send : callable
+            Called with a dict of extra request headers to make the request.
+            Returns a requests.models.Response
+        """
+        rule = self.get_rule(path)
+        if rule is None:
+            return send({})
+        entry = self.store.get(key)
+        if not isinstance(entry, dict):
+            entry = None
+        if entry is not None and entry["freshUntil"] > time.time():
+            with self.lock:
+                self.hits += 1
+            return self.build_response(entry)
+        conditional_headers = {}
+        if entry is not None:
+            conditional_headers = self.get_conditional_headers(entry)
+        response = send(conditional_headers)
+        if response.status_code == 304 and entry is not None:
+            with self.lock:
+                self.revalidations += 1
+            freshness = self.get_freshness(response, rule)
+            # The in memory store hands the same entry to every thread, so
+            # the revalidated entry is a copy rather than updated in place
+            entry = dict(entry, headers=dict(entry["headers"]))
+            entry["headers"].update(
+                {name: value for name, value in response.headers.items()
+                 if name in ('ETag', 'Last-Modified', 'Cache-Control',
+                             'Expires', 'Date')})
+            entry["freshUntil"] = time.time() + (freshness or 0)
+            self.store.set(key, entry)
+            return self.build_response(entry)
+        with self.lock:
+            self.misses += 1
+        self.save(key, response, rule)
+        return response
+
+    def save(self, key, response: requests.models.Response, rule: float):
+        """
+        Store a 200 response if it is fresh for some time or can be
+        revalidated
+
+        Parameters
+        ----------
+        key : tuple
+            Cache key. See get_key
+        response : requests.models.Response
+        rule : float
+            TTL rule for the request path. See get_rule
+        """
+        if response.status_code != 200:
+            return
+        freshness = self.get_freshness(response, rule)
+        if freshness is None:
+            return
+        can_revalidate = bool(response.headers.get('ETag') or
+                              response.headers.get('Last-Modified'))
+        if not freshness and not can_revalidate:
+            return
+        entry = {
+            "status": response.status_code,
+            "reason": response.reason,
+            "url": response.url,
+            "encoding": response.encoding,
+            "headers": dict(response.headers),
+            "content": base64.b64encode(response.content).decode('ascii'),
+            "freshUntil": time.time() + freshness,
+        }
+        self.store.set(key, entry, freshness + self.max_stale)
+        with self.lock:
+            self.stores += 1
+
+    @staticmethod
+    def build_response(entry: dict):
+        """
+        Rebuild a requests Response from a cached entry
+
+        Parameters
+        ----------
+        entry : dict
+            Cached response
+        """
+        response = requests.models.Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.url = entry["url"]
+        response.encoding = entry["encoding"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = base64.b64decode(entry["content"])
+        return response
+
+    def invalidate(self, base_url: str, path_prefix: str = None):
+        """
+        Remove the cached responses of a OneFuse host, or only those whose
+        path starts with path_prefix. Returns the number removed
+
+        Parameters
+        ----------
+        base_url : str
+            OneFuseManager.base_url
+        path_prefix : str - optional
+            Ex: '/namingPolicies/'
+        """
+        def matches(key):
+            return (len(key) == 4 and key[0] == base_url and
+                    key[1] == 'http' and
+                    (path_prefix is None or key[3].startswith(path_prefix)))
+
+        return self.store.invalidate(predicate=matches)
+
+    def get_stats(self):
+        """
+        Return a dict of response cache statistics: fresh hits, responses
+        revalidated with a 304, misses and responses stored
+        """
+        with self.lock:
+            requests_seen = self.hits + self.revalidations + self.misses
+            return {
+                "hits": self.hits,
+                "revalidations": self.revalidations,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hitRatio": ((self.hits + self.revalidations) / requests_seen
+                             if requests_seen else 0.0),
+            }
+
+
+# GET responses shared by every OneFuseManager in the process. Keys start
+# with the manager's base url and credentials.
+RESPONSE_CACHE = ResponseCache()
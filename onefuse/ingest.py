@@ -0,0 +1,411 @@
+import contextvars
+import csv
+import os
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from . import codec
+from .bulk import BulkItemResult
+from .exceptions import OneFuseError
+from .jobs import JobHandle
+
+# Kinds accepted by BulkIngest, and the policy type each ingest_<kind>
+# method looks its policy up in
+INGEST_KINDS = {
+    'ad': 'microsoftADPolicies',
+    'ansible_tower': 'ansibleTowerPolicies',
+    'dns_reservation': 'dnsPolicies',
+    'ip_address': 'ipamPolicies',
+    'name': 'namingPolicies',
+    'scripting_deployment': 'scriptingPolicies',
+    'service_now_cmdb': 'servicenowCMDBPolicies',
+}
+
+
+def read_records(file_path: str, file_format: str = None):
+    """
+    Yield the records of a CSV or JSON Lines file one at a time, without
+    reading the whole file. Each record is a dict of keyword arguments for an
+    ingest_<kind> method. A line that cannot be parsed is yielded as a
+    OneFuseError in its place, so record numbers stay stable
+
+    CSV files have a header row of argument names. Empty cells are left out
+    so the method's defaults apply, and cells holding a JSON list or object
+    (ex: records, security_groups, template_properties) are decoded.
+
+    Parameters
+    ----------
+    file_path : str
+        Path of the file. Ex: '/var/tmp/names.csv'
+    file_format : str - optional
+        'csv' or 'jsonl'. Defaults to the file extension, .csv or .jsonl and
+        .ndjson
+    """
+    if file_format is None:
+        extension = os.path.splitext(file_path)[1].lower()
+        file_format = 'csv' if extension == '.csv' else 'jsonl'
+    if file_format == 'csv':
+        with open(file_path, 'r', newline='') as f:
+            for row in csv.DictReader(f):
+                record = {}
+                for key, value in row.items():
+                    if key is None or value is None or value == '':
+                        continue
+                    if value[0] in '[{':
+                        try:
+                            value = codec.loads(value)
+                        except ValueError:
+                            pass
+                    record[key] = value
+                yield record
+    elif file_format == 'jsonl':
+        with open(file_path, 'rb') as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = codec.loads(line)
+                except ValueError as err:
+                    record = OneFuseError(f'Line {line_number} of '
+                                          f'{file_path} is not JSON: {err}')
+                if not isinstance(record, (dict, OneFuseError)):
+                    record = OneFuseError(f'Line {line_number} of '
+                                          f'{file_path} is not a JSON object')
+                yield record
+    else:
+        raise OneFuseError(f'Unknown ingest file format: {file_format}. '
+                           f'Valid formats: csv, jsonl')
+
+
+class IngestCheckpoint(object):
+    """
+    The progress of a BulkIngest run, kept in a JSON file that is written
+    atomically and synced to disk after records finish. Records are numbered
+    from 0 in file order. Every record before 'completed' has finished, as
+    have those listed in 'done'; records that failed are also kept in
+    'failed' with their error.
+
+    Parameters
+    ----------
+    checkpoint_path : str
+        Path of the checkpoint file. Created if it does not exist
+    source : str
+        Path of the file being ingested. A checkpoint of another file or
+        kind is refused
+    kind : str
+        Ingest kind. See INGEST_KINDS
+    """
+
+    def __init__(self, checkpoint_path: str, source: str, kind: str):
+        self.checkpoint_path = checkpoint_path
+        self.source = os.path.abspath(source)
+        self.kind = kind
+        self.completed = 0
+        self.done = set()
+        self.failed = {}
+        self.succeeded = 0
+        self.load()
+
+    def __repr__(self):
+        return (f'IngestCheckpoint(checkpoint_path={self.checkpoint_path!r}, '
+                f'completed={self.completed})')
+
+    def load(self):
+        """
+        Read the checkpoint file, if it exists
+        """
+        if not os.path.exists(self.checkpoint_path):
+            return
+        with open(self.checkpoint_path, 'rb') as f:
+            state = codec.loads(f.read())
+        if state["source"] != self.source or state["kind"] != self.kind:
+            raise OneFuseError(f'Checkpoint {self.checkpoint_path} belongs '
+                               f'to a {state["kind"]} ingest of '
+                               f'{state["source"]}, not to a {self.kind} '
+                               f'ingest of {self.source}')
+        self.completed = state["completed"]
+        self.done = set(state["done"])
+        self.failed = {int(index): error
+                       for index, error in state["failed"].items()}
+        self.succeeded = state["succeeded"]
+
+    def is_done(self, index: int):
+        """
+        Return True if a record finished in an earlier run
+
+        Parameters
+        ----------
+        index : int
+            Record number
+        """
+        return index < self.completed or index in self.done
+
+    def mark(self, index: int, error: str = None):
+        """
+        Record that a record finished, with its error if it failed
+
+        Parameters
+        ----------
+        index : int
+            Record number
+        error : str - optional
+            Error of a failed record
+        """
+        if error is None:
+            self.failed.pop(index, None)
+            self.succeeded += 1
+        else:
+            self.failed[index] = error
+        if index >= self.completed:
+            self.done.add(index)
+        while self.completed in self.done:
+            self.done.discard(self.completed)
+            self.completed += 1
+
+    def save(self):
+        """
+        Write the checkpoint to a temporary file, sync it to disk and
+        replace the checkpoint file with it, so an interruption never
+        leaves a partly written checkpoint
+        """
+        state = {
+            "source": self.source,
+            "kind": self.kind,
+            "completed": self.completed,
+            "done": sorted(self.done),
+            "failed": {str(index): error
+                       for index, error in sorted(self.failed.items())},
+            "succeeded": self.succeeded,
+            "updated": time.time(),
+        }
+        temp_path = f'{self.checkpoint_path}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(codec.dumps(state).encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+        if os.name != 'nt':
+            # Sync the directory so the rename itself survives a crash
+            directory = os.open(
+                os.path.dirname(os.path.abspath(self.checkpoint_path)),
+                os.O_RDONLY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+
+class IngestReport(object):
+    """
+    Totals of a BulkIngest run
+
+    Parameters
+    ----------
+    succeeded : int
+        Records ingested by this run
+    failed : int
+        Records that failed in this run
+    skipped : int
+        Records skipped because they finished in an earlier run
+    failures : list
+        (record number, error message) of each record that failed in this
+        run
+    elapsed : float
+        Seconds the run took
+    """
+
+    def __init__(self, succeeded: int, failed: int, skipped: int,
+                 failures: list, elapsed: float):
+        self.succeeded = succeeded
+        self.failed = failed
+        self.skipped = skipped
+        self.failures = failures
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f'IngestReport(succeeded={self.succeeded}, '
+                f'failed={self.failed}, skipped={self.skipped})')
+
+
+# noinspection PyBroadException
+class BulkIngest(object):
+    """
+    Ingests existing objects into OneFuse from a CSV or JSON Lines file.
+    Records are streamed from the file, each policy is looked up once for
+    the whole run, and records are ingested concurrently with their jobs
+    polled by the manager's shared JobWatcher. With a checkpoint_path, the
+    progress is kept on disk and running again with the same file resumes
+    after the records that already finished. Records that were in flight
+    when a run was interrupted are ingested again on resume.
+
+    Parameters
+    ----------
+    ofm : OneFuseManager
+    kind : str
+        Which ingest method to run. One of: ad, ansible_tower,
+        dns_reservation, ip_address, name, scripting_deployment,
+        service_now_cmdb
+    max_concurrency : int - optional
+        Maximum records submitted or running at once. Keep the manager's
+        pool_maxsize at least this high. Default 8
+    rate_limit : float - optional
+        Maximum records started per second. Default None, no limit
+    checkpoint_path : str - optional
+        Path of the checkpoint file. Default None, no checkpoint
+    checkpoint_every : int - optional
+        Save the checkpoint every checkpoint_every finished records, and
+        when the run ends. Default 1
+    policy_name : str - optional
+        Policy Name for records that do not have a policy_name
+
+    Examples
+    --------
+    Ingest 50k IP addresses, 16 at a time, resuming if interrupted:
+        ingest = BulkIngest(ofm, 'ip_address', max_concurrency=16,
+                            rate_limit=50,
+                            checkpoint_path='/var/tmp/ips.checkpoint')
+        report = ingest.run('/var/tmp/ips.csv')
+        print(report.failures)
+    """
+
+    def __init__(self, ofm, kind: str, max_concurrency: int = 8,
+                 rate_limit: float = None, checkpoint_path: str = None,
+                 checkpoint_every: int = 1, policy_name: str = None):
+        if kind not in INGEST_KINDS:
+            raise OneFuseError(f'Unknown ingest kind: {kind}. Valid kinds: '
+                               f'{", ".join(INGEST_KINDS)}')
+        self.ofm = ofm
+        self.kind = kind
+        self.max_concurrency = max(max_concurrency, 1)
+        self.rate_limit = rate_limit
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_every = max(checkpoint_every, 1)
+        self.policy_name = policy_name
+
+    def __repr__(self):
+        return f'BulkIngest(kind={self.kind!r})'
+
+    def run(self, file_path: str, file_format: str = None,
+            retry_failed: bool = False, on_result=None):
+        """
+        Ingest every record of a file that has not finished in an earlier
+        run and return an IngestReport
+
+        Parameters
+        ----------
+        file_path : str
+            CSV or JSON Lines file. See read_records
+        file_format : str - optional
+            'csv' or 'jsonl'. Defaults to the file extension
+        retry_failed : bool - optional
+            Also ingest again the records that failed in earlier runs.
+            Default False
+        on_result : callable - optional
+            Called with a onefuse.bulk.BulkItemResult as each record
+            finishes, holding the Managed Object json or the error
+        """
+        checkpoint = None
+        if self.checkpoint_path:
+            checkpoint = IngestCheckpoint(self.checkpoint_path, file_path,
+                                          self.kind)
+        ingest = getattr(self.ofm, f'ingest_{self.kind}')
+        lock = threading.Lock()
+        slots = threading.BoundedSemaphore(self.max_concurrency)
+        totals = {"succeeded": 0, "failed": 0, "finished": 0}
+        failures = []
+
+        def finish(index: int, record, start: float, result=None,
+                   error=None):
+            try:
+                with lock:
+                    if error is None:
+                        totals["succeeded"] += 1
+                    else:
+                        totals["failed"] += 1
+                        failures.append((index, str(error)))
+                        self.ofm.logger.warning(f'Ingest of record {index} '
+                                                f'failed: {error}')
+                    totals["finished"] += 1
+                    if checkpoint is not None:
+                        checkpoint.mark(index, None if error is None
+                                        else str(error))
+                        if totals["finished"] % self.checkpoint_every == 0:
+                            checkpoint.save()
+                if on_result is not None:
+                    on_result(BulkItemResult(index, record, result, error,
+                                             time.monotonic() - start))
+            except Exception:
+                self.ofm.logger.error(f'Ingest could not record the result '
+                                      f'of record {index}. Error: '
+                                      f'{sys.exc_info()[0]}. '
+                                      f'{sys.exc_info()[1]}')
+            finally:
+                slots.release()
+
+        def job_done(index: int, record, start: float, handle: JobHandle):
+            try:
+                error = handle.exception()
+            except CancelledError as err:
+                error = err
+            result = handle.result() if error is None else None
+            finish(index, record, start, result, error)
+
+        def start_record(index: int, record):
+            start = time.monotonic()
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                kwargs = dict(record)
+                if "policy_name" not in kwargs and self.policy_name:
+                    kwargs["policy_name"] = self.policy_name
+                self.ofm.submit_context.set(True)
+                result = ingest(**kwargs)
+            except Exception as err:
+                finish(index, record, start, error=err)
+                return
+            if isinstance(result, JobHandle):
+                result.add_done_callback(
+                    lambda handle: job_done(index, record, start, handle))
+            else:
+                finish(index, record, start, result)
+
+        start_time = time.monotonic()
+        skipped = 0
+        next_start = start_time
+        # Shared by every record so each policy is looked up once
+        memo_token = self.ofm.policy_memo_context.set({})
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_concurrency,
+                                    thread_name_prefix='onefuse-ingest') \
+                    as executor:
+                for index, record in enumerate(read_records(file_path,
+                                                            file_format)):
+                    if checkpoint is not None and \
+                            checkpoint.is_done(index) and \
+                            not (retry_failed and index in checkpoint.failed):
+                        skipped += 1
+                        continue
+                    slots.acquire()
+                    if self.rate_limit:
+                        delay = next_start - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                        next_start = max(next_start, time.monotonic()) + \
+                            1 / self.rate_limit
+                    executor.submit(contextvars.copy_context().run,
+                                    start_record, index, record)
+                # Wait for the jobs still running
+                for _ in range(self.max_concurrency):
+                    slots.acquire()
+        finally:
+            self.ofm.policy_memo_context.reset(memo_token)
+            if checkpoint is not None:
+                with lock:
+                    checkpoint.save()
+        elapsed = time.monotonic() - start_time
+        self.ofm.logger.info(f'Ingest of {file_path}: {totals["succeeded"]} '
+                             f'succeeded, {totals["failed"]} failed, '
+                             f'{skipped} skipped in {elapsed:.1f} seconds')
+        return IngestReport(totals["succeeded"], totals["failed"], skipped,
+                            sorted(failures), elapsed)
@@ -0,0 +1,490 @@
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import (Future, ThreadPoolExecutor, FIRST_EXCEPTION,
+                                ALL_COMPLETED)
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures import as_completed as futures_as_completed
+from concurrent.futures import wait as futures_wait
+from . import codec
+
+
+class WatchedJob(object):
+    """
+    A OneFuse job registered with a JobWatcher
+    """
+
+    def __init__(self, job_id: int, path: str, method: str, delays,
+                 deadline: float):
+        self.job_id = job_id
+        self.path = path
+        self.method = method
+        self.delays = delays
+        self.deadline = deadline
+        self.next_poll = time.monotonic()
+        self.polling = False
+        self.polls = 0
+        # One future per watch call, so one caller cancelling its wait does
+        # not cancel the others
+        self.futures = []
+
+    def __repr__(self):
+        return f'WatchedJob(job_id={self.job_id}, path={self.path})'
+
+
+# noinspection PyBroadException
+class JobWatcher(object):
+    """
+    A background service polling many outstanding OneFuse jobs from a single
+    scheduler thread. Callers register the job ID from a 202 response and get
+    back a concurrent.futures.Future that resolves to the Managed Object json
+    (or raises the job's error). Polls run on a bounded pool of worker
+    threads, each job follows the polling strategy for its module, and
+    registering a job that is already watched returns a new future sharing
+    the existing poll stream rather than starting a second one.
+
+    Parameters
+    ----------
+    ofm : OneFuseManager
+    max_workers : int
+        Maximum number of jobMetadata polls in flight at once. Default 8
+
+    Examples
+    --------
+    Wait on many jobs from one scheduler:
+        watcher = JobWatcher(ofm)
+        response = ofm.post('/customNames/', json=template)
+        future = watcher.watch(response.json()["id"], '/customNames/')
+        name_json = future.result()
+
+    Be called back instead of waiting:
+        watcher.watch(job_id, '/customNames/',
+                      callback=lambda future: print(future.result()))
+    """
+
+    def __init__(self, ofm, max_workers: int = 8):
+        self.ofm = ofm
+        self.max_workers = max_workers
+        self.jobs = {}
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='onefuse-job-poll')
+        self.thread = None
+        self.stopped = False
+        self.in_flight = 0
+        self.polls_total = 0
+        self.jobs_completed = 0
+        self.jobs_failed = 0
+        self.poll_times = deque()
+        self.rate_window = 60
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def __repr__(self):
+        return 'JobWatcher'
+
+    def watch(self, job_id: int, path: str = '', method: str = 'post',
+              callback=None):
+        """
+        Register a OneFuse job and return a Future for its result. The
+        future resolves to the same value wait_for_job_completion would
+        return, or raises the same error.
+
+        Parameters
+        ----------
+        job_id : int
+            The OneFuse Job ID returned in the body of a 202 response
+        path : str
+            The REST path for the policy executed. ex: '/customNames/'. Used
+            to pick the polling strategy and timeout for the job
+        method : str
+            The type of method called for the original job. ex: "put"
+        callback : callable - optional
+            Called with the future once the job has finished
+        """
+        with self.condition:
+            if self.stopped:
+                raise RuntimeError('JobWatcher has been stopped')
+            job = self.jobs.get(job_id)
+            if job is None:
+                strategy = self.ofm.get_polling_strategy(path)
+                deadline = time.monotonic() + self.ofm.get_max_sleep(path)
+                job = WatchedJob(job_id, path, method, strategy.delays(),
+                                 deadline)
+                self.jobs[job_id] = job
+                self.ofm.logger.debug(f'Watching OneFuse job: {job_id}')
+            future = Future()
+            job.futures.append(future)
+            self.start()
+            self.condition.notify_all()
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def watch_response(self, job_response, path: str, method: str = 'post',
+                       callback=None):
+        """
+        Register the job from a OneFuse response. 201 (synchronous)
+        responses resolve immediately, as in wait_for_job_completion.
+
+        Parameters
+        ----------
+        job_response : requests.models.Response
+            The response from the requests module for a OneFuse Job request
+        path : str
+            The REST path for the policy executed. ex: '/customNames/'
+        method : str
+            The type of method called for the original job. ex: "put"
+        callback : callable - optional
+            Called with the future once the job has finished
+        """
+        if job_response.status_code == 202:
+            job_id = codec.loads_response(job_response)["id"]
+            return self.watch(job_id, path, method, callback)
+        future = Future()
+        try:
+            future.set_result(self.ofm.wait_for_job_completion(
+                job_response, path, method))
+        except Exception as err:
+            future.set_exception(err)
+        if callback is not None:
+            future.add_done_callback(callback)
+        return future
+
+    def unwatch(self, job_id: int, future: Future = None):
+        """
+        Stop waiting for a job. The future is cancelled, and once no future
+        of the job is left it is no longer polled. The job itself keeps
+        running in OneFuse. Returns False if the job or future was not
+        being watched
+
+        Parameters
+        ----------
+        job_id : int
+            The OneFuse Job ID to stop watching
+        future : concurrent.futures.Future - optional
+            Future returned by watch to cancel. Every future of the job is
+            cancelled if not passed
+        """
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return False
+            if future is None:
+                futures = list(job.futures)
+                job.futures.clear()
+            elif future in job.futures:
+                job.futures.remove(future)
+                futures = [future]
+            else:
+                return False
+            if not job.futures:
+                del self.jobs[job_id]
+        for cancelled in futures:
+            cancelled.cancel()
+        return True
+
+    def start(self):
+        """
+        Start the scheduler thread if it is not already running
+        """
+        with self.condition:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.run, name='onefuse-job-watcher', daemon=True)
+                self.thread.start()
+
+    def stop(self, wait: bool = True):
+        """
+        Stop the scheduler. Futures of jobs still outstanding are cancelled
+
+        Parameters
+        ----------
+        wait : bool
+            Wait for polls already in flight to finish. Default True
+        """
+        with self.condition:
+            self.stopped = True
+            futures = [future for job in self.jobs.values()
+                       for future in job.futures]
+            self.jobs.clear()
+            self.condition.notify_all()
+        for future in futures:
+            future.cancel()
+        if self.thread is not None and wait:
+            self.thread.join()
+        self.executor.shutdown(wait=wait)
+
+    def run(self):
+        """
+        Scheduler loop. Dispatches every due job to the poll workers while
+        keeping at most max_workers polls in flight
+        """
+        with self.condition:
+            while not self.stopped:
+                now = time.monotonic()
+                next_wake = None
+                for job in list(self.jobs.values()):
+                    if job.polling:
+                        continue
+                    if job.next_poll <= now:
+                        if self.in_flight >= self.max_workers:
+                            break
+                        job.polling = True
+                        self.in_flight += 1
+                        self.executor.submit(self.poll, job)
+                    elif next_wake is None or job.next_poll < next_wake:
+                        next_wake = job.next_poll
+                if next_wake is None:
+                    timeout = None
+                else:
+                    timeout = max(next_wake - now, 0)
+                self.condition.wait(timeout)
+
+    def poll(self, job: WatchedJob):
+        """
+        Poll a single job once and resolve its future if it has finished
+
+        Parameters
+        ----------
+        job : WatchedJob
+            The job to poll
+        """
+        try:
+            job_json = self.ofm.get_job_json(job.job_id)
+            job.polls += 1
+            job_state = job_json["jobState"]
+            self.record_poll()
+            if job_state == 'Successful' or job_state == 'Failed':
+                try:
+                    result = self.ofm.get_job_result(job_json, job.method)
+                except Exception as err:
+                    self.set_exception(job, err)
+                else:
+                    self.set_result(job, result)
+            elif time.monotonic() > job.deadline:
+                self.set_exception(job, TimeoutError(
+                    f'Action timeout. OneFuse job {job.job_id} exceeded '
+                    f'{self.ofm.get_max_sleep(job.path)} seconds'))
+            else:
+                job.next_poll = time.monotonic() + next(job.delays)
+        except Exception:
+            self.ofm.logger.error(
+                f'Polling failed for OneFuse job: {job.job_id}. Error: '
+                f'{sys.exc_info()[0]}. {sys.exc_info()[1]}')
+            self.set_exception(job, sys.exc_info()[1])
+        finally:
+            with self.condition:
+                job.polling = False
+                self.in_flight -= 1
+                self.condition.notify_all()
+
+    def pop_futures(self, job: WatchedJob):
+        # Stop watching a finished job and return its futures. Under the
+        # lock, so a watch call either gets one of them or starts a new job
+        with self.condition:
+            if self.jobs.get(job.job_id) is job:
+                del self.jobs[job.job_id]
+            futures = list(job.futures)
+            job.futures.clear()
+        return futures
+
+    def set_result(self, job: WatchedJob, result):
+        for future in self.pop_futures(job):
+            if future.set_running_or_notify_cancel():
+                future.set_result(result)
+        with self.condition:
+            self.jobs_completed += 1
+
+    def set_exception(self, job: WatchedJob, err: BaseException):
+        for future in self.pop_futures(job):
+            if future.set_running_or_notify_cancel():
+                future.set_exception(err)
+        with self.condition:
+            self.jobs_failed += 1
+
+    def record_poll(self):
+        now = time.monotonic()
+        with self.condition:
+            self.polls_total += 1
+            self.poll_times.append(now)
+            while self.poll_times and \
+                    self.poll_times[0] < now - self.rate_window:
+                self.poll_times.popleft()
+
+    def get_metrics(self):
+        """
+        Return a dict of watcher metrics: outstanding and in flight job
+        counts, total polls, completed and failed jobs, and the poll rate
+        (polls per second) over the last rate_window seconds
+        """
+        now = time.monotonic()
+        with self.condition:
+            while self.poll_times and \
+                    self.poll_times[0] < now - self.rate_window:
+                self.poll_times.popleft()
+            return {
+                "outstandingJobs": len(self.jobs),
+                "pollsInFlight": self.in_flight,
+                "pollsTotal": self.polls_total,
+                "jobsCompleted": self.jobs_completed,
+                "jobsFailed": self.jobs_failed,
+                "pollRate": len(self.poll_times) / self.rate_window,
+            }
+
+
+class JobHandle(object):
+    """
+    A OneFuse policy execution submitted with OneFuseManager.submit. Returned
+    right after OneFuse accepts the request, while the job is still running.
+
+    Parameters
+    ----------
+    future : concurrent.futures.Future
+        Future resolving to the Managed Object json of the job
+    tracking_id : str
+        OneFuse Tracking ID of the job, if known when submitted
+    job_id : int - optional
+        OneFuse Job ID. None for synchronous (201) executions
+    path : str - optional
+        The REST path for the policy executed. ex: '/customNames/'
+    ofm : OneFuseManager - optional
+        Manager used to look up the tracking ID and stop watching the job
+    """
+
+    def __init__(self, future: Future, tracking_id: str = "",
+                 job_id: int = None, path: str = None, ofm=None):
+        self.future = future
+        self.job_id = job_id
+        self.path = path
+        self.ofm = ofm
+        self._tracking_id = tracking_id
+
+    def __repr__(self):
+        return f'JobHandle(job_id={self.job_id}, path={self.path})'
+
+    @property
+    def tracking_id(self):
+        """
+        OneFuse Tracking ID of the job. When none was passed to submit, it
+        is read from the finished Managed Object or from the job metadata
+        """
+        if not self._tracking_id:
+            if self.future.done() and not self.future.cancelled() and \
+                    self.future.exception() is None and \
+                    self.future.result() is not None:
+                self._tracking_id = self.future.result()["trackingId"]
+            elif self.job_id is not None and self.ofm is not None:
+                job_json = self.ofm.get_job_json(self.job_id)
+                self._tracking_id = job_json["jobTrackingId"]
+        return self._tracking_id
+
+    def result(self, timeout: float = None):
+        """
+        Wait for the job and return the Managed Object json. Raises the
+        job's error if it failed, or concurrent.futures.TimeoutError if it
+        has not finished within timeout seconds
+
+        Parameters
+        ----------
+        timeout : float - optional
+            Seconds to wait. Waits until the job finishes by default
+        """
+        return self.future.result(timeout)
+
+    def exception(self, timeout: float = None):
+        """
+        Wait for the job and return its error, or None if it succeeded
+
+        Parameters
+        ----------
+        timeout : float - optional
+            Seconds to wait. Waits until the job finishes by default
+        """
+        return self.future.exception(timeout)
+
+    def done(self):
+        """
+        Return True once the job has finished or the wait was cancelled
+        """
+        return self.future.done()
+
+    def cancel_wait(self):
+        """
+        Stop waiting for the job. The job itself keeps running in OneFuse.
+        Returns False if the job had already finished
+        """
+        if self.job_id is not None and self.ofm is not None and \
+                self.ofm.job_watcher is not None:
+            self.ofm.job_watcher.unwatch(self.job_id, self.future)
+        return self.future.cancel()
+
+    def add_done_callback(self, callback):
+        """
+        Call callback with this handle once the job has finished
+
+        Parameters
+        ----------
+        callback : callable
+            Called with the JobHandle as its only argument
+        """
+        self.future.add_done_callback(lambda future: callback(self))
+
+
+def wait_all(handles: list, timeout: float = None,
+             return_exceptions: bool = False):
+    """
+    Wait for every JobHandle to finish and return their results in the
+    order the handles were passed in.
+
+    Parameters
+    ----------
+    handles : list
+        List of JobHandles returned by OneFuseManager.submit
+    timeout : float - optional
+        Seconds to wait for all jobs. Raises concurrent.futures.TimeoutError
+        if any job is still running after that
+    return_exceptions : bool - optional
+        Return the error of a failed job in its place in the results instead
+        of raising it. Default False
+    """
+    futures = [handle.future for handle in handles]
+    return_when = ALL_COMPLETED if return_exceptions else FIRST_EXCEPTION
+    done, not_done = futures_wait(futures, timeout, return_when)
+    if not return_exceptions:
+        for future in futures:
+            if future in done and not future.cancelled() and \
+                    future.exception() is not None:
+                raise future.exception()
+    if not_done:
+        raise FuturesTimeoutError(f'{len(not_done)} of {len(futures)} '
+                                  f'OneFuse jobs did not finish in time')
+    results = []
+    for future in futures:
+        if future.cancelled() or future.exception() is None:
+            results.append(None if future.cancelled() else future.result())
+        else:
+            results.append(future.exception())
+    return results
+
+
+def as_completed(handles: list, timeout: float = None):
+    """
+    Yield JobHandles as their jobs finish, fastest first
+
+    Parameters
+    ----------
+    handles : list
+        List of JobHandles returned by OneFuseManager.submit
+    timeout : float - optional
+        Seconds to wait for all jobs. Raises concurrent.futures.TimeoutError
+        if any job is still running after that
+    """
+    by_future = {handle.future: handle for handle in handles}
+    for future in futures_as_completed(by_future, timeout):
+        yield by_future[future]
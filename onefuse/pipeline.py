@@ -0,0 +1,355 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from .bulk import PROVISION_KINDS, BulkItemResult
+from .exceptions import OneFuseError
+from .jobs import JobHandle
+
+
+class PipelineStep(object):
+    """
+    One provision_<kind> execution of a Pipeline. Values from the Managed
+    Objects of earlier steps are referenced as '<step name>.<field>', with
+    nested fields and list indexes separated by dots. Ex: 'naming.name',
+    'ipam.dnsRecords.0'. A step runs once every step it references or
+    depends on has succeeded.
+
+    Parameters
+    ----------
+    name : str
+        Unique name of the step, used in references. Ex: 'naming'
+    kind : str
+        Provision method to run. One of: ad, ansible_tower, cmdb, dns, ipam,
+        module, naming, scripting, vra
+    policy_name : str - optional
+        OneFuse Policy Name for the step
+    inputs : dict - optional
+        Keyword arguments of provision_<kind> taken from earlier steps. Ex:
+        {"hostname": "naming.name"}
+    properties : dict - optional
+        Template properties added to the stack for this step, taken from
+        earlier steps. Ex: {"ipAddress": "ipam.ipAddress"}
+    arguments : dict - optional
+        Other keyword arguments of provision_<kind>. Ex: {"zones": [...]}
+    depends_on : list - optional
+        Names of steps that must succeed first without being referenced
+    """
+
+    def __init__(self, name: str, kind: str, policy_name: str = None,
+                 inputs: dict = None, properties: dict = None,
+                 arguments: dict = None, depends_on: list = None):
+        if kind not in PROVISION_KINDS:
+            raise OneFuseError(f'Unknown provision kind for step {name}: '
+                               f'{kind}. Valid kinds: '
+                               f'{", ".join(PROVISION_KINDS)}')
+        self.name = name
+        self.kind = kind
+        self.policy_name = policy_name
+        self.inputs = dict(inputs or {})
+        self.properties = dict(properties or {})
+        self.arguments = dict(arguments or {})
+        self.depends_on = list(depends_on or [])
+
+    def __repr__(self):
+        return f'PipelineStep(name={self.name!r}, kind={self.kind!r})'
+
+    def get_dependencies(self):
+        """
+        Return the names of the steps this step waits for
+        """
+        references = list(self.inputs.values()) + \
+            list(self.properties.values())
+        dependencies = [reference.split('.', 1)[0]
+                        for reference in references]
+        return list(dict.fromkeys(self.depends_on + dependencies))
+
+    def get_kwargs(self, template_properties: dict, outputs: dict,
+                   tracking_id: str):
+        """
+        Return the keyword arguments of provision_<kind> for this step
+
+        Parameters
+        ----------
+        template_properties : dict
+            Stack of properties passed to Pipeline.run
+        outputs : dict
+            Managed Object json of the finished steps, keyed by step name
+        tracking_id : str
+            OneFuse Tracking ID of the pipeline run
+        """
+        properties = dict(template_properties)
+        for key, reference in self.properties.items():
+            properties[key] = get_reference(outputs, reference)
+        kwargs = dict(self.arguments)
+        if self.policy_name is not None:
+            kwargs["policy_name"] = self.policy_name
+        kwargs["template_properties"] = properties
+        for key, reference in self.inputs.items():
+            kwargs[key] = get_reference(outputs, reference)
+        kwargs["tracking_id"] = tracking_id
+        return kwargs
+
+
+class PipelineResult(object):
+    """
+    The outcome of a Pipeline run
+
+    Parameters
+    ----------
+    tracking_id : str
+        OneFuse Tracking ID shared by every step
+    results : dict
+        onefuse.bulk.BulkItemResult per step name, in step order. A step
+        skipped because a step it waits for failed holds an error saying so
+    elapsed : float
+        Seconds the run took
+    """
+
+    def __init__(self, tracking_id: str, results: dict, elapsed: float):
+        self.tracking_id = tracking_id
+        self.results = results
+        self.elapsed = elapsed
+
+    def __repr__(self):
+        return (f'PipelineResult(tracking_id={self.tracking_id!r}, '
+                f'ok={self.ok})')
+
+    @property
+    def ok(self):
+        """
+        True if every step succeeded
+        """
+        return all(result.ok for result in self.results.values())
+
+    @property
+    def outputs(self):
+        """
+        Managed Object json of the steps that succeeded, keyed by step name
+        """
+        return {name: result.result for name, result in self.results.items()
+                if result.ok}
+
+    @property
+    def errors(self):
+        """
+        Error of each step that failed or was skipped, keyed by step name
+        """
+        return {name: result.error for name, result in self.results.items()
+                if not result.ok}
+
+    def get_output(self, name: str):
+        """
+        Return the Managed Object json of a step, or raise its error
+
+        Parameters
+        ----------
+        name : str
+            Step name
+        """
+        return self.results[name].get_result()
+
+
+def get_reference(outputs: dict, reference: str):
+    """
+    Return the value a '<step name>.<field>' reference points to
+
+    Parameters
+    ----------
+    outputs : dict
+        Managed Object json of the finished steps, keyed by step name
+    reference : str
+        Ex: 'naming.name'
+    """
+    step_name, *fields = reference.split('.')
+    value = outputs[step_name]
+    for field in fields:
+        try:
+            if isinstance(value, list):
+                value = value[int(field)]
+            else:
+                value = value[field]
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise OneFuseError(f'Pipeline reference {reference} not found: '
+                               f'{field} is missing')
+    return value
+
+
+class Pipeline(object):
+    """
+    Provisions the policies of a build as a dependency graph. Steps whose
+    inputs are ready run concurrently, each submitting its request and
+    being polled by the manager's shared JobWatcher, all under one tracking
+    ID. A failed step skips the steps that wait for it; independent steps
+    still run.
+
+    Parameters
+    ----------
+    ofm : OneFuseManager
+    steps : list
+        PipelineSteps, or dicts of PipelineStep arguments
+    max_concurrency : int - optional
+        Maximum steps submitted or running at once. Default 8
+
+    Examples
+    --------
+    AD and IPAM only need the name, DNS needs the name and the IP:
+        pipeline = Pipeline(ofm, [
+            {"name": "naming", "kind": "naming", "policy_name": "prod"},
+            {"name": "ipam", "kind": "ipam", "policy_name": "prod",
+             "inputs": {"hostname": "naming.name"}},
+            {"name": "ad", "kind": "ad", "policy_name": "prod",
+             "inputs": {"name": "naming.name"}},
+            {"name": "dns", "kind": "dns", "policy_name": "prod",
+             "inputs": {"name": "naming.name", "value": "ipam.ipAddress"},
+             "arguments": {"zones": ["example.com"]}},
+            {"name": "scripting", "kind": "scripting", "policy_name": "prod",
+             "properties": {"ipAddress": "ipam.ipAddress"},
+             "depends_on": ["ad", "dns"]},
+        ])
+        result = pipeline.run(properties_stack)
+        hostname = result.get_output("naming")["name"]
+    """
+
+    def __init__(self, ofm, steps: list, max_concurrency: int = 8):
+        self.ofm = ofm
+        self.steps = [step if isinstance(step, PipelineStep)
+                      else PipelineStep(**step) for step in steps]
+        self.max_concurrency = max(max_concurrency, 1)
+        self.dependencies = {}
+        for step in self.steps:
+            if step.name in self.dependencies:
+                raise OneFuseError(f'Duplicate pipeline step: {step.name}')
+            self.dependencies[step.name] = step.get_dependencies()
+        for name, dependencies in self.dependencies.items():
+            for dependency in dependencies:
+                if dependency not in self.dependencies:
+                    raise OneFuseError(f'Pipeline step {name} references '
+                                       f'unknown step: {dependency}')
+        self.tiers = self.get_tiers()
+
+    def __repr__(self):
+        return f'Pipeline(steps={[step.name for step in self.steps]})'
+
+    def get_tiers(self):
+        """
+        Return the step names grouped by how many steps must run before
+        them. Raises OneFuseError when steps depend on each other in a cycle
+        """
+        tiers = []
+        placed = set()
+        remaining = [step.name for step in self.steps]
+        while remaining:
+            tier = [name for name in remaining
+                    if all(dependency in placed
+                           for dependency in self.dependencies[name])]
+            if not tier:
+                raise OneFuseError(f'Pipeline steps depend on each other in '
+                                   f'a cycle: {", ".join(remaining)}')
+            tiers.append(tier)
+            placed.update(tier)
+            remaining = [name for name in remaining if name not in placed]
+        return tiers
+
+    def run(self, template_properties: dict, tracking_id: str = ""):
+        """
+        Run every step and return a PipelineResult. Each step starts as
+        soon as the steps it waits for have succeeded
+
+        Parameters
+        ----------
+        template_properties : dict
+            Stack of properties used by every step
+        tracking_id : str - optional
+            OneFuse Tracking ID for every step. One is created if not passed
+        """
+        if not tracking_id:
+            tracking_id = self.ofm.create_tracking_id()
+        steps = {step.name: step for step in self.steps}
+        outputs = {}
+        results = {}
+        started = set()
+        condition = threading.Condition()
+        start_time = time.monotonic()
+
+        def finish(step: PipelineStep, step_start: float, result=None,
+                   error=None):
+            with condition:
+                index = self.steps.index(step)
+                results[step.name] = BulkItemResult(
+                    index, step, result, error,
+                    time.monotonic() - step_start)
+                if error is None:
+                    outputs[step.name] = result
+                else:
+                    self.ofm.logger.warning(f'Pipeline step {step.name} '
+                                            f'failed: {error}')
+                condition.notify_all()
+
+        def job_done(step: PipelineStep, step_start: float,
+                     handle: JobHandle):
+            try:
+                error = handle.exception()
+            except CancelledError as err:
+                error = err
+            result = handle.result() if error is None else None
+            finish(step, step_start, result, error)
+
+        def start(step: PipelineStep):
+            step_start = time.monotonic()
+            try:
+                with condition:
+                    kwargs = step.get_kwargs(template_properties, outputs,
+                                             tracking_id)
+                self.ofm.submit_context.set(True)
+                provision = getattr(self.ofm, f'provision_{step.kind}')
+                result = provision(**kwargs)
+            except Exception as err:
+                finish(step, step_start, error=err)
+                return
+            if isinstance(result, JobHandle):
+                result.add_done_callback(
+                    lambda handle: job_done(step, step_start, handle))
+            else:
+                finish(step, step_start, result)
+
+        max_workers = min(self.max_concurrency, max(len(steps), 1))
+        with ThreadPoolExecutor(max_workers=max_workers,
+                                thread_name_prefix='onefuse-pipeline') \
+                as executor:
+            with condition:
+                while len(results) < len(steps):
+                    running = len(started) - len(results)
+                    progressed = False
+                    for name, step in steps.items():
+                        if name in started:
+                            continue
+                        failed = [dependency for dependency
+                                  in self.dependencies[name]
+                                  if dependency in results and
+                                  not results[dependency].ok]
+                        if failed:
+                            started.add(name)
+                            progressed = True
+                            results[name] = BulkItemResult(
+                                self.steps.index(step), step,
+                                error=OneFuseError(
+                                    f'Pipeline step {name} skipped: step '
+                                    f'{failed[0]} failed'))
+                            continue
+                        if running >= self.max_concurrency or \
+                                not all(dependency in outputs for dependency
+                                        in self.dependencies[name]):
+                            continue
+                        started.add(name)
+                        progressed = True
+                        running += 1
+                        executor.submit(contextvars.copy_context().run,
+                                        start, step)
+                    if not progressed:
+                        condition.wait()
+        elapsed = time.monotonic() - start_time
+        self.ofm.logger.info(f'Pipeline {tracking_id} finished in '
+                             f'{elapsed:.1f} seconds')
+        ordered = {step.name: results[step.name] for step in self.steps}
+        return PipelineResult(tracking_id, ordered, elapsed)
@@ -0,0 +1,115 @@
+import random
+
+
+class PollingStrategy(object):
+    """
+    Decides how long to wait between polls of a OneFuse job. The first poll
+    happens after initial_delay seconds, each following delay is multiplied
+    by multiplier up to max_delay, and every delay is randomized by +/-
+    jitter (a fraction of the delay) so that many jobs started together do
+    not poll OneFuse in lockstep.
+
+    Parameters
+    ----------
+    initial_delay : float
+        Seconds to wait before the first poll. Default 0.5
+    multiplier : float
+        Factor applied to the delay after every poll. Default 2
+    max_delay : float
+        Ceiling for the delay between polls in seconds. Default 15
+    jitter : float
+        Fraction of each delay to randomize by. Default 0.1
+
+    Examples
+    --------
+    Poll naming jobs every 0.25s at first, backing off to every 5s:
+        ofm = OneFuseManager(username, password, host, polling_profiles={
+            '/customNames/': PollingStrategy(0.25, 2, 5)
+        })
+    """
+
+    def __init__(self, initial_delay: float = 0.5, multiplier: float = 2,
+                 max_delay: float = 15, jitter: float = 0.1):
+        self.initial_delay = initial_delay
+        self.multiplier = multiplier
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def __repr__(self):
+        return (f'PollingStrategy(initial_delay={self.initial_delay}, '
+                f'multiplier={self.multiplier}, max_delay={self.max_delay}, '
+                f'jitter={self.jitter})')
+
+    def get_delay(self, attempt: int):
+        """
+        Return the number of seconds to sleep before the given poll
+
+        Parameters
+        ----------
+        attempt : int
+            Zero based number of polls already made after the initial one
+        """
+        delay = min(self.initial_delay * self.multiplier ** attempt,
+                    self.max_delay)
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return max(min(delay, self.max_delay), 0)
+
+    def delays(self):
+        """
+        Generator of successive delays between polls
+        """
+        attempt = 0
+        while True:
+            yield self.get_delay(attempt)
+            attempt += 1
+
+
+class FixedPollingStrategy(PollingStrategy):
+    """
+    Poll a OneFuse job on a fixed interval. Used when a caller passes the
+    legacy sleep_seconds argument.
+
+    Parameters
+    ----------
+    sleep_seconds : float
+        Seconds to wait between every poll
+    """
+
+    def __init__(self, sleep_seconds: float = 5):
+        super().__init__(sleep_seconds, 1, sleep_seconds, 0)
+
+    def __repr__(self):
+        return f'FixedPollingStrategy(sleep_seconds={self.initial_delay})'
+
+
+# Profiles keyed by the same module paths as OneFuseManager.get_max_sleep.
+# Naming, IPAM and DNS jobs typically finish server side in well under a
+# second, while scripting, Ansible Tower and vRA jobs can run for hours.
+DEFAULT_POLLING_STRATEGY = PollingStrategy(0.5, 2, 15)
+DEFAULT_POLLING_PROFILES = {
+    '/customNames/': PollingStrategy(0.25, 2, 5),
+    '/ipamReservations/': PollingStrategy(0.25, 2, 5),
+    '/dnsReservations/': PollingStrategy(0.25, 2, 5),
+    '/microsoftADComputerAccounts/': PollingStrategy(0.5, 2, 10),
+    '/scriptingDeployments/': PollingStrategy(1, 2, 30),
+    '/ansibleTowerDeployments/': PollingStrategy(2, 2, 60),
+    '/vraDeployments/': PollingStrategy(5, 2, 60),
+}
+
+
+def get_module_path(path: str):
+    """
+    Return the module path used to key polling profiles and timeouts for any
+    OneFuse REST path. ex: '/customNames/782/' and '/customNames/ingest/'
+    both return '/customNames/'
+
+    Parameters
+    ----------
+    path : str
+        OneFuse REST path. ex: '/customNames/782/'
+    """
+    if path.startswith('/api/v3/onefuse'):
+        path = path.replace('/api/v3/onefuse', '', 1)
+    module = path.strip('/').split('/')[0]
+    return f'/{module}/'
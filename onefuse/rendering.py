@@ -0,0 +1,649 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from uuid import uuid4
+
+try:
+    import jinja2
+    from jinja2 import meta, nodes
+    from jinja2.sandbox import ImmutableSandboxedEnvironment
+except ImportError:
+    jinja2 = None
+
+PROPERTY_SET_PREFIXES = ('1FPS_', 'OneFuse_SPS_')
+TEMPLATE_TAG = re.compile(r'{{(.*?)}}|{%(.*?)%}', re.DOTALL)
+IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+# Names that make a render depend on more than its properties. Their
+# results are never cached
+NON_DETERMINISTIC_NAMES = frozenset([
+    'now', 'today', 'time', 'date', 'datetime', 'timestamp', 'utcnow',
+    'random', 'randint', 'randrange', 'shuffle', 'uuid', 'uuid1', 'uuid4',
+    'sequence', 'counter', 'increment', 'cycler', 'joiner'
+])
+
+# Standard Jinja2 filters and tests whose output does not depend on how the
+# OneFuse server configures Jinja2. Anything else, including filters only
+# OneFuse provides, is rendered by the server.
+LOCAL_FILTERS = {
+    'abs', 'capitalize', 'center', 'count', 'd', 'default', 'first', 'float',
+    'int', 'join', 'last', 'length', 'list', 'lower', 'max', 'min', 'replace',
+    'reverse', 'round', 'sort', 'string', 'sum', 'title', 'trim', 'truncate',
+    'unique', 'upper', 'wordcount'
+}
+LOCAL_TESTS = {
+    '!=', '<', '<=', '==', '>', '>=', 'boolean', 'defined', 'divisibleby',
+    'eq', 'equalto', 'even', 'false', 'float', 'ge', 'greaterthan', 'gt',
+    'in', 'integer', 'le', 'lessthan', 'lower', 'lt', 'mapping', 'ne', 'none',
+    'number', 'odd', 'sameas', 'sequence', 'string', 'true', 'undefined',
+    'upper'
+}
+LOCAL_NODES = (
+    'Template', 'Output', 'TemplateData', 'Name', 'Const', 'Getattr',
+    'Getitem', 'Slice', 'Filter', 'Test', 'If', 'For', 'CondExpr', 'Compare',
+    'Operand', 'And', 'Or', 'Not', 'Neg', 'Pos', 'Concat', 'Add', 'Sub',
+    'Mul', 'Div', 'FloorDiv', 'Mod', 'Pow', 'List', 'Tuple', 'Dict', 'Pair',
+    'Keyword', 'Assign'
+)
+
+# Templates rendered locally must produce exactly these values. The corpus
+# is checked when a LocalRenderer is created; if the installed Jinja2 does
+# not reproduce it, local rendering is disabled and the server is used.
+CONFORMANCE_CORPUS = [
+    ('{{ owner }}', {'owner': 'jdoe'}, 'jdoe'),
+    ("This is {{owner}}'s deployment", {'owner': 'jdoe'},
+     "This is jdoe's deployment"),
+    ('{{ env }}_naming', {'env': 'prod'}, 'prod_naming'),
+    ('{{ env | upper }}', {'env': 'prod'}, 'PROD'),
+    ('{{ env|lower }}-{{ app|title }}', {'env': 'PROD', 'app': 'web app'},
+     'prod-Web App'),
+    ('{{ name | replace("-", "_") }}', {'name': 'a-b-c'}, 'a_b_c'),
+    ('{{ name | trim }}', {'name': '  web01 '}, 'web01'),
+    ('{{ zones | join(",") }}', {'zones': ['a.io', 'b.io']}, 'a.io,b.io'),
+    ('{{ hosts | length }}', {'hosts': ['a', 'b', 'c']}, '3'),
+    ('{{ count | int + 1 }}', {'count': '4'}, '5'),
+    ('{{ nic.ipAddress }}', {'nic': {'ipAddress': '10.0.0.5'}}, '10.0.0.5'),
+    ('{{ nic["ipAddress"] }}', {'nic': {'ipAddress': '10.0.0.5'}},
+     '10.0.0.5'),
+    ('{{ hosts[0] }}', {'hosts': ['web01', 'web02']}, 'web01'),
+    ('{{ name[:3] }}', {'name': 'prdweb01'}, 'prd'),
+    ('{{ a ~ "-" ~ b }}', {'a': 'x', 'b': 1}, 'x-1'),
+    ('{{ "yes" if enabled else "no" }}', {'enabled': True}, 'yes'),
+    ('{% if env == "prod" %}p{% else %}n{% endif %}', {'env': 'prod'}, 'p'),
+    ('{% if env == "prod" %}p{% elif env == "dev" %}d{% endif %}',
+     {'env': 'dev'}, 'd'),
+    ('{% for h in hosts %}{{ h }}{% if not loop.last %},{% endif %}'
+     '{% endfor %}', {'hosts': ['a', 'b']}, 'a,b'),
+    ('{% set x = env | upper %}{{ x }}', {'env': 'qa'}, 'QA'),
+    ('{{ value | default("none") }}', {'value': ''}, ''),
+    ('{{ 7 % 3 }}-{{ 7 // 2 }}', {}, '1-3'),
+    ('{{ n is even }}', {'n': 4}, 'True'),
+    ('{{ missing is defined }}', {'missing': None}, 'True'),
+    ('{{ none_value }}', {'none_value': None}, 'None'),
+]
+
+
+class TemplateAnalysis(object):
+    """
+    The result of parsing a template once: whether it may be rendered
+    locally, the variables it references, and the compiled template
+    """
+
+    def __init__(self, supported: bool, variables: frozenset = frozenset(),
+                 compiled=None, reason: str = ''):
+        self.supported = supported
+        self.variables = variables
+        self.compiled = compiled
+        self.reason = reason
+
+    def __repr__(self):
+        return (f'TemplateAnalysis(supported={self.supported}, '
+                f'variables={sorted(self.variables)}, reason={self.reason!r})')
+
+
+def contains_template(value):
+    """
+    Return True if a property value, or any string nested in it, contains
+    Jinja2 syntax the OneFuse server would render
+
+    Parameters
+    ----------
+    value : any
+        Property value
+    """
+    if isinstance(value, str):
+        return value.find('{{') != -1 or value.find('{%') != -1
+    if isinstance(value, dict):
+        return any(contains_template(k) or contains_template(v)
+                   for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return any(contains_template(v) for v in value)
+    return False
+
+
+def has_property_set_expansion(template_properties: dict):
+    """
+    Return True if the properties stack contains keys OneFuse expands into
+    more properties (1FPS_ or OneFuse_SPS_)
+
+    Parameters
+    ----------
+    template_properties : dict
+        Stack of properties used in OneFuse policy execution
+    """
+    return any(str(key).startswith(PROPERTY_SET_PREFIXES)
+               for key in template_properties)
+
+
+@lru_cache(maxsize=4096)
+def get_template_names(template: str):
+    """
+    Return every name used inside the {{ }} and {% %} tags of a template as
+    a frozenset. This over-approximates the variables a template references
+    (filters, attributes and keywords are included too), which is safe for
+    deciding what a render depends on
+
+    Parameters
+    ----------
+    template : str
+        The string to be rendered
+    """
+    names = set()
+    for match in TEMPLATE_TAG.finditer(template):
+        names.update(IDENTIFIER.findall(match.group(1) or match.group(2)))
+    return frozenset(names)
+
+
+def get_template_strings(value):
+    """
+    Generator of every template string in a property value, including
+    strings nested in dicts and lists
+
+    Parameters
+    ----------
+    value : any
+        Property value
+    """
+    if is_template(value):
+        yield value
+    elif isinstance(value, dict):
+        for k, v in value.items():
+            yield from get_template_strings(k)
+            yield from get_template_strings(v)
+    elif isinstance(value, (list, tuple)):
+        for v in value:
+            yield from get_template_strings(v)
+
+
+def get_variable_closure(templates: list, template_properties: dict):
+    """
+    Return the set of names the templates depend on: the names they use,
+    plus the names used by any property value they reference that is a
+    template itself, transitively
+
+    Parameters
+    ----------
+    templates : list
+        Strings to be rendered
+    template_properties : dict
+        Stack of properties used in OneFuse policy execution
+    """
+    if template_properties is None:
+        template_properties = {}
+    closure = set()
+    pending = [template for template in templates if is_template(template)]
+    while pending:
+        for name in get_template_names(pending.pop()):
+            if name in closure:
+                continue
+            closure.add(name)
+            if name in template_properties:
+                pending.extend(
+                    get_template_strings(template_properties[name]))
+    return closure
+
+
+def get_property_dependencies(templates: list, template_properties: dict,
+                              property_sets: dict = None):
+    """
+    Work out which keys of a properties stack OneFuse needs to render the
+    templates: the variable closure of the templates (see
+    get_variable_closure), every 1FPS_ and OneFuse_SPS_ key, and the closure
+    of every template inside the property sets those keys expand to.
+    Returns a tuple of (keys, missing). keys is None when the dependencies
+    cannot be determined, ex: a property set name is itself a template, and
+    the whole stack must be sent. missing is the set of property set names
+    whose properties are needed in property_sets before keys is complete
+
+    Parameters
+    ----------
+    templates : list
+        Strings to be rendered
+    template_properties : dict
+        Stack of properties used in OneFuse policy execution
+    property_sets : dict - optional
+        Properties of each property set already fetched, keyed by name
+    """
+    if template_properties is None:
+        return set(), set()
+    if property_sets is None:
+        property_sets = {}
+    keys = set()
+    pending = [template for template in templates if is_template(template)]
+    set_names = []
+    for key, value in template_properties.items():
+        if str(key).startswith(PROPERTY_SET_PREFIXES):
+            if not isinstance(value, str) or is_template(value):
+                return None, set()
+            keys.add(key)
+            set_names.append(value)
+    seen = set()
+    missing = set()
+    while set_names:
+        name = set_names.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        if name not in property_sets:
+            missing.add(name)
+            continue
+        for key, value in property_sets[name].items():
+            # Stack keys a property set redefines are sent so OneFuse
+            # resolves the conflict the same way
+            if key in template_properties:
+                keys.add(key)
+            if str(key).startswith(PROPERTY_SET_PREFIXES):
+                if not isinstance(value, str) or is_template(value):
+                    return None, set()
+                set_names.append(value)
+            else:
+                pending.extend(get_template_strings(value))
+    closure = get_variable_closure(pending, template_properties)
+    keys.update(name for name in closure if name in template_properties)
+    return keys, missing
+
+
+def get_changed_properties(previous_properties: dict,
+                           template_properties: dict):
+    """
+    Return the set of keys whose values differ between two properties
+    stacks, or None if the stacks cannot be resolved incrementally because a
+    key was removed or a 1FPS_ or OneFuse_SPS_ property changed
+
+    Parameters
+    ----------
+    previous_properties : dict
+        Stack as it was last resolved
+    template_properties : dict
+        New stack
+    """
+    for key in previous_properties:
+        if key not in template_properties:
+            return None
+    changed = set()
+    for key, value in template_properties.items():
+        if key in previous_properties and \
+                previous_properties[key] == value:
+            continue
+        if str(key).startswith(PROPERTY_SET_PREFIXES):
+            return None
+        changed.add(key)
+    return changed
+
+
+def get_affected_properties(changed: set, template_properties: dict):
+    """
+    Return a tuple of (affected, required). affected is the set of keys
+    that must be resolved again after the changed keys changed: the changed
+    keys and every templated property that depends on one of them. required
+    is the set of keys the template tester needs to resolve them
+
+    Parameters
+    ----------
+    changed : set
+        Keys that changed. See get_changed_properties
+    template_properties : dict
+        New stack
+    """
+    affected = set(changed)
+    templates = []
+    for key, value in template_properties.items():
+        key_templates = list(get_template_strings(key))
+        key_templates.extend(get_template_strings(value))
+        if not key_templates:
+            continue
+        if key in changed or not changed.isdisjoint(
+                get_variable_closure(key_templates, template_properties)):
+            affected.add(key)
+            templates.extend(key_templates)
+    required = set(affected)
+    required.update(
+        name for name in get_variable_closure(templates, template_properties)
+        if name in template_properties)
+    required.update(key for key in template_properties
+                    if str(key).startswith(PROPERTY_SET_PREFIXES))
+    return affected, required
+
+
+def merge_resolved_properties(previous_resolved: dict, resolved: dict,
+                              affected: set):
+    """
+    Return the previously resolved stack with the affected keys replaced by
+    their newly resolved values. Affected keys missing from the new result
+    are removed, as OneFuse removed them
+
+    Parameters
+    ----------
+    previous_resolved : dict
+        Resolved stack from the last full or incremental resolve
+    resolved : dict
+        Result of resolving the affected keys
+    affected : set
+        Keys that were resolved again. See get_affected_properties
+    """
+    merged = dict(previous_resolved)
+    for key in affected:
+        if key in resolved:
+            merged[key] = resolved[key]
+        else:
+            merged.pop(key, None)
+    return merged
+
+
+def is_deterministic(closure: set):
+    """
+    Return True if no name in a variable closure (see get_variable_closure)
+    makes the render depend on time, randomness or a counter
+
+    Parameters
+    ----------
+    closure : set
+        Names a render depends on
+    """
+    return NON_DETERMINISTIC_NAMES.isdisjoint(closure)
+
+
+def get_render_fingerprint(template: str, template_properties: dict):
+    """
+    Return a stable hash of the properties a template render depends on, or
+    None if the render must not be cached. Only the variables in the
+    template's closure are hashed, so stacks that differ in unrelated keys
+    share a fingerprint. When the stack has 1FPS_ or OneFuse_SPS_ keys the
+    property sets OneFuse expands may redefine any variable, so the whole
+    stack is hashed instead
+
+    Parameters
+    ----------
+    template : str
+        The string to be rendered
+    template_properties : dict
+        Stack of properties used in OneFuse policy execution
+    """
+    if template_properties is None:
+        template_properties = {}
+    closure = get_variable_closure([template], template_properties)
+    if not is_deterministic(closure):
+        return None
+    if has_property_set_expansion(template_properties):
+        dependencies = template_properties
+    else:
+        dependencies = {name: template_properties[name] for name in closure
+                        if name in template_properties}
+    try:
+        encoded = json.dumps(dependencies, sort_keys=True, default=repr)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def is_template(template):
+    """
+    Return True if a value is a string containing Jinja2 syntax, the same
+    check OneFuseManager.render makes before calling the template tester
+
+    Parameters
+    ----------
+    template : any
+        Value to be rendered
+    """
+    return type(template) == str and (template.find('{%') != -1 or
+                                      template.find('{{') != -1)
+
+
+def can_batch_render(template: str):
+    """
+    Return True if a template renders the same inside a batch as it does on
+    its own. Templates that declare names ({% set %}, macros, imports) could
+    leak them into the templates that follow, and a trailing newline is only
+    stripped at the very end of a template, so both are rendered alone. So
+    are templates using whitespace control ({%- -%} {{- -}} {#- -#} and +)
+    or starting with indentation before a block tag, as trim_blocks and
+    lstrip_blocks could strip differently next to the batch delimiter
+
+    Parameters
+    ----------
+    template : str
+        The string to be rendered
+    """
+    if template.endswith('\n'):
+        return False
+    if re.search(r'[{][%{#][-+]|[-+][%}#][}]', template) or \
+            re.match(r'[ \t]+{%', template):
+        return False
+    return not re.search(r'{%[-+]?\s*(set|macro|import|from|extends|block|'
+                         r'call|filter|raw)\b', template)
+
+
+def get_batch_delimiter(templates: list):
+    """
+    Return a delimiter for packing templates into a single template tester
+    call. It is plain text to Jinja2 and does not occur in any template
+
+    Parameters
+    ----------
+    templates : list
+        Templates that will be joined by the delimiter
+    """
+    while True:
+        delimiter = f'<<onefuse-render-{uuid4().hex}>>'
+        if not any(delimiter in template for template in templates):
+            return delimiter
+
+
+# noinspection PyBroadException
+class LocalRenderer(object):
+    """
+    Renders OneFuse templates in-process with Jinja2 when the result is
+    certain to match what the OneFuse template tester would return, so the
+    render does not cost a /templateTester/ round trip. A template is only
+    rendered locally when:
+
+    - it parses, uses only standard Jinja2 syntax, filters and tests listed
+      in LOCAL_FILTERS and LOCAL_TESTS, and makes no function calls
+    - its whitespace does not depend on trim_blocks, lstrip_blocks or
+      keep_trailing_newline
+    - every variable it references is in the properties stack and none of
+      those values contain templates themselves
+    - the stack has no 1FPS_ or OneFuse_SPS_ property set expansions
+
+    Everything else returns NOT_RENDERED and must be rendered by the server.
+    Requires the jinja2 package:
+
+        pip install onefuse[render]
+
+    Parameters
+    ----------
+    logger : logging.Logger
+    max_templates : int
+        Number of parsed templates to keep. Default 512
+    """
+
+    NOT_RENDERED = object()
+
+    def __init__(self, logger, max_templates: int = 512):
+        if jinja2 is None:
+            raise ImportError('Local rendering requires jinja2. Install it '
+                              'with: pip install onefuse[render]')
+        self.logger = logger
+        self.max_templates = max_templates
+        self.environment = ImmutableSandboxedEnvironment(
+            undefined=jinja2.StrictUndefined)
+        self.templates = OrderedDict()
+        self.lock = threading.Lock()
+        self.local_renders = 0
+        self.fallbacks = 0
+        failures = self.check_conformance()
+        self.enabled = not failures
+        if failures:
+            self.logger.warning(f'Local rendering disabled, the installed '
+                                f'jinja2 failed the conformance corpus: '
+                                f'{failures}')
+
+    def __repr__(self):
+        return 'LocalRenderer'
+
+    def check_conformance(self, corpus: list = None):
+        """
+        Render every (template, template_properties, expected) case of the
+        corpus locally and return the list of cases that could not be
+        rendered locally or did not produce the expected value
+
+        Parameters
+        ----------
+        corpus : list - optional
+            Defaults to CONFORMANCE_CORPUS
+        """
+        if corpus is None:
+            corpus = CONFORMANCE_CORPUS
+        failures = []
+        for template, template_properties, expected in corpus:
+            try:
+                analysis = self.analyze(template)
+                reason = self.get_fallback_reason(analysis,
+                                                  template_properties)
+                if reason is not None:
+                    failures.append((template, reason))
+                    continue
+                rendered = analysis.compiled.render(**template_properties)
+                if rendered != expected:
+                    failures.append((template, rendered))
+            except Exception as err:
+                failures.append((template, str(err)))
+        return failures
+
+    def analyze(self, template: str):
+        """
+        Parse a template, decide whether its syntax can be rendered locally
+        and return a TemplateAnalysis. Results are memoized per template
+
+        Parameters
+        ----------
+        template : str
+            The string to be rendered
+        """
+        with self.lock:
+            analysis = self.templates.get(template)
+            if analysis is not None:
+                self.templates.move_to_end(template)
+                return analysis
+        analysis = self.parse(template)
+        with self.lock:
+            self.templates[template] = analysis
+            while len(self.templates) > self.max_templates:
+                self.templates.popitem(last=False)
+        return analysis
+
+    def parse(self, template: str):
+        if re.search(r'[%-]}\r?\n', template) or \
+                re.search(r'^[ \t]+{%', template, re.MULTILINE) or \
+                template.endswith('\n'):
+            return TemplateAnalysis(False, reason='whitespace control')
+        try:
+            ast = self.environment.parse(template)
+        except Exception:
+            return TemplateAnalysis(False, reason='syntax')
+        for node in ast.find_all(nodes.Node):
+            node_type = type(node).__name__
+            if node_type not in LOCAL_NODES:
+                return TemplateAnalysis(False, reason=f'{node_type} node')
+            if isinstance(node, nodes.Filter) and \
+                    node.name not in LOCAL_FILTERS:
+                return TemplateAnalysis(False, reason=f'filter {node.name}')
+            if isinstance(node, nodes.Test) and node.name not in LOCAL_TESTS:
+                return TemplateAnalysis(False, reason=f'test {node.name}')
+        variables = frozenset(meta.find_undeclared_variables(ast))
+        try:
+            compiled = self.environment.from_string(ast)
+        except Exception:
+            return TemplateAnalysis(False, reason='compile')
+        return TemplateAnalysis(True, variables, compiled)
+
+    @staticmethod
+    def get_fallback_reason(analysis: TemplateAnalysis,
+                            template_properties: dict):
+        """
+        Return why a template must be rendered by the server for these
+        properties, or None if it can be rendered locally
+
+        Parameters
+        ----------
+        analysis : TemplateAnalysis
+        template_properties : dict
+            Stack of properties used in OneFuse policy execution
+        """
+        if not analysis.supported:
+            return analysis.reason
+        if template_properties is None:
+            template_properties = {}
+        if has_property_set_expansion(template_properties):
+            return 'property set expansion'
+        for variable in analysis.variables:
+            if variable not in template_properties:
+                return f'undefined variable {variable}'
+            if contains_template(template_properties[variable]):
+                return f'nested template in {variable}'
+        return None
+
+    def render(self, template: str, template_properties: dict):
+        """
+        Render a template locally. Returns LocalRenderer.NOT_RENDERED when
+        the template must be rendered by the OneFuse server instead
+
+        Parameters
+        ----------
+        template : str
+            The string to be rendered
+        template_properties : dict
+            Stack of properties used in OneFuse policy execution
+        """
+        if not self.enabled:
+            return self.NOT_RENDERED
+        try:
+            analysis = self.analyze(template)
+            reason = self.get_fallback_reason(analysis, template_properties)
+            if reason is None:
+                rendered = analysis.compiled.render(
+                    **(template_properties or {}))
+                with self.lock:
+                    self.local_renders += 1
+                return rendered
+            self.logger.debug(f'Rendering on server ({reason}): {template}')
+        except Exception:
+            self.logger.debug(f'Local render failed, rendering on server: '
+                              f'{template}')
+        with self.lock:
+            self.fallbacks += 1
+        return self.NOT_RENDERED
+
+    def get_stats(self):
+        """
+        Return a dict with the number of local renders and server fallbacks
+        """
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "localRenders": self.local_renders,
+                "fallbacks": self.fallbacks,
+            }
@@ -0,0 +1,149 @@
+import copy
+import json
+import os
+import sys
+import threading
+import time
+
+
+# noinspection PyBroadException
+class PolicySnapshot(object):
+    """
+    A read-only index of the policy and property set json files written by
+    BackupManager.backup_policies, so a OneFuseManager can resolve
+    get_policy_by_name, get_sps_by_name and get_sps_properties from disk on a
+    cold start instead of querying OneFuse for every name. Policies whose
+    file is older than max_age seconds are treated as stale and looked up
+    live. The snapshot must have been taken from the same OneFuse appliance
+    the manager connects to, as policy links are used as-is.
+
+    Parameters
+    ----------
+    snapshot_path : str
+        Directory passed to BackupManager.backup_policies. Ex:
+        '/var/opt/onefuse_backups/'
+    max_age : float - optional
+        Seconds after which a backed up policy is stale. None never expires
+        policies. Default 86400
+    policy_types : list - optional
+        Sub directories to index. Defaults to every directory in the
+        snapshot
+
+    Examples
+    --------
+    Warm lookups from last night's backup:
+        ofm = OneFuseManager(username, password, host,
+                             snapshot_path='/var/opt/onefuse_backups/')
+    """
+
+    def __init__(self, snapshot_path: str, max_age: float = 86400,
+                 policy_types: list = None, logger=None):
+        self.snapshot_path = snapshot_path
+        self.max_age = max_age
+        self.policy_types = policy_types
+        self.logger = logger
+        self.index = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.load()
+
+    def __repr__(self):
+        return f'PolicySnapshot(snapshot_path={self.snapshot_path!r})'
+
+    def load(self):
+        """
+        Read every policy json file in the snapshot and rebuild the index.
+        Names matching more than one policy of a type are left out so
+        lookups for them fall back to OneFuse
+        """
+        index = {}
+        if not os.path.isdir(self.snapshot_path):
+            if self.logger:
+                self.logger.warning(f'Policy snapshot path not found: '
+                                    f'{self.snapshot_path}')
+            with self.lock:
+                self.index = index
+            return
+        if self.policy_types is not None:
+            policy_types = self.policy_types
+        else:
+            policy_types = [entry for entry in os.listdir(self.snapshot_path)
+                            if os.path.isdir(os.path.join(self.snapshot_path,
+                                                          entry))]
+        for policy_type in policy_types:
+            type_path = os.path.join(self.snapshot_path, policy_type)
+            if not os.path.isdir(type_path):
+                continue
+            policies = {}
+            duplicates = set()
+            for file_name in os.listdir(type_path):
+                if not file_name.endswith('.json'):
+                    continue
+                file_path = os.path.join(type_path, file_name)
+                try:
+                    with open(file_path, 'r') as f:
+                        policy = json.load(f)
+                    name = policy["name"].lower()
+                    modified = os.path.getmtime(file_path)
+                except Exception:
+                    if self.logger:
+                        self.logger.warning(
+                            f'Policy snapshot could not read {file_path}. '
+                            f'Error: {sys.exc_info()[0]}. '
+                            f'{sys.exc_info()[1]}')
+                    continue
+                if name in policies:
+                    duplicates.add(name)
+                policies[name] = (policy, modified)
+            for name in duplicates:
+                del policies[name]
+            index[policy_type] = policies
+        with self.lock:
+            self.index = index
+        if self.logger:
+            self.logger.debug(f'Policy snapshot loaded from '
+                              f'{self.snapshot_path}: '
+                              f'{self.get_stats()["policies"]}')
+
+    def get_policy(self, policy_path: str, policy_name: str):
+        """
+        Return a copy of the policy json for a name, or None if the snapshot
+        does not hold it or its copy is stale
+
+        Parameters
+        ----------
+        policy_path : str
+            OneFuse REST path to policy type. Ex: 'namingPolicies'
+        policy_name : str
+            Name of the Policy to return (case-insensitive)
+        """
+        policy_type = policy_path.strip('/')
+        with self.lock:
+            entry = self.index.get(policy_type, {}).get(
+                str(policy_name).lower())
+            if entry is None:
+                self.misses += 1
+                return None
+            policy, modified = entry
+            if self.max_age is not None and \
+                    time.time() - modified > self.max_age:
+                self.stale += 1
+                return None
+            self.hits += 1
+            return copy.deepcopy(policy)
+
+    def get_stats(self):
+        """
+        Return a dict of snapshot statistics: policies indexed per type and
+        lookup hits, misses and stale entries
+        """
+        with self.lock:
+            return {
+                "policies": {policy_type: len(policies) for
+                             policy_type, policies in self.index.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+            }
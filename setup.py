@@ -14,6 +14,11 @@ setup(
     long_description_content_type="text/x-rst",
     packages=['onefuse'],
     install_requires=['requests', 'urllib3', 'packaging'],
+    extras_require={
+        'async': ['aiohttp'],
+        'render': ['jinja2'],
+        'fast': ['orjson'],
+    },
     license='Mozilla Public License 2.0 (MPL 2.0)',
 
     classifiers=[